@@ -0,0 +1,34 @@
+from django.db import migrations
+
+BACKGROUNDS = [
+    ("spiderman_building", "Prédio da cidade", "Prédio da cidade (estilo Homem-Aranha)", "assets/backgrounds/building.jpg"),
+    ("goku_clouds", "Nuvens no céu", "Nuvens no céu (estilo Dragon Ball)", "assets/backgrounds/clouds.jpg"),
+    ("space", "Espaço", "Espaço sideral", "assets/backgrounds/space.webp"),
+    ("beach", "Praia", "Praia tropical", "assets/backgrounds/beach.jpeg"),
+    ("forest", "Floresta", "Floresta mística", "assets/backgrounds/forest.jpg"),
+]
+
+
+def seed_backgrounds(apps, schema_editor):
+    Background = apps.get_model('backgrounds', 'Background')
+    for key, name, description, image_path in BACKGROUNDS:
+        Background.objects.get_or_create(
+            key=key,
+            defaults={"name": name, "description": description, "image_path": image_path},
+        )
+
+
+def remove_backgrounds(apps, schema_editor):
+    Background = apps.get_model('backgrounds', 'Background')
+    Background.objects.filter(key__in=[key for key, *_ in BACKGROUNDS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backgrounds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_backgrounds, remove_backgrounds),
+    ]
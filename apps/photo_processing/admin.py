@@ -1 +1,11 @@
 from django.contrib import admin
+from .models import PhotoJob
+
+
+@admin.register(PhotoJob)
+class PhotoJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'background', 'created_at', 'updated_at']
+    list_filter = ['status', 'background', 'created_at']
+    search_fields = ['id', 'background', 'error']
+    readonly_fields = ['id', 'status', 'background', 'error', 'created_at', 'updated_at']
+    exclude = ['result', 'preview']
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class PhotoProcessingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.photo_processing'
\ No newline at end of file
+    name = 'apps.photo_processing'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,325 @@
+import asyncio
+import binascii
+import io
+import logging
+import uuid
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .encoding import OUTPUT_FORMATS, EncodeOptions, InvalidEncoding, encoding_from_request
+from .metrics import photos_in_progress, photos_processed
+from .offload import get_stage_executor
+from .streaming import (
+    PayloadTooLarge, StreamingJSONReader, content_length, format_event, format_multipart_end,
+    format_part_header, iter_base64_json, read_stream,
+)
+from .views import JobEventTracker, check_preflight, decode_base64_field, is_json, job_queue, photo_processor
+
+logger = logging.getLogger(__name__)
+
+# Views assíncronas dos endpoints de processamento (PHOTO_ASYNC_VIEWS, servidor ASGI).
+# O event loop só recebe o upload e envia a resposta; leitura do upload, inferência e
+# composição vão para o StageExecutor, cada etapa com seu limite de concorrência.
+
+
+def error_response(status: int, message: str) -> JsonResponse:
+    """
+    Erro no mesmo formato compacto do JSONRenderer das views síncronas
+    """
+    return JsonResponse(
+        {"error": message},
+        status=status,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+
+
+def read_upload(request):
+    """
+    Lê o upload multipart e valida a foto (executado no pool, etapa ``io``).
+    Retorna (status, mensagem de erro) ou (None, bytes da foto)
+    """
+    photo = request.FILES.get('photo')
+    if photo is None:
+        logger.error("Erro: Foto não encontrada na requisição")
+        return 400, "Foto é obrigatória"
+    if not photo.content_type.startswith("image/"):
+        return 400, "Arquivo deve ser uma imagem"
+
+    problem = check_preflight(photo, photo.size)
+    if problem is not None:
+        return problem
+    return None, photo.read()
+
+
+def read_base64_body(request):
+    """
+    Lê o corpo do ``process_photo_base64`` (imagem crua, JSON em streaming ou formulário) no pool.
+    Retorna (bytes da foto, demais campos)
+    """
+    size_hint = content_length(request.META, settings.PHOTO_UPLOAD_MAX_BYTES)
+    if request.content_type.startswith('image/') or request.content_type == 'application/octet-stream':
+        return read_stream(request, settings.PHOTO_UPLOAD_MAX_BYTES, size_hint), request.GET
+
+    if is_json(request.content_type):
+        return StreamingJSONReader(
+            request, 'photo_base64', settings.PHOTO_UPLOAD_MAX_BYTES, size_hint
+        ).read()
+    return decode_base64_field(request.POST), request.POST
+
+
+def invalid_background(background):
+    available_backgrounds = photo_processor.get_available_backgrounds()
+    if background not in available_backgrounds:
+        return f"Fundo inválido. Disponíveis: {list(available_backgrounds.keys())}"
+    return None
+
+
+async def run_pipeline(photo_data: bytes, background_key: str, encoding: EncodeOptions = None) -> bytes:
+    """
+    Mesmo fluxo de ``PhotoBackgroundChanger.process_photo``, com cada etapa no StageExecutor
+    """
+    executor = get_stage_executor()
+    with photos_in_progress.track_in_progress():
+        try:
+            digest, result_key, result_bytes = await executor.run(
+                "io", photo_processor.lookup_result, photo_data, background_key, encoding
+            )
+            if result_bytes is not None:
+                outcome = "cached"
+            else:
+                analysis = await executor.run("inference", photo_processor.analyze_photo, photo_data, digest)
+                if analysis is None:
+                    logger.warning("Imagem NSFW detectada.")
+                    result_bytes, outcome = b"", "nsfw"
+                else:
+                    result_bytes = await executor.run(
+                        "render", photo_processor.render_photo, *analysis, background_key, encoding
+                    )
+                    await executor.run("io", photo_processor.store_result, result_key, result_bytes)
+                    outcome = "ok"
+        except Exception:
+            photos_processed.inc(outcome="error")
+            raise
+    photos_processed.inc(outcome=outcome)
+    return result_bytes
+
+
+async def aiter_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@csrf_exempt
+@require_POST
+async def process_photo(request):
+    """
+    Versão assíncrona de ``views.process_photo``
+    """
+    executor = get_stage_executor()
+    error, photo_data = await executor.run("io", read_upload, request)
+    if error is not None:
+        return error_response(error, photo_data)
+
+    background = request.POST.get('background')
+    message = await executor.run("io", invalid_background, background)
+    if message is not None:
+        return error_response(400, message)
+
+    try:
+        encoding = encoding_from_request(request.POST, request.headers.get('Accept'))
+    except InvalidEncoding as e:
+        return error_response(400, str(e))
+
+    try:
+        result_bytes = await run_pipeline(photo_data, background, encoding)
+    except Exception as e:
+        return error_response(500, f"Erro ao processar imagem: {str(e)}")
+
+    response = HttpResponse(
+        content=result_bytes,
+        content_type=encoding.content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename=comicif_result.{encoding.extension}'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def process_photo_all_backgrounds(request):
+    """
+    Versão assíncrona de ``views.process_photo_all_backgrounds``: com Accept: multipart/mixed,
+    cada fundo é enviado assim que sua composição termina, sem ocupar uma thread esperando
+    """
+    executor = get_stage_executor()
+    error, photo_data = await executor.run("io", read_upload, request)
+    if error is not None:
+        return error_response(error, photo_data)
+
+    available_backgrounds = await executor.run("io", photo_processor.get_available_backgrounds)
+    requested = list(dict.fromkeys(
+        key.strip()
+        for value in request.POST.getlist('backgrounds')
+        for key in value.split(',')
+        if key.strip()
+    ))
+    invalid = [key for key in requested if key not in available_backgrounds]
+    if invalid:
+        return error_response(
+            400, f"Fundo(s) inválido(s): {invalid}. Disponíveis: {list(available_backgrounds.keys())}"
+        )
+    backgrounds = requested or list(available_backgrounds)
+
+    try:
+        encoding = encoding_from_request(request.POST)
+    except InvalidEncoding as e:
+        return error_response(400, str(e))
+
+    try:
+        submitted = await executor.run(
+            "inference", photo_processor.submit_backgrounds, photo_data, backgrounds, encoding
+        )
+    except Exception as e:
+        return error_response(500, f"Erro ao processar imagem: {str(e)}")
+    if submitted is None:
+        return error_response(422, "Imagem imprópria detectada")
+    cached, futures = submitted
+
+    async def results():
+        pending = {asyncio.wrap_future(future): key for future, key in futures.items()}
+        try:
+            for item in cached.items():
+                yield item
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    if request.get_preferred_type(['application/zip', 'multipart/mixed']) == 'multipart/mixed':
+        boundary = uuid.uuid4().hex
+
+        async def body():
+            async for background, result_bytes in results():
+                yield format_part_header(
+                    boundary, f"comicif_{background}.{encoding.extension}", encoding.content_type, len(result_bytes)
+                )
+                yield result_bytes
+                yield b"\r\n"
+            yield format_multipart_end(boundary)
+
+        return StreamingHttpResponse(
+            body(),
+            content_type=f"multipart/mixed; boundary={boundary}"
+        )
+
+    try:
+        rendered = [item async for item in results()]
+    except Exception as e:
+        return error_response(500, f"Erro ao processar imagem: {str(e)}")
+
+    def build_zip():
+        # As imagens já são comprimidas: o zip só armazena os arquivos
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+            for background, result_bytes in rendered:
+                zip_file.writestr(f"comicif_{background}.{encoding.extension}", result_bytes)
+        return archive.getvalue()
+
+    response = HttpResponse(
+        content=await executor.run("io", build_zip),
+        content_type="application/zip"
+    )
+    response['Content-Disposition'] = 'attachment; filename=comicif_results.zip'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def process_photo_base64(request):
+    """
+    Versão assíncrona de ``views.process_photo_base64``
+    """
+    executor = get_stage_executor()
+    try:
+        photo_data, fields = await executor.run("io", read_base64_body, request)
+    except PayloadTooLarge:
+        return error_response(413, f"Imagem maior que o limite de {settings.PHOTO_UPLOAD_MAX_BYTES} bytes")
+    except (ValueError, binascii.Error):
+        return error_response(400, "JSON ou base64 inválido")
+
+    if not photo_data:
+        return error_response(400, "photo_base64 é obrigatório")
+
+    problem = await executor.run("io", check_preflight, photo_data)
+    if problem is not None:
+        return error_response(*problem)
+
+    background = fields.get('background')
+    message = await executor.run("io", invalid_background, background)
+    if message is not None:
+        return error_response(400, message)
+
+    try:
+        encoding = encoding_from_request(fields, request.headers.get('Accept'))
+    except InvalidEncoding as e:
+        return error_response(400, str(e))
+
+    try:
+        result_bytes = await run_pipeline(photo_data, background, encoding)
+    except Exception as e:
+        return error_response(500, f"Erro ao processar imagem: {str(e)}")
+
+    image_types = [content_type for _, content_type, *_ in OUTPUT_FORMATS.values()]
+    if request.get_preferred_type(['application/json', *image_types]) != 'application/json':
+        response = HttpResponse(
+            content=result_bytes,
+            content_type=encoding.content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename=comicif_result.{encoding.extension}'
+        return response
+
+    return StreamingHttpResponse(
+        aiter_chunks(iter_base64_json(result_bytes, "result_image", {
+            "background_used": background,
+            "content_type": encoding.content_type,
+        })),
+        content_type="application/json"
+    )
+
+
+async def iter_job_events(job_id: str):
+    """
+    Versão assíncrona de ``views.iter_job_events``: espera entre as leituras sem ocupar uma thread
+    """
+    tracker = JobEventTracker(job_id)
+    while True:
+        for event in tracker.events(await sync_to_async(job_queue.store.get)(job_id)):
+            yield event
+        if tracker.finished:
+            return
+        await asyncio.sleep(settings.PHOTO_JOB_EVENTS_POLL_INTERVAL)
+
+
+@require_GET
+async def get_photo_job_events(request, job_id):
+    """
+    Versão assíncrona de ``views.get_photo_job_events``
+    """
+    job = await sync_to_async(job_queue.store.get)(str(job_id))
+    if job is None:
+        return error_response(404, "Job não encontrado")
+
+    response = StreamingHttpResponse(
+        iter_job_events(job["id"]),
+        content_type="text/event-stream"
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
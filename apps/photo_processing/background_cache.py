@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_asset_path(path: str) -> str:
+    """
+    Resolve o caminho de um asset, aceitando caminhos absolutos,
+    relativos à raiz do projeto ou relativos a ASSETS_ROOT
+    """
+    if os.path.isabs(path):
+        return path
+    for root in (settings.BASE_DIR, settings.ASSETS_ROOT):
+        candidate = os.path.join(root, path)
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join(settings.BASE_DIR, path)
+
+
+class BackgroundCache:
+    """
+    Cache dos fundos já decodificados (arrays uint8 contíguos) e da cor média de cada um,
+    com um LRU limitado por memória das versões já redimensionadas por (chave, largura, altura).
+
+    Os arrays retornados são somente leitura e compartilhados entre requisições.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._paths = {}
+        self._originals = {}
+        self._failed = set()
+        self._means = {}
+        self._versions = {}
+        self._resized = OrderedDict()
+        self._resized_bytes = 0
+        self._lock = threading.Lock()
+
+    def register(self, key: str, path: str) -> None:
+        """
+        Registra (ou atualiza) o caminho de um fundo, descartando o que havia em cache para ele
+        """
+        with self._lock:
+            self._paths[key] = path
+            self._discard(key)
+
+    def sync(self, paths: dict) -> None:
+        """
+        Alinha os fundos registrados com ``paths`` (chave -> caminho), mantendo em cache
+        os que não mudaram de caminho
+        """
+        with self._lock:
+            for key in [key for key in self._paths if key not in paths]:
+                self._paths.pop(key)
+                self._discard(key)
+            for key, path in paths.items():
+                if self._paths.get(key) != path:
+                    self._paths[key] = path
+                    self._discard(key)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._paths.pop(key, None)
+            self._discard(key)
+
+    def _discard(self, key: str) -> None:
+        self._originals.pop(key, None)
+        self._failed.discard(key)
+        self._means.pop(key, None)
+        self._versions.pop(key, None)
+        for cache_key in [cache_key for cache_key in self._resized if cache_key[0] == key]:
+            self._resized_bytes -= self._resized.pop(cache_key).nbytes
+
+    def load_all(self) -> None:
+        """
+        Decodifica todos os fundos registrados
+        """
+        for key in list(self._paths):
+            self._original(key)
+
+    def _original(self, key: str):
+        with self._lock:
+            if key in self._originals:
+                return self._originals[key]
+            path = self._paths.get(key)
+        if path is None or key in self._failed:
+            return None
+
+        try:
+            resolved = resolve_asset_path(path)
+            version = f"{path}:{os.stat(resolved).st_mtime_ns}"
+            with Image.open(resolved) as image:
+                array = np.ascontiguousarray(np.asarray(image.convert('RGB'), dtype=np.uint8))
+        except Exception as e:
+            logger.error(f"Erro ao carregar fundo {key} ({path}): {e}")
+            with self._lock:
+                if self._paths.get(key) == path:
+                    self._failed.add(key)
+            return None
+
+        array.flags.writeable = False
+        mean = np.mean(array, axis=(0, 1))
+        with self._lock:
+            if self._paths.get(key) == path:
+                self._originals[key] = array
+                self._means[key] = mean
+                self._versions[key] = version
+        return array
+
+    def mean_color(self, key: str):
+        """
+        Cor média RGB do fundo, ou None se ele não estiver disponível
+        """
+        if self._original(key) is None:
+            return None
+        return self._means.get(key)
+
+    def version(self, key: str) -> str:
+        """
+        Identifica o conteúdo atual do fundo (caminho e mtime do arquivo), para invalidar resultados em cache
+        """
+        if self._original(key) is None:
+            return "missing"
+        return self._versions.get(key, "missing")
+
+    def get(self, key: str, width: int, height: int):
+        """
+        Retorna o fundo redimensionado para (largura, altura), ou None se ele não estiver disponível
+        """
+        cache_key = (key, width, height)
+        with self._lock:
+            resized = self._resized.get(cache_key)
+            if resized is not None:
+                self._resized.move_to_end(cache_key)
+                return resized
+
+        original = self._original(key)
+        if original is None:
+            return None
+
+        original_height, original_width = original.shape[:2]
+        if (original_width, original_height) == (width, height):
+            return original
+
+        downscale = width * height < original_width * original_height
+        resized = cv2.resize(
+            original, (width, height),
+            interpolation=cv2.INTER_AREA if downscale else cv2.INTER_CUBIC,
+        )
+        resized.flags.writeable = False
+
+        if resized.nbytes <= self.max_bytes:
+            with self._lock:
+                if cache_key not in self._resized and key in self._originals:
+                    self._resized[cache_key] = resized
+                    self._resized_bytes += resized.nbytes
+                    while self._resized_bytes > self.max_bytes:
+                        _, evicted = self._resized.popitem(last=False)
+                        self._resized_bytes -= evicted.nbytes
+        return resized
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_background_cache() -> BackgroundCache:
+    """
+    Retorna o cache de fundos do processo atual
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = BackgroundCache(max_bytes=settings.BACKGROUND_CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,100 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BatchRequest:
+    """
+    Item enviado ao MicroBatcher; guarda o resultado e quanto tempo esperou pelo lote
+    """
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.perf_counter()
+        self.wait_ms = 0.0
+        self.batch_size = 0
+        self._done = threading.Event()
+
+    def wait(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Tempo esgotado aguardando o lote")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MicroBatcher:
+    """
+    Agrupa chamadas concorrentes que chegam dentro de uma janela de ``max_wait_ms``
+    (até ``max_batch_size`` itens) e executa ``batch_fn`` uma única vez para o lote.
+
+    ``batch_fn`` recebe a lista de itens e deve retornar uma lista de resultados na mesma ordem.
+    A thread de despacho é iniciada no primeiro ``submit``, depois de qualquer fork do servidor.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 20, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-dispatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item, timeout: float = None) -> BatchRequest:
+        """
+        Envia o item e bloqueia até o lote ser processado; o resultado fica em ``request.result``
+        """
+        self._ensure_thread()
+        request = BatchRequest(item)
+        self._queue.put(request)
+        request.wait(timeout)
+        return request
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for request in batch:
+                request.wait_ms = (started - request.enqueued_at) * 1000
+                request.batch_size = len(batch)
+            try:
+                results = self.batch_fn([request.item for request in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: lote de {len(batch)} itens retornou {len(results)} resultados")
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                logger.error(f"Erro no lote {self.name} ({len(batch)} itens): {e}")
+                for request in batch:
+                    request.error = e
+            finally:
+                for request in batch:
+                    request._done.set()
+            logger.debug(
+                f"{self.name}: lote de {len(batch)} em {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
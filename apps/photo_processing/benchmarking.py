@@ -0,0 +1,184 @@
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+
+def synthetic_portrait(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    Gera uma imagem RGB sintética com uma silhueta de pessoa (cabeça e tronco)
+    sobre um fundo com gradiente e ruído
+    """
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:, :, 0] = (xs / max(width - 1, 1) * 200).astype(np.uint8)
+    image[:, :, 1] = (ys / max(height - 1, 1) * 200).astype(np.uint8)
+    image[:, :, 2] = 120
+    image += rng.integers(0, 30, size=image.shape, dtype=np.uint8)
+
+    cx = width / 2
+    head = ((xs - cx) / (width * 0.12)) ** 2 + ((ys - height * 0.28) / (height * 0.12)) ** 2 <= 1
+    body = ((xs - cx) / (width * 0.25)) ** 2 + ((ys - height * 0.85) / (height * 0.45)) ** 2 <= 1
+    image[head | body] = (205, 160, 130)
+    return image
+
+
+def synthetic_alpha(width: int, height: int, softness: float = 0.16) -> np.ndarray:
+    """
+    Gera uma máscara alpha uint8 com a mesma silhueta de ``synthetic_portrait`` e bordas suaves
+    (``softness`` é a largura da transição, relativa ao tamanho da silhueta)
+    """
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx = width / 2
+    head = ((xs - cx) / (width * 0.12)) ** 2 + ((ys - height * 0.28) / (height * 0.12)) ** 2
+    body = ((xs - cx) / (width * 0.25)) ** 2 + ((ys - height * 0.85) / (height * 0.45)) ** 2
+    distance = np.minimum(head, body)
+    return (np.clip((1 + softness / 2 - distance) / softness, 0, 1) * 255).astype(np.uint8)
+
+
+def parse_size(value: str):
+    """
+    Converte ``"LARGURAxALTURA"`` em (largura, altura)
+    """
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def summarize(latencies_ms, elapsed_s: float) -> dict:
+    """
+    Resume latências (ms) de uma rodada: throughput, média e percentis
+    """
+    return {
+        "count": len(latencies_ms),
+        "throughput_per_s": len(latencies_ms) / elapsed_s if elapsed_s else 0.0,
+        "mean_ms": float(np.mean(latencies_ms)) if len(latencies_ms) else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
+
+
+def time_call(fn, *args, **kwargs):
+    """
+    Executa ``fn`` e retorna (resultado, duração em ms)
+    """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 95) -> bytes:
+    """
+    Codifica um array RGB em JPEG, como chegaria numa requisição
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def measure_peak(fn, *args, **kwargs):
+    """
+    Executa ``fn`` uma vez e retorna (resultado, pico do tracemalloc, aumento do pico de RSS), em bytes.
+
+    O tracemalloc vê as alocações do Python e do numpy, não as do onnxruntime/torch;
+    o pico de RSS cobre tudo, mas só aumenta quando o processo passa do pico anterior.
+    """
+    from .metrics import peak_rss
+
+    rss_before = peak_rss()
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, peak_rss() - rss_before
+
+
+def benchmark(fn, repeat: int, warmup: bool = True, peak: bool = False) -> dict:
+    """
+    Executa ``fn()`` ``repeat`` vezes e resume as latências com ``summarize``, mais a melhor
+    (``best_ms``). Com ``warmup``, uma execução antes das medidas, fora do resumo; com ``peak``,
+    uma execução extra sob ``measure_peak`` (``peak_traced_mb`` e ``peak_rss_delta_mb``)
+    """
+    if warmup:
+        fn()
+    latencies = [time_call(fn)[1] for _ in range(repeat)]
+    stats = summarize(latencies, sum(latencies) / 1000)
+    stats["best_ms"] = min(latencies) if latencies else 0.0
+    if peak:
+        _, traced, rss_delta = measure_peak(fn)
+        stats["peak_traced_mb"] = traced / 2 ** 20
+        stats["peak_rss_delta_mb"] = rss_delta / 2 ** 20
+    return stats
+
+
+def environment_info() -> dict:
+    """
+    Commit, versões e máquina em que o benchmark rodou, para comparar resultados entre commits
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def write_json(path: str, data: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as output:
+        json.dump(data, output, indent=2)
+
+
+class StubNSFWClassifier:
+    """
+    Classificador que aprova tudo, para medir o pipeline sem o modelo NSFW
+    """
+
+    def scores(self, images: list) -> list:
+        return [0.0 for _ in images]
+
+
+def stub_models(processor) -> None:
+    """
+    Troca os modelos de ``processor`` por stubs: o NSFW aprova tudo e a segmentação devolve a
+    silhueta de ``synthetic_alpha``. O restante do pipeline (proxy, refinamento, composição) é o real.
+
+    Os métodos são substituídos na instância, o que vale mesmo com os modelos já carregados
+    no registry (onde ``register`` não troca um modelo carregado).
+    """
+    from .registry import registry
+
+    registry.register("nsfw_classifier", StubNSFWClassifier)
+
+    def is_nsfw(image, threshold: float = 0.5) -> bool:
+        return False
+
+    def remove_background(image_array: np.ndarray, cancel=None) -> np.ndarray:
+        height, width = image_array.shape[:2]
+        return np.dstack([image_array, synthetic_alpha(width, height)])
+
+    processor.is_nsfw = is_nsfw
+    processor.remove_background = remove_background
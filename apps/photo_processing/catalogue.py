@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .background_cache import get_background_cache
+from .variants import asset_images, load_manifest
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogueSnapshot:
+    backgrounds: dict
+    poses: dict
+    images: dict
+    etag: str
+
+
+class Catalogue:
+    """
+    Fundos e poses cadastrados (modelos Background e Pose), lidos do banco uma vez e mantidos
+    em memória no processo.
+
+    Os signals de save/delete dos modelos invalidam o cache no processo que fez a alteração;
+    nos demais workers, a cópia expira após ``ttl`` segundos.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> CatalogueSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and (not self.ttl or time.monotonic() - self._loaded_at < self.ttl):
+            return snapshot
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._snapshot = self._load()
+                self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def _load(self) -> CatalogueSnapshot:
+        from apps.backgrounds.models import Background
+        from apps.poses.models import Pose
+
+        backgrounds = {
+            background.key: {
+                "name": background.name,
+                "description": background.description,
+                "image_path": background.image_path,
+            }
+            for background in Background.objects.all()
+        }
+        poses = {
+            pose.key: {
+                "name": pose.name,
+                "description": pose.description,
+                "reference_image": pose.reference_image,
+            }
+            for pose in Pose.objects.all()
+        }
+        get_background_cache().sync({key: background["image_path"] for key, background in backgrounds.items()})
+
+        manifest = load_manifest()
+        images = {
+            "backgrounds": asset_images(manifest, "backgrounds", backgrounds),
+            "poses": asset_images(manifest, "poses", poses),
+        }
+
+        content = json.dumps([backgrounds, poses, images], sort_keys=True).encode()
+        etag = hashlib.sha1(content).hexdigest()[:16]
+        logger.debug(f"Catálogo carregado: {len(backgrounds)} fundos, {len(poses)} poses")
+        return CatalogueSnapshot(backgrounds, poses, images, etag)
+
+    def backgrounds(self) -> dict:
+        """
+        Fundos por chave: nome, descrição e caminho da imagem
+        """
+        return self.snapshot().backgrounds
+
+    def poses(self) -> dict:
+        """
+        Poses por chave: nome, descrição e imagem de referência
+        """
+        return self.snapshot().poses
+
+    def images(self) -> dict:
+        """
+        Variantes redimensionadas ("backgrounds"/"poses" -> chave -> src e srcset por formato),
+        das imagens que já passaram por ``generate_asset_variants``
+        """
+        return self.snapshot().images
+
+    def etag(self) -> str:
+        """
+        Identifica o conteúdo atual do catálogo, para os headers ETag dos endpoints de opções
+        """
+        return self.snapshot().etag
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue() -> Catalogue:
+    """
+    Retorna o catálogo do processo atual
+    """
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = Catalogue(ttl=settings.CATALOGUE_CACHE_TTL)
+    return _catalogue
+
+
+def catalogue_etag(request, *args, **kwargs):
+    """
+    ``etag_func`` do decorator ``condition`` nos endpoints de opções
+    """
+    try:
+        return get_catalogue().etag()
+    except Exception as e:
+        # Sem ETag a view roda normalmente e devolve o próprio erro
+        logger.error(f"Erro ao carregar o catálogo: {e}")
+        return None
+
+
+def catalogue_view(view):
+    """
+    Endpoints de opções: ETag do catálogo (304 se o cliente já tem a versão atual, sem executar
+    a view) e Cache-Control público de CATALOGUE_HTTP_MAX_AGE segundos nas respostas sem erro
+    """
+    conditional_view = condition(etag_func=catalogue_etag)(view)
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        if response.status_code < 400:
+            patch_cache_control(response, public=True, max_age=settings.CATALOGUE_HTTP_MAX_AGE)
+        return response
+
+    return wrapped
+
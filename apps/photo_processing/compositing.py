@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+
+from .regions import OPAQUE, TRANSPARENT, AlphaRegions
+
+# Faixa de alpha considerada borda: 0.1 < alpha < 0.9
+EDGE_ALPHA_MIN = 25
+EDGE_ALPHA_MAX = 230
+# Força da correção de cor nas bordas (0.1) em ponto fixo Q8
+COLOR_CORRECTION_Q8 = 26
+
+
+class Compositor:
+    """
+    Composição pessoa/fundo em aritmética inteira (uint16), processada em faixas de linhas.
+
+    Cada thread reaproveita seus próprios buffers intermediários, dimensionados para
+    uma faixa de ``stripe_rows`` linhas, de modo que a memória extra não cresce com a
+    resolução da foto. O resultado difere da versão em float32 em no máximo 1 nível
+    por canal (arredondamento em vez de truncamento, correção de cor de 26/256).
+
+    Só os blocos de borda da máscara (AlphaRegions) são misturados; blocos totalmente
+    transparentes ou opacos são cópias diretas do fundo ou da pessoa, com o mesmo resultado.
+    """
+
+    def __init__(self, stripe_rows: int = 128):
+        self.stripe_rows = stripe_rows
+        self._local = threading.local()
+
+    def _buffers(self, width: int):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers[0].shape[1] != width:
+            shape = (self.stripe_rows, width, 3)
+            buffers = (
+                np.empty(shape, dtype=np.uint16),
+                np.empty(shape, dtype=np.uint16),
+                np.empty(shape[:2] + (1,), dtype=np.uint16),
+            )
+            self._local.buffers = buffers
+        return buffers
+
+    def compose(self, person_rgb: np.ndarray, alpha: np.ndarray, background: np.ndarray,
+                background_mean: np.ndarray = None, out: np.ndarray = None,
+                regions: AlphaRegions = None) -> np.ndarray:
+        """
+        Mistura ``person_rgb`` sobre ``background`` (ambos uint8 HxWx3) usando ``alpha`` (uint8 HxW).
+
+        Com ``background_mean``, os pixels de borda da pessoa recebem 10% da cor média do fundo.
+        ``regions`` são os blocos de ``alpha`` (ex.: devolvidos por ``smooth_alpha_regions``);
+        sem eles, são calculados aqui.
+        """
+        height, width = alpha.shape[:2]
+        if out is None:
+            out = np.empty((height, width, 3), dtype=np.uint8)
+        if regions is None:
+            regions = AlphaRegions.from_alpha(alpha)
+
+        correction = None
+        if background_mean is not None:
+            correction = np.rint(np.asarray(background_mean, dtype=np.float64) * COLOR_CORRECTION_Q8).astype(np.uint16)
+
+        for kind, y0, y1, x0, x1 in regions.runs():
+            if kind == TRANSPARENT:
+                np.copyto(out[y0:y1, x0:x1], background[y0:y1, x0:x1])
+            elif kind == OPAQUE:
+                np.copyto(out[y0:y1, x0:x1], person_rgb[y0:y1, x0:x1])
+            else:
+                self._blend(person_rgb, alpha, background, correction, out, y0, y1, x0, x1)
+
+        return out
+
+    def _blend(self, person_rgb: np.ndarray, alpha: np.ndarray, background: np.ndarray,
+               correction: np.ndarray, out: np.ndarray, y0: int, y1: int, x0: int, x1: int) -> None:
+        columns = slice(x0, x1)
+        accumulator, scratch, weights = self._buffers(alpha.shape[1])
+
+        for top in range(y0, y1, self.stripe_rows):
+            bottom = min(top + self.stripe_rows, y1)
+            rows = bottom - top
+            acc = accumulator[:rows, :x1 - x0]
+            tmp = scratch[:rows, :x1 - x0]
+            a16 = weights[:rows, :x1 - x0]
+            alpha_stripe = alpha[top:bottom, columns]
+
+            np.copyto(acc, person_rgb[top:bottom, columns])
+            np.copyto(a16[:, :, 0], alpha_stripe)
+
+            if correction is not None:
+                edge = (alpha_stripe > EDGE_ALPHA_MIN) & (alpha_stripe < EDGE_ALPHA_MAX)
+                if edge.any():
+                    edge_pixels = acc[edge]
+                    edge_pixels *= 256 - COLOR_CORRECTION_Q8
+                    edge_pixels += correction
+                    edge_pixels >>= 8
+                    acc[edge] = edge_pixels
+
+            # acc = pessoa * a + fundo * (255 - a), dividido por 255 com arredondamento
+            np.multiply(acc, a16, out=acc)
+            np.subtract(255, a16, out=a16)
+            np.multiply(background[top:bottom, columns], a16, out=tmp)
+            np.add(acc, tmp, out=acc)
+            np.add(acc, 128, out=acc)
+            np.right_shift(acc, 8, out=tmp)
+            np.add(acc, tmp, out=acc)
+            np.right_shift(acc, 8, out=acc)
+            np.copyto(out[top:bottom, columns], acc, casting="unsafe")
@@ -0,0 +1,200 @@
+import io
+import logging
+from dataclasses import dataclass, replace
+
+import numpy as np
+from django.conf import settings
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# formato -> (formato do Pillow, content type, extensão, feature do Pillow)
+OUTPUT_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp", "webp"),
+    "avif": ("AVIF", "image/avif", "avif", "avif"),
+}
+JPEG_SUBSAMPLINGS = ("4:4:4", "4:2:2", "4:2:0")
+
+
+class InvalidEncoding(ValueError):
+    """
+    Formato ou parâmetros de saída inválidos ou não suportados por este Pillow
+    """
+
+
+def available_formats() -> list:
+    """
+    Formatos de saída suportados pelo Pillow instalado (AVIF depende do build)
+    """
+    return [name for name, (*_, feature) in OUTPUT_FORMATS.items() if features.check(feature)]
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    format: str = "jpeg"
+    quality: int = 90
+    # JPEG e AVIF
+    subsampling: str = "4:2:0"
+    # JPEG: tabelas de Huffman otimizadas (arquivo menor, uma passada a mais)
+    optimize: bool = False
+    progressive: bool = False
+    # Tamanho máximo do resultado: a qualidade é reduzida (até PHOTO_OUTPUT_MIN_QUALITY) para caber
+    max_bytes: int = None
+
+    @property
+    def content_type(self) -> str:
+        return OUTPUT_FORMATS[self.format][1]
+
+    @property
+    def extension(self) -> str:
+        return OUTPUT_FORMATS[self.format][2]
+
+    def cache_key(self) -> str:
+        return (
+            f"{self.format}-q{self.quality}-{self.subsampling}-o{int(self.optimize)}"
+            f"-p{int(self.progressive)}-{self.max_bytes or 0}"
+        )
+
+
+def default_encoding(**overrides) -> EncodeOptions:
+    """
+    Parâmetros de saída do settings (PHOTO_OUTPUT_*), com ``overrides`` aplicados
+    """
+    options = EncodeOptions(
+        format=settings.PHOTO_OUTPUT_FORMAT,
+        quality=settings.PHOTO_OUTPUT_QUALITY,
+        subsampling=settings.PHOTO_OUTPUT_JPEG_SUBSAMPLING,
+        optimize=settings.PHOTO_OUTPUT_JPEG_OPTIMIZE,
+        progressive=settings.PHOTO_OUTPUT_JPEG_PROGRESSIVE,
+    )
+    return replace(options, **overrides)
+
+
+def _save_params(options: EncodeOptions, quality: int) -> dict:
+    if options.format == "jpeg":
+        return {
+            "quality": quality,
+            "subsampling": options.subsampling,
+            "optimize": options.optimize,
+            "progressive": options.progressive,
+        }
+    if options.format == "webp":
+        return {"quality": quality, "method": settings.PHOTO_OUTPUT_WEBP_METHOD}
+    return {"quality": quality, "subsampling": options.subsampling, "speed": settings.PHOTO_OUTPUT_AVIF_SPEED}
+
+
+def _encode_once(image: Image.Image, options: EncodeOptions, quality: int) -> bytes:
+    output_buffer = io.BytesIO()
+    image.save(output_buffer, format=OUTPUT_FORMATS[options.format][0], **_save_params(options, quality))
+    return output_buffer.getvalue()
+
+
+def encode_image(array: np.ndarray, options: EncodeOptions = None) -> bytes:
+    """
+    Codifica um array RGB uint8 no formato de ``options``.
+
+    ``Image.frombuffer`` lê os pixels direto do buffer do array (sem ``tobytes``); só arrays
+    não contíguos são copiados antes. Com ``max_bytes``, a qualidade é ajustada por busca binária.
+    """
+    options = options or default_encoding()
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    height, width = array.shape[:2]
+    image = Image.frombuffer("RGB", (width, height), array, "raw", "RGB", 0, 1)
+
+    encoded = _encode_once(image, options, options.quality)
+    if options.max_bytes is None or len(encoded) <= options.max_bytes:
+        return encoded
+
+    # Menor arquivo possível se nem a qualidade mínima couber
+    low, high = settings.PHOTO_OUTPUT_MIN_QUALITY, options.quality - 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _encode_once(image, options, quality)
+        if len(candidate) <= options.max_bytes:
+            best, low = candidate, quality + 1
+        else:
+            high = quality - 1
+    if best is None:
+        best = _encode_once(image, options, settings.PHOTO_OUTPUT_MIN_QUALITY)
+        logger.debug(f"Resultado de {len(best)} bytes não coube em max_bytes={options.max_bytes}")
+    return best
+
+
+def _parse_accept(accept: str) -> list:
+    """
+    Tipos de imagem explícitos do header Accept, do preferido para o menos preferido,
+    com seus parâmetros (ex.: ``image/webp;quality=80``)
+    """
+    entries = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *raw_params = [part.strip() for part in item.split(";")]
+        params = {}
+        for raw in raw_params:
+            name, _, value = raw.partition("=")
+            params[name.strip().lower()] = value.strip().strip('"')
+        try:
+            weight = float(params.pop("q", 1))
+        except ValueError:
+            weight = 0
+        if weight > 0 and media_type.lower().startswith("image/") and not media_type.endswith("*"):
+            entries.append((-weight, position, media_type.lower(), params))
+    return [(media_type, params) for _, _, media_type, params in sorted(entries)]
+
+
+def _int_option(name: str, value, minimum: int, maximum: int) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise InvalidEncoding(f"{name} deve ser um número inteiro")
+    if not minimum <= number <= maximum:
+        raise InvalidEncoding(f"{name} deve estar entre {minimum} e {maximum}")
+    return number
+
+
+def encoding_from_request(fields, accept: str = None) -> EncodeOptions:
+    """
+    Parâmetros de saída pedidos pelo cliente: campos ``format``, ``quality``, ``max_bytes`` e
+    ``subsampling`` (formulário, JSON ou query string) ou, na falta do formato, o primeiro tipo
+    de imagem explícito do Accept que este servidor produz, com ``quality``/``max_bytes`` como
+    parâmetros do tipo (``Accept: image/webp;quality=75``)
+    """
+    supported = available_formats()
+    by_content_type = {OUTPUT_FORMATS[name][1]: name for name in supported}
+    accept_params = {}
+
+    requested = fields.get("format")
+    if requested:
+        requested = str(requested).lower().replace("jpg", "jpeg")
+        if requested not in OUTPUT_FORMATS:
+            raise InvalidEncoding(f"Formato {requested} inválido. Disponíveis: {supported}")
+        if requested not in supported:
+            raise InvalidEncoding(f"Formato {requested} não suportado neste servidor. Disponíveis: {supported}")
+    else:
+        for media_type, params in _parse_accept(accept or ""):
+            if media_type in by_content_type:
+                requested, accept_params = by_content_type[media_type], params
+                break
+
+    overrides = {}
+    if requested:
+        overrides["format"] = requested
+        if requested != settings.PHOTO_OUTPUT_FORMAT:
+            overrides["quality"] = settings.PHOTO_OUTPUT_FORMAT_QUALITY.get(requested, settings.PHOTO_OUTPUT_QUALITY)
+
+    quality = fields.get("quality") or accept_params.get("quality")
+    if quality:
+        overrides["quality"] = _int_option("quality", quality, settings.PHOTO_OUTPUT_MIN_QUALITY, 100)
+
+    max_bytes = fields.get("max_bytes") or accept_params.get("max_bytes")
+    if max_bytes:
+        overrides["max_bytes"] = _int_option("max_bytes", max_bytes, 1024, settings.PHOTO_UPLOAD_MAX_BYTES)
+
+    subsampling = fields.get("subsampling")
+    if subsampling:
+        if subsampling not in JPEG_SUBSAMPLINGS:
+            raise InvalidEncoding(f"subsampling deve ser um de {list(JPEG_SUBSAMPLINGS)}")
+        overrides["subsampling"] = subsampling
+
+    return default_encoding(**overrides)
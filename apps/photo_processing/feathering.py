@@ -0,0 +1,114 @@
+import math
+
+import cv2
+import numpy as np
+
+from .regions import TILE_SIZE, AlphaRegions
+
+CROSS_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+
+def _gaussian_ksize(sigma: float, truncate: float) -> int:
+    return 2 * int(math.ceil(truncate * sigma)) + 1
+
+
+def _smooth_patch(patch: np.ndarray, blur_radius: float, feather_size: int) -> np.ndarray:
+    blur_ksize = _gaussian_ksize(blur_radius, 3.0)
+    blurred = cv2.GaussianBlur(patch, (blur_ksize, blur_ksize), blur_radius, borderType=cv2.BORDER_REPLICATE)
+    if feather_size <= 0:
+        return blurred
+
+    _, binary = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY)
+    eroded = cv2.erode(binary, CROSS_KERNEL, iterations=feather_size,
+                       borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    feather_sigma = feather_size / 2
+    feather_ksize = _gaussian_ksize(feather_sigma, 4.0)
+    feathered = cv2.GaussianBlur(eroded, (feather_ksize, feather_ksize), feather_sigma,
+                                 borderType=cv2.BORDER_REFLECT)
+    return np.minimum(blurred, feathered)
+
+
+def smooth_alpha(alpha: np.ndarray, blur_radius: float = 2.5, feather_size: int = 2,
+                 tile_size: int = TILE_SIZE) -> np.ndarray:
+    """
+    Suaviza as bordas da máscara; veja ``smooth_alpha_regions``
+    """
+    return smooth_alpha_regions(alpha, blur_radius, feather_size, tile_size)[0]
+
+
+def smooth_alpha_regions(alpha: np.ndarray, blur_radius: float = 2.5, feather_size: int = 2,
+                         tile_size: int = TILE_SIZE, regions: AlphaRegions = None):
+    """
+    Suaviza e "esfuma" as bordas de uma máscara alpha uint8 (HxW), processando só os
+    blocos próximos da borda da silhueta.
+
+    Equivale a desfocar a máscara (gaussiano de raio ``blur_radius``), erodir a região
+    alpha >= 0.5 por ``feather_size`` iterações e desfocá-la com sigma ``feather_size / 2``,
+    ficando com o mínimo das duas. Blocos cuja vizinhança tem alpha constante ``c`` não mudam
+    (c >= 128) ou zeram (c < 128) e são preenchidos diretamente; os demais são filtrados com
+    OpenCV em janelas com margem suficiente para não haver efeito de borda entre blocos: o
+    resultado é idêntico ao de ``_smooth_patch`` sobre a máscara inteira.
+
+    Tolerância em relação à versão anterior (PIL GaussianBlur + scipy.ndimage): os kernels
+    gaussianos do OpenCV diferem do box blur iterado do PIL em cerca de 1 nível (de 255) na
+    faixa de borda. Onde a máscara desfocada fica em torno de 0.5, essa diferença muda o lado
+    da binarização e a erosão a propaga: pixels isolados chegam a diferir dezenas de níveis
+    (até 95 em máscaras com várias silhuetas), cerca de 1% dos pixels da faixa de borda diferem
+    mais de 4 níveis e a média na imagem inteira fica abaixo de 0.05 nível. Fora da faixa de
+    borda o resultado é idêntico.
+
+    ``regions`` são os blocos de ``alpha`` já calculados (senão são calculados aqui). Retorna
+    (máscara suavizada, AlphaRegions da máscara suavizada), obtidas sem percorrer o resultado
+    de novo: blocos preenchidos são constantes e só os filtrados têm mínimo e máximo medidos.
+    """
+    height, width = alpha.shape[:2]
+    halo = int(math.ceil(3 * blur_radius)) + feather_size + int(math.ceil(2 * feather_size)) + 2
+    tile_size = max(tile_size, halo)
+    if regions is None or regions.tile_size != tile_size:
+        regions = AlphaRegions.from_alpha(alpha, tile_size)
+
+    row_starts = np.arange(0, height, tile_size)
+    col_starts = np.arange(0, width, tile_size)
+    tile_min, tile_max = regions.tile_min, regions.tile_max
+
+    # O halo é menor que um bloco: a vizinhança de um bloco está contida nos 3x3 blocos ao redor
+    neighbourhood = np.ones((3, 3), dtype=np.uint8)
+    near_min = cv2.erode(tile_min, neighbourhood, borderType=cv2.BORDER_REPLICATE)
+    near_max = cv2.dilate(tile_max, neighbourhood, borderType=cv2.BORDER_REPLICATE)
+    uniform = near_min == near_max
+
+    if feather_size > 0:
+        # A erosão trata o lado de fora da imagem como transparente, então blocos opacos
+        # cuja margem alcança a borda da imagem também precisam ser filtrados
+        row_ends = np.minimum(row_starts + tile_size, height)
+        col_ends = np.minimum(col_starts + tile_size, width)
+        row_touches = (row_starts < halo) | (row_ends + halo > height)
+        col_touches = (col_starts < halo) | (col_ends + halo > width)
+        touches_border = row_touches[:, None] | col_touches[None, :]
+        uniform &= ~(touches_border & (near_min >= 128))
+        fill = np.where(near_min >= 128, near_min, 0).astype(np.uint8)
+    else:
+        fill = near_min
+
+    output = cv2.resize(
+        fill, (len(col_starts) * tile_size, len(row_starts) * tile_size),
+        interpolation=cv2.INTER_NEAREST,
+    )[:height, :width]
+    output = np.ascontiguousarray(output)
+    output_min = fill.copy()
+    output_max = fill.copy()
+
+    for ty, tx in zip(*np.nonzero(~uniform)):
+        y0 = int(row_starts[ty])
+        x0 = int(col_starts[tx])
+        y1 = min(y0 + tile_size, height)
+        x1 = min(x0 + tile_size, width)
+        py0, px0 = max(0, y0 - halo), max(0, x0 - halo)
+        py1, px1 = min(height, y1 + halo), min(width, x1 + halo)
+        smoothed = _smooth_patch(alpha[py0:py1, px0:px1], blur_radius, feather_size)
+        tile = smoothed[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        output[y0:y1, x0:x1] = tile
+        output_min[ty, tx] = tile.min()
+        output_max[ty, tx] = tile.max()
+
+    return output, AlphaRegions(height, width, tile_size, output_min, output_max)
@@ -0,0 +1,322 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    QUEUED = 'queued'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    FINISHED = (DONE, FAILED)
+
+    CHOICES = [
+        (QUEUED, 'Na fila'),
+        (PROCESSING, 'Processando'),
+        (DONE, 'Concluído'),
+        (FAILED, 'Falhou'),
+    ]
+
+
+class JobQueueFull(Exception):
+    """
+    A fila de processamento atingiu o limite configurado
+    """
+
+
+class BaseJobStore:
+    """
+    Interface de armazenamento do estado e do resultado dos jobs.
+
+    ``get`` retorna um dict com ``id``, ``status``, ``background``, ``error``,
+    ``preview_ready``, ``created_at`` e ``updated_at``, ou None se o job não existir.
+    """
+
+    def create(self, background: str) -> str:
+        raise NotImplementedError
+
+    def mark_processing(self, job_id: str) -> None:
+        raise NotImplementedError
+
+    def mark_preview(self, job_id: str, preview: bytes) -> None:
+        raise NotImplementedError
+
+    def mark_done(self, job_id: str, result: bytes) -> None:
+        raise NotImplementedError
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str):
+        raise NotImplementedError
+
+    def get_result(self, job_id: str):
+        raise NotImplementedError
+
+    def get_preview(self, job_id: str):
+        raise NotImplementedError
+
+    def purge(self, older_than: timedelta, stale_after: timedelta = None) -> int:
+        """
+        Remove os jobs concluídos ou com falha sem atualização há mais de ``older_than`` e,
+        com ``stale_after``, também os que continuam na fila ou em processamento há mais que isso
+        (worker parado ou reiniciado). Retorna quantos foram removidos.
+        """
+        raise NotImplementedError
+
+
+class InMemoryJobStore(BaseJobStore):
+    """
+    Armazena os jobs em memória; útil com um único worker ou em desenvolvimento
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._results = {}
+        self._previews = {}
+        self._lock = threading.Lock()
+
+    def create(self, background: str) -> str:
+        job_id = str(uuid.uuid4())
+        now = timezone.now()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": JobStatus.QUEUED,
+                "background": background,
+                "error": "",
+                "preview_ready": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+        return job_id
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=timezone.now())
+
+    def mark_processing(self, job_id: str) -> None:
+        self._update(job_id, status=JobStatus.PROCESSING)
+
+    def mark_preview(self, job_id: str, preview: bytes) -> None:
+        with self._lock:
+            self._previews[job_id] = preview
+        self._update(job_id, preview_ready=True)
+
+    def mark_done(self, job_id: str, result: bytes) -> None:
+        with self._lock:
+            self._results[job_id] = result
+        self._update(job_id, status=JobStatus.DONE)
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._update(job_id, status=JobStatus.FAILED, error=error)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def get_result(self, job_id: str):
+        with self._lock:
+            return self._results.get(job_id)
+
+    def get_preview(self, job_id: str):
+        with self._lock:
+            return self._previews.get(job_id)
+
+    def purge(self, older_than: timedelta, stale_after: timedelta = None) -> int:
+        now = timezone.now()
+        limit = now - older_than
+        stale_limit = now - stale_after if stale_after is not None else None
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if (job["status"] in JobStatus.FINISHED and job["updated_at"] < limit)
+                or (stale_limit is not None and job["updated_at"] < stale_limit)
+            ]
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._results.pop(job_id, None)
+                self._previews.pop(job_id, None)
+        return len(expired)
+
+
+class DatabaseJobStore(BaseJobStore):
+    """
+    Armazena os jobs no banco configurado em DATABASES (SQLite por padrão),
+    permitindo consultar o status a partir de qualquer worker
+    """
+
+    def _model(self):
+        from .models import PhotoJob
+        return PhotoJob
+
+    def create(self, background: str) -> str:
+        job = self._model().objects.create(background=background)
+        return str(job.id)
+
+    def _update(self, job_id: str, **fields) -> None:
+        self._model().objects.filter(id=job_id).update(updated_at=timezone.now(), **fields)
+
+    def mark_processing(self, job_id: str) -> None:
+        self._update(job_id, status=JobStatus.PROCESSING)
+
+    def mark_preview(self, job_id: str, preview: bytes) -> None:
+        self._update(job_id, preview=preview)
+
+    def mark_done(self, job_id: str, result: bytes) -> None:
+        self._update(job_id, status=JobStatus.DONE, result=result)
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._update(job_id, status=JobStatus.FAILED, error=error)
+
+    def get(self, job_id: str):
+        job = (
+            self._model().objects
+            .filter(id=job_id)
+            .annotate(preview_ready=ExpressionWrapper(Q(preview__isnull=False), output_field=BooleanField()))
+            .values('id', 'status', 'background', 'error', 'preview_ready', 'created_at', 'updated_at')
+            .first()
+        )
+        if job is not None:
+            job["id"] = str(job["id"])
+        return job
+
+    def get_result(self, job_id: str):
+        result = self._model().objects.filter(id=job_id).values_list('result', flat=True).first()
+        return bytes(result) if result is not None else None
+
+    def get_preview(self, job_id: str):
+        preview = self._model().objects.filter(id=job_id).values_list('preview', flat=True).first()
+        return bytes(preview) if preview is not None else None
+
+    def purge(self, older_than: timedelta, stale_after: timedelta = None) -> int:
+        now = timezone.now()
+        expired = Q(status__in=JobStatus.FINISHED, updated_at__lt=now - older_than)
+        if stale_after is not None:
+            expired |= Q(updated_at__lt=now - stale_after)
+        deleted, _ = self._model().objects.filter(expired).delete()
+        return deleted
+
+
+class PhotoJobQueue:
+    """
+    Fila limitada de jobs de processamento atendida por um pool de threads do próprio processo.
+
+    As threads são iniciadas no primeiro ``submit``, depois de qualquer fork do servidor.
+    Os bytes da foto ficam apenas em memória: jobs ainda na fila se perdem se o worker reiniciar.
+    Jobs concluídos expiram pelo ``ttl``; os que ficam na fila ou em processamento, pelo
+    ``stale_ttl``, bem mais longo, para que um job demorado não suma enquanto o cliente espera.
+    """
+
+    def __init__(self, handler, store: BaseJobStore, workers: int = 1, max_pending: int = 8, ttl: float = 3600,
+                 stale_ttl: float = 24 * 3600):
+        self.handler = handler
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.ttl = timedelta(seconds=ttl)
+        self.stale_ttl = timedelta(seconds=max(ttl, stale_ttl))
+        self._queue = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._threads = []
+        self._lock = threading.Lock()
+        # Jobs expirados são removidos no máximo a cada ttl / 10, não a cada envio
+        self._purge_interval = self.ttl.total_seconds() / 10
+        self._last_purge = float("-inf")
+        self._purge_lock = threading.Lock()
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"photo-job-worker-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, photo_data: bytes, background: str, preview: bool = False) -> str:
+        """
+        Enfileira a foto e retorna o id do job; levanta JobQueueFull se a fila estiver cheia.
+
+        Com ``preview``, o handler recebe ``on_preview`` e a prévia fica disponível no store
+        antes do resultado final. O job roda no contexto de quem o enviou (id da requisição nos logs).
+        """
+        if self._queue.full():
+            raise JobQueueFull("Fila de processamento cheia")
+
+        self._ensure_workers()
+        self._purge_expired()
+        job_id = self.store.create(background)
+        try:
+            self._queue.put_nowait((contextvars.copy_context(), job_id, photo_data, background, preview))
+        except queue.Full:
+            self.store.mark_failed(job_id, "Fila de processamento cheia")
+            raise JobQueueFull("Fila de processamento cheia")
+        return job_id
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        with self._purge_lock:
+            if now - self._last_purge < self._purge_interval:
+                return
+            self._last_purge = now
+        self.store.purge(self.ttl, self.stale_ttl)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        while True:
+            context, job_id, photo_data, background, preview = self._queue.get()
+            try:
+                context.run(self._process, job_id, photo_data, background, preview)
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    def _process(self, job_id: str, photo_data: bytes, background: str, preview: bool = False) -> None:
+        started = time.perf_counter()
+        try:
+            self.store.mark_processing(job_id)
+            kwargs = {}
+            if preview:
+                kwargs["on_preview"] = lambda preview_bytes: self._store_preview(job_id, preview_bytes, started)
+            result = self.handler(photo_data, background, **kwargs)
+            if not result:
+                self.store.mark_failed(job_id, "Imagem rejeitada pela verificação de conteúdo")
+            else:
+                self.store.mark_done(job_id, result)
+            logger.info(f"Job {job_id} finalizado em {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Erro ao processar job {job_id}: {e}")
+            try:
+                self.store.mark_failed(job_id, f"Erro ao processar imagem: {e}")
+            except Exception as store_error:
+                logger.error(f"Erro ao registrar falha do job {job_id}: {store_error}")
+
+    def _store_preview(self, job_id: str, preview_bytes: bytes, started: float) -> None:
+        self.store.mark_preview(job_id, preview_bytes)
+        logger.info(f"Prévia do job {job_id} pronta em {time.perf_counter() - started:.2f}s")
+
+
+def get_job_store() -> BaseJobStore:
+    """
+    Instancia o store configurado em PHOTO_JOB_STORE
+    """
+    return import_string(settings.PHOTO_JOB_STORE)()
@@ -0,0 +1,47 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageFilter
+
+from apps.photo_processing.benchmarking import benchmark, parse_size, synthetic_alpha
+from apps.photo_processing.feathering import smooth_alpha
+
+
+def reference_smooth_alpha(alpha: np.ndarray, blur_radius: float = 2.5, feather_size: int = 2) -> np.ndarray:
+    """
+    Implementação anterior: GaussianBlur do PIL e morfologia do scipy sobre a imagem inteira
+    """
+    from scipy.ndimage import binary_erosion, gaussian_filter
+
+    blurred = Image.fromarray(alpha).filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    smoothed = np.array(blurred).astype(np.float32) / 255.0
+    if feather_size > 0:
+        eroded = binary_erosion(smoothed > 0.5, iterations=feather_size)
+        feathered = gaussian_filter(eroded.astype(np.float32), sigma=feather_size / 2)
+        smoothed = np.minimum(smoothed, feathered)
+    return (smoothed * 255 + 0.5).astype(np.uint8)
+
+
+class Command(BaseCommand):
+    help = "Compara a suavização de bordas por blocos com a implementação anterior (tempo e diferença)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=["1152x864", "4000x3000", "6000x4000"])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            width, height = parse_size(size)
+            alpha = synthetic_alpha(width, height)
+            expected = reference_smooth_alpha(alpha)
+            result = smooth_alpha(alpha)
+
+            # expected e result já aqueceram as duas implementações
+            reference_ms = benchmark(lambda: reference_smooth_alpha(alpha), options["repeat"], warmup=False)["best_ms"]
+            tiled_ms = benchmark(lambda: smooth_alpha(alpha), options["repeat"], warmup=False)["best_ms"]
+            diff = np.abs(expected.astype(np.int16) - result.astype(np.int16))
+
+            self.stdout.write(
+                f"{size}: anterior {reference_ms:8.1f}ms  por blocos {tiled_ms:8.1f}ms  "
+                f"diferença máx {diff.max()}  média {diff.mean():.4f}  "
+                f"pixels com diferença > 4: {int((diff > 4).sum())}"
+            )
@@ -0,0 +1,64 @@
+import base64
+import io
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from apps.photo_processing.benchmarking import benchmark
+from apps.photo_processing.streaming import StreamingJSONReader, iter_base64_json
+
+
+def reference_roundtrip(body: bytes) -> int:
+    """
+    Caminho anterior: request.data (json.loads), b64decode, b64encode e JSONRenderer
+    """
+    data = json.loads(body)
+    photo_data = base64.b64decode(data["photo_base64"])
+    result_base64 = base64.b64encode(photo_data).decode()
+    content = JSONRenderer().render({"result_image": result_base64, "background_used": data["background"]})
+    return len(content)
+
+
+def streaming_roundtrip(body: bytes) -> int:
+    """
+    Caminho atual: leitura incremental do JSON e resposta gerada em pedaços
+    """
+    photo_data, fields = StreamingJSONReader(io.BytesIO(body), "photo_base64", size_hint=len(body)).read()
+    return sum(
+        len(chunk)
+        for chunk in iter_base64_json(photo_data, "result_image", {"background_used": fields["background"]})
+    )
+
+
+class Command(BaseCommand):
+    help = "Mede tempo e pico de memória do endpoint base64 (decodificação e resposta) contra o caminho anterior"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes-mb", nargs="+", type=float, default=[1, 5, 10],
+                            help="Tamanho da foto (já decodificada) em MB")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        for size_mb in options["sizes_mb"]:
+            # Bytes aleatórios se comportam como um JPEG: não comprimem e usam todo o alfabeto base64
+            photo = rng.integers(0, 256, size=int(size_mb * 2 ** 20), dtype=np.uint8).tobytes()
+            body = json.dumps({"photo_base64": base64.b64encode(photo).decode(), "background": "beach"}).encode()
+
+            implementations = {
+                "anterior": lambda: reference_roundtrip(body),
+                "streaming": lambda: streaming_roundtrip(body),
+            }
+            lengths = {}
+            self.stdout.write(f"{size_mb:g}MB (corpo {len(body) / 2 ** 20:.1f}MB):")
+            for name, fn in implementations.items():
+                lengths[name] = fn()
+                stats = benchmark(fn, options["repeat"], warmup=False, peak=True)
+                self.stdout.write(f"  {name:<10} {stats['best_ms']:8.1f}ms  pico {stats['peak_traced_mb']:8.1f}MB")
+
+            if lengths["anterior"] != lengths["streaming"]:
+                self.stdout.write(self.style.WARNING(
+                    f"  respostas com tamanhos diferentes: {lengths['anterior']} e {lengths['streaming']}"
+                ))
@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from apps.photo_processing.batching import MicroBatcher
+from apps.photo_processing.benchmarking import parse_size, summarize, synthetic_portrait, time_call
+from apps.photo_processing.services import nsfw_scores_batch, segment_batch
+
+
+class Command(BaseCommand):
+    help = "Compara a inferência um a um com o micro-batching para NSFW e segmentação"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=32)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--size", default="640x480", help="LARGURAxALTURA das imagens sintéticas")
+        parser.add_argument("--max-batch", type=int, default=8)
+        parser.add_argument("--window-ms", type=float, default=20)
+
+    def handle(self, *args, **options):
+        width, height = parse_size(options["size"])
+        images = [synthetic_portrait(width, height, seed=i) for i in range(options["requests"])]
+        pil_images = [Image.fromarray(image) for image in images]
+
+        # Aquece os modelos para não medir o carregamento
+        nsfw_scores_batch(pil_images[:1])
+        segment_batch(images[:1])
+
+        stages = {
+            "nsfw": (nsfw_scores_batch, pil_images),
+            "segmentation": (segment_batch, images),
+        }
+        for stage, (batch_fn, items) in stages.items():
+            sequential = self._run(lambda item: batch_fn([item])[0], items, options["concurrency"])
+            batcher = MicroBatcher(
+                batch_fn,
+                max_batch_size=options["max_batch"],
+                max_wait_ms=options["window_ms"],
+                name=f"bench-{stage}",
+            )
+            waits = []
+
+            def batched(item):
+                request = batcher.submit(item)
+                waits.append(request.wait_ms)
+                return request.result
+
+            micro_batched = self._run(batched, items, options["concurrency"])
+            self.stdout.write(f"{stage}:")
+            self._report("um a um", sequential)
+            self._report("micro-batching", micro_batched)
+            self.stdout.write(f"  espera média no lote: {np.mean(waits):.1f}ms (máx {np.max(waits):.1f}ms)")
+
+    def _run(self, fn, items, concurrency: int) -> dict:
+        latencies = []
+
+        def timed(item):
+            latencies.append(time_call(fn, item)[1])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, items))
+        return summarize(latencies, time.perf_counter() - started)
+
+    def _report(self, label: str, stats: dict) -> None:
+        self.stdout.write(
+            f"  {label:<15} {stats['throughput_per_s']:7.2f} img/s  "
+            f"p50 {stats['p50_ms']:8.1f}ms  p95 {stats['p95_ms']:8.1f}ms"
+        )
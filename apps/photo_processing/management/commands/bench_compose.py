@@ -0,0 +1,63 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.photo_processing.benchmarking import benchmark, synthetic_alpha, synthetic_portrait
+from apps.photo_processing.compositing import Compositor
+
+SIZES = {
+    "1MP": (1152, 864),
+    "12MP": (4000, 3000),
+    "24MP": (6000, 4000),
+}
+
+
+def reference_compose(person_rgb: np.ndarray, alpha: np.ndarray, background: np.ndarray,
+                      background_mean: np.ndarray) -> np.ndarray:
+    """
+    Implementação anterior em float, com np.where por canal (sem a suavização do alpha)
+    """
+    alpha = alpha[:, :, None] / 255.0
+    person_rgb = person_rgb.copy().astype(np.float32)
+    edge_mask = (alpha > 0.1) & (alpha < 0.9)
+    if np.any(edge_mask):
+        color_correction_strength = 0.1
+        for channel in range(3):
+            person_rgb[:, :, channel] = np.where(
+                edge_mask.squeeze(),
+                person_rgb[:, :, channel] * (1 - color_correction_strength) +
+                background_mean[channel] * color_correction_strength,
+                person_rgb[:, :, channel]
+            )
+    result = person_rgb * alpha + background * (1 - alpha)
+    return result.astype(np.uint8)
+
+
+class Command(BaseCommand):
+    help = "Mede tempo e pico de memória da composição atual contra a implementação anterior"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        compositor = Compositor()
+        for label in options["sizes"]:
+            width, height = SIZES[label]
+            person = synthetic_portrait(width, height, seed=1)
+            background = synthetic_portrait(width, height, seed=2)[::-1].copy()
+            alpha = synthetic_alpha(width, height)
+            mean = background.mean(axis=(0, 1))
+
+            implementations = {
+                "anterior": lambda: reference_compose(person, alpha, background, mean),
+                "inteira": lambda: compositor.compose(person, alpha, background, mean),
+            }
+            outputs = {}
+            self.stdout.write(f"{label} ({width}x{height}):")
+            for name, fn in implementations.items():
+                outputs[name] = fn()
+                stats = benchmark(fn, options["repeat"], warmup=False, peak=True)
+                self.stdout.write(f"  {name:<9} {stats['best_ms']:8.1f}ms  pico {stats['peak_traced_mb']:8.1f}MB")
+
+            diff = np.abs(outputs["anterior"].astype(np.int16) - outputs["inteira"].astype(np.int16))
+            self.stdout.write(f"  diferença máxima {diff.max()} nível(is), média {diff.mean():.3f}")
@@ -0,0 +1,87 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from PIL import Image
+
+from apps.photo_processing.benchmarking import (
+    benchmark, environment_info, parse_size, synthetic_alpha, synthetic_portrait, write_json,
+)
+from apps.photo_processing.background_cache import resolve_asset_path
+from apps.photo_processing.encoding import EncodeOptions, available_formats, encode_image
+
+SIZES = {
+    "0.3MP": "640x480",
+    "2MP": "1600x1200",
+    "12MP": "4000x3000",
+}
+
+# nome -> (opções, settings sobrescritos)
+CONFIGS = {
+    "jpeg q95 (anterior)": (EncodeOptions("jpeg", 95), {}),
+    "jpeg q90": (EncodeOptions("jpeg", 90), {}),
+    "jpeg q90 optimize": (EncodeOptions("jpeg", 90, optimize=True), {}),
+    "jpeg q90 progressive": (EncodeOptions("jpeg", 90, progressive=True), {}),
+    "jpeg q90 4:4:4": (EncodeOptions("jpeg", 90, subsampling="4:4:4"), {}),
+    "webp q80 method 4": (EncodeOptions("webp", 80), {"PHOTO_OUTPUT_WEBP_METHOD": 4}),
+    "webp q80 method 0": (EncodeOptions("webp", 80), {"PHOTO_OUTPUT_WEBP_METHOD": 0}),
+    "avif q60 speed 8": (EncodeOptions("avif", 60), {"PHOTO_OUTPUT_AVIF_SPEED": 8}),
+}
+
+
+class Command(BaseCommand):
+    help = "Mede tempo de codificação e tamanho do resultado por formato e parâmetros, em resoluções comuns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=list(SIZES),
+                            help=f"Rótulos ({', '.join(SIZES)}) ou LARGURAxALTURA")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--background", default="assets/backgrounds/beach.jpeg",
+                            help="Imagem usada como fundo da composição sintética")
+        parser.add_argument("--output", help="Grava os resultados em JSON neste caminho")
+
+    def handle(self, *args, **options):
+        formats = available_formats()
+        configs = {name: config for name, config in CONFIGS.items() if config[0].format in formats}
+        with Image.open(resolve_asset_path(options["background"])) as background_image:
+            background_image = background_image.convert("RGB")
+
+        results = {}
+        for label in options["sizes"]:
+            width, height = parse_size(SIZES.get(label, label))
+            composed = self._composite(background_image, width, height)
+            self.stdout.write(f"{width}x{height} ({width * height / 1e6:.1f}MP):")
+            results[label] = {"width": width, "height": height, "configs": {}}
+            for name, (encoding, overrides) in configs.items():
+                with override_settings(**overrides):
+                    stats = self._run(composed, encoding, options["repeat"])
+                results[label]["configs"][name] = stats
+                self.stdout.write(
+                    f"  {name:<21} p50 {stats['p50_ms']:8.1f}ms  {stats['bytes'] / 1024:8.1f}KB  "
+                    f"{stats['bits_per_pixel']:5.2f} bpp"
+                )
+
+        if options["output"]:
+            write_json(options["output"], {
+                "environment": environment_info(),
+                "options": {key: options[key] for key in ("sizes", "repeat", "background")},
+                "formats": formats,
+                "results": results,
+            })
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+    def _composite(self, background_image: Image.Image, width: int, height: int) -> np.ndarray:
+        """
+        Pessoa sintética sobre um fundo real, parecido com um resultado do pipeline
+        """
+        background = np.asarray(background_image.resize((width, height), Image.Resampling.LANCZOS), dtype=np.float32)
+        person = synthetic_portrait(width, height).astype(np.float32)
+        alpha = synthetic_alpha(width, height).astype(np.float32)[..., None] / 255
+        return np.ascontiguousarray(person * alpha + background * (1 - alpha), dtype=np.uint8)
+
+    def _run(self, composed: np.ndarray, encoding: EncodeOptions, repeat: int) -> dict:
+        encoded = encode_image(composed, encoding)
+        stats = benchmark(lambda: encode_image(composed, encoding), repeat, warmup=False)
+        height, width = composed.shape[:2]
+        stats["bytes"] = len(encoded)
+        stats["bits_per_pixel"] = len(encoded) * 8 / (width * height)
+        return stats
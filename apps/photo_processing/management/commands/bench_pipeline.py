@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.photo_processing.benchmarking import (
+    benchmark, encode_jpeg, environment_info, parse_size, stub_models, synthetic_portrait, write_json,
+)
+from apps.photo_processing.nsfw import nsfw_thumbnail
+from apps.photo_processing.services import PhotoBackgroundChanger
+
+SIZES = {
+    "0.3MP": "640x480",
+    "2MP": "1600x1200",
+    "12MP": "4000x3000",
+}
+
+
+class Command(BaseCommand):
+    help = "Mede latência, throughput e pico de memória de cada etapa do PhotoBackgroundChanger"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=list(SIZES),
+                            help=f"Rótulos ({', '.join(SIZES)}) ou LARGURAxALTURA")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--background", default="beach")
+        parser.add_argument("--stub-models", action="store_true",
+                            help="Substitui NSFW e segmentação por stubs (roda sem os modelos)")
+        parser.add_argument("--output", help="Grava os resultados em JSON neste caminho")
+        parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar o p50 de cada etapa")
+
+    def handle(self, *args, **options):
+        processor = PhotoBackgroundChanger()
+        if options["stub_models"]:
+            stub_models(processor)
+
+        results = {}
+        # O cache de resultados esconderia o custo das etapas a partir da segunda repetição
+        with override_settings(RESULT_CACHE_ENABLED=False):
+            for label in options["sizes"]:
+                width, height = parse_size(SIZES.get(label, label))
+                results[label] = self._run_size(processor, width, height, options)
+
+        data = {
+            "environment": environment_info(),
+            "options": {key: options[key] for key in ("sizes", "repeat", "background", "stub_models")},
+            "results": results,
+        }
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                self._compare(json.load(baseline_file), results)
+        if options["output"]:
+            write_json(options["output"], data)
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+    def _stages(self, processor, photo_data: bytes, background: str) -> dict:
+        """
+        Cada etapa do pipeline, na ordem, recebendo o resultado da anterior
+        """
+        def compose(state):
+            person_array, (smoothed_alpha, regions) = state["person_array"], state["smoothed"]
+            height, width = person_array.shape[:2]
+            background_array = processor.background_cache.get(background, width, height)
+            if background_array is None:
+                background_array = np.asarray(processor.create_colored_background((height, width), background))
+            return processor.compositor.compose(
+                person_array, smoothed_alpha, background_array, background_array.mean(axis=(0, 1)),
+                regions=regions,
+            )
+
+        def encode(state):
+            return encode_jpeg(state["composed"])
+
+        return {
+            "decode": ("image", lambda state: processor.decode_photo(photo_data)),
+            "nsfw_thumbnail": ("thumbnail", lambda state: nsfw_thumbnail(state["image"])),
+            "nsfw": ("nsfw", lambda state: processor.is_nsfw(state["thumbnail"])),
+            "to_array": ("person_array", lambda state: np.array(state["image"].convert("RGB"))),
+            "segmentation": ("alpha", lambda state: processor.segment_alpha(state["person_array"])),
+            "smooth_alpha": ("smoothed", lambda state: processor.smooth_alpha_regions(
+                state["alpha"], blur_radius=2.5, feather_size=2)),
+            "compose": ("composed", compose),
+            "encode": ("result", encode),
+            "end_to_end": (None, lambda state: processor.process_photo(photo_data, background)),
+        }
+
+    def _run_size(self, processor, width: int, height: int, options) -> dict:
+        photo_data = encode_jpeg(synthetic_portrait(width, height))
+        self.stdout.write(f"{width}x{height} ({width * height / 1e6:.1f}MP, {len(photo_data) / 2 ** 20:.1f}MB JPEG):")
+
+        stages = self._stages(processor, photo_data, options["background"])
+        state = {}
+        # Primeira passada: aquece modelos e caches de fundo e prepara as entradas de cada etapa
+        for key, fn in stages.values():
+            value = fn(state)
+            if key:
+                state[key] = value
+
+        report = {"width": width, "height": height, "input_bytes": len(photo_data), "stages": {}}
+        for name, (key, fn) in stages.items():
+            stats = benchmark(lambda: fn(state), options["repeat"], warmup=False, peak=True)
+            report["stages"][name] = stats
+            self.stdout.write(
+                f"  {name:<14} p50 {stats['p50_ms']:8.1f}ms  p95 {stats['p95_ms']:8.1f}ms  "
+                f"p99 {stats['p99_ms']:8.1f}ms  {stats['throughput_per_s']:7.2f}/s  "
+                f"pico {stats['peak_traced_mb']:7.1f}MB"
+            )
+        return report
+
+    def _compare(self, baseline: dict, results: dict) -> None:
+        commit = baseline.get("environment", {}).get("commit")
+        self.stdout.write(f"Comparação com {commit or 'a execução anterior'} (p50 atual / anterior):")
+        for label, report in results.items():
+            previous = baseline.get("results", {}).get(label)
+            if previous is None:
+                continue
+            self.stdout.write(f"  {label}:")
+            for name, stats in report["stages"].items():
+                old = previous["stages"].get(name)
+                if not old or not old["p50_ms"]:
+                    continue
+                ratio = stats["p50_ms"] / old["p50_ms"]
+                line = f"    {name:<14} {stats['p50_ms']:8.1f}ms / {old['p50_ms']:8.1f}ms  ({ratio:.2f}x)"
+                self.stdout.write(self.style.WARNING(line) if ratio > 1.1 else line)
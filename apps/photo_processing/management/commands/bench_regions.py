@@ -0,0 +1,110 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.photo_processing.benchmarking import (
+    benchmark, environment_info, parse_size, synthetic_alpha, synthetic_portrait, write_json,
+)
+from apps.photo_processing.compositing import Compositor
+from apps.photo_processing.feathering import smooth_alpha_regions
+from apps.photo_processing.masks import MaskStore
+from apps.photo_processing.regions import AlphaRegions
+
+SIZES = {
+    "2MP": "1600x1200",
+    "12MP": "4000x3000",
+}
+
+# Enquadramento -> altura da silhueta em relação à foto
+FRAMINGS = {
+    "retrato": 1.0,
+    "meio corpo": 0.7,
+    "corpo inteiro": 0.45,
+}
+# Transição das bordas parecida com a de uma máscara do U2Net ampliada: poucos pixels
+EDGE_SOFTNESS = 0.02
+
+
+def framed_alpha(width: int, height: int, scale: float) -> np.ndarray:
+    """
+    Silhueta de ``synthetic_alpha`` reduzida por ``scale``, centralizada na base da foto
+    """
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    subject_w, subject_h = max(1, round(width * scale)), max(1, round(height * scale))
+    x0 = (width - subject_w) // 2
+    alpha[height - subject_h:, x0:x0 + subject_w] = synthetic_alpha(subject_w, subject_h, EDGE_SOFTNESS)
+    return alpha
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede suavização e composição restritas aos blocos de borda da máscara contra a composição "
+        "do quadro inteiro, em retratos com enquadramentos comuns (e máscaras reais do MaskStore)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=list(SIZES),
+                            help=f"Rótulos ({', '.join(SIZES)}) ou LARGURAxALTURA")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--mask-store", type=int, default=0, metavar="N",
+                            help="Inclui até N máscaras reais de MASK_STORE_ROOT")
+        parser.add_argument("--output", help="Grava os resultados em JSON neste caminho")
+
+    def handle(self, *args, **options):
+        cases = {}
+        for label in options["sizes"]:
+            width, height = parse_size(SIZES.get(label, label))
+            for framing, scale in FRAMINGS.items():
+                cases[f"{label} {framing}"] = framed_alpha(width, height, scale)
+        if options["mask_store"]:
+            store = MaskStore(settings.MASK_STORE_ROOT)
+            for digest in list(store.digests())[:options["mask_store"]]:
+                alpha = store.load(digest)
+                if alpha is not None:
+                    cases[f"máscara {digest[:8]}"] = alpha
+
+        compositor = Compositor()
+        results = {}
+        for name, alpha in cases.items():
+            results[name] = self._run(compositor, alpha, options["repeat"])
+            stats = results[name]
+            self.stdout.write(
+                f"{name:<22} {alpha.shape[1]}x{alpha.shape[0]}  borda {stats['coverage']['edge']:5.1%}  "
+                f"opaco {stats['coverage']['opaque']:5.1%}  suavização {stats['smooth']['p50_ms']:7.1f}ms  "
+                f"composição {stats['full_frame']['p50_ms']:7.1f}ms -> {stats['regions']['p50_ms']:7.1f}ms "
+                f"({stats['full_frame']['p50_ms'] / max(stats['regions']['p50_ms'], 1e-9):.1f}x)"
+            )
+
+        if options["output"]:
+            write_json(options["output"], {
+                "environment": environment_info(),
+                "options": {key: options[key] for key in ("sizes", "repeat", "mask_store")},
+                "results": results,
+            })
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+    def _run(self, compositor: Compositor, alpha: np.ndarray, repeat: int) -> dict:
+        height, width = alpha.shape
+        person = synthetic_portrait(width, height, seed=1)
+        background = synthetic_portrait(width, height, seed=2)[::-1].copy()
+        mean = background.mean(axis=(0, 1))
+        smoothed, regions = smooth_alpha_regions(alpha)
+        full_frame = AlphaRegions.full_frame(height, width, regions.tile_size)
+
+        expected = compositor.compose(person, smoothed, background, mean, regions=full_frame)
+        if not np.array_equal(expected, compositor.compose(person, smoothed, background, mean, regions=regions)):
+            self.stderr.write("  composição por regiões difere do quadro inteiro")
+
+        return {
+            "width": width,
+            "height": height,
+            "coverage": regions.coverage(),
+            "bounding_box": regions.bounding_box(),
+            "smooth": benchmark(lambda: smooth_alpha_regions(alpha), repeat),
+            "full_frame": benchmark(
+                lambda: compositor.compose(person, smoothed, background, mean, regions=full_frame), repeat
+            ),
+            "regions": benchmark(
+                lambda: compositor.compose(person, smoothed, background, mean, regions=regions), repeat
+            ),
+        }
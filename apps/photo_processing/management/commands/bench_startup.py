@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+CHILD_SCRIPT = """
+import io, json, os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+import config.urls
+urls_done = time.perf_counter()
+result = {
+    "django_setup_s": setup_done - started,
+    "import_urlconf_s": urls_done - setup_done,
+    "modules_loaded": len(sys.modules),
+    "torch_imported": "torch" in sys.modules,
+    "onnxruntime_imported": "onnxruntime" in sys.modules,
+}
+if os.environ.get("BENCH_FIRST_REQUEST") == "1":
+    from django.test import Client
+    from PIL import Image
+    from apps.photo_processing.benchmarking import synthetic_portrait
+    buffer = io.BytesIO()
+    Image.fromarray(synthetic_portrait(640, 480)).save(buffer, format="JPEG")
+    buffer.seek(0)
+    buffer.name = "bench.jpg"
+    request_started = time.perf_counter()
+    response = Client().post("/api/process-photo/", {"photo": buffer, "background": "beach"})
+    result["first_request_status"] = response.status_code
+    result["first_request_s"] = time.perf_counter() - request_started
+    result["time_to_first_response_s"] = time.perf_counter() - started
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = "Mede o tempo de importação do projeto e o tempo até a primeira resposta em um processo novo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3)
+        parser.add_argument("--first-request", action="store_true",
+                            help="Também envia uma foto sintética e mede o tempo até a primeira resposta")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+        env["BENCH_FIRST_REQUEST"] = "1" if options["first_request"] else "0"
+
+        for run in range(options["runs"]):
+            completed = subprocess.run(
+                [sys.executable, "-c", CHILD_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                self.stderr.write(completed.stderr)
+                return
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            self.stdout.write(f"execução {run + 1}: {json.dumps(result)}")
@@ -0,0 +1,58 @@
+import glob
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from apps.photo_processing.benchmarking import summarize, synthetic_portrait
+from apps.photo_processing.nsfw import OnnxNSFWClassifier, TorchNSFWClassifier
+
+
+class Command(BaseCommand):
+    help = "Compara scores e latência do classificador NSFW em torch e em ONNX"
+
+    def add_arguments(self, parser):
+        parser.add_argument("images", nargs="*", help="Imagens extras; por padrão usa os fundos e a foto de exemplo")
+        parser.add_argument("--onnx-model", default=str(settings.NSFW_ONNX_MODEL_PATH))
+        parser.add_argument("--tolerance", type=float, default=0.02,
+                            help="Diferença máxima aceita entre os scores dos dois backends")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        paths = options["images"] or (
+            sorted(glob.glob(os.path.join(settings.ASSETS_ROOT, "backgrounds", "*")))
+            + [os.path.join(settings.BASE_DIR, "miranha.jpg")]
+        )
+        images = [Image.open(path).convert("RGB") for path in paths if os.path.exists(path)]
+        images.append(Image.fromarray(synthetic_portrait(640, 480)))
+
+        backends = {
+            "torch": TorchNSFWClassifier(settings.NSFW_MODEL_NAME),
+            "onnx": OnnxNSFWClassifier(options["onnx_model"]),
+        }
+
+        scores = {}
+        for name, classifier in backends.items():
+            scores[name] = classifier.scores(images)
+            latencies = []
+            for _ in range(options["repeat"]):
+                for image in images:
+                    started = time.perf_counter()
+                    classifier.scores([image])
+                    latencies.append((time.perf_counter() - started) * 1000)
+            stats = summarize(latencies, sum(latencies) / 1000)
+            self.stdout.write(f"{name:<6} p50 {stats['p50_ms']:7.1f}ms  p95 {stats['p95_ms']:7.1f}ms por imagem")
+
+        worst = 0.0
+        for i, (torch_score, onnx_score) in enumerate(zip(scores["torch"], scores["onnx"])):
+            diff = abs(torch_score - onnx_score)
+            worst = max(worst, diff)
+            self.stdout.write(f"  imagem {i}: torch {torch_score:.4f}  onnx {onnx_score:.4f}  diferença {diff:.4f}")
+            if (torch_score >= 0.5) != (onnx_score >= 0.5):
+                raise CommandError(f"Imagem {i}: os backends discordam na classificação")
+
+        if worst > options["tolerance"]:
+            raise CommandError(f"Diferença máxima {worst:.4f} acima da tolerância {options['tolerance']}")
+        self.stdout.write(self.style.SUCCESS(f"Paridade OK (diferença máxima {worst:.4f})"))
@@ -0,0 +1,57 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.photo_processing.nsfw import INPUT_SIZE, labels_path
+
+
+class Command(BaseCommand):
+    help = "Exporta o classificador NSFW (transformers) para ONNX, opcionalmente quantizado em int8"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=str(settings.NSFW_ONNX_MODEL_PATH))
+        parser.add_argument("--model", default=settings.NSFW_MODEL_NAME)
+        parser.add_argument("--opset", type=int, default=17)
+        parser.add_argument("--quantize", action="store_true",
+                            help="Aplica quantização dinâmica int8 aos pesos do modelo exportado")
+
+    def handle(self, *args, **options):
+        import torch
+        from transformers import AutoModelForImageClassification
+
+        output = options["output"]
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+        model = AutoModelForImageClassification.from_pretrained(options["model"]).eval()
+
+        class LogitsOnly(torch.nn.Module):
+            def __init__(self, wrapped):
+                super().__init__()
+                self.wrapped = wrapped
+
+            def forward(self, pixel_values):
+                return self.wrapped(pixel_values=pixel_values).logits
+
+        dummy = torch.zeros(1, 3, INPUT_SIZE[1], INPUT_SIZE[0])
+        export_path = output + ".fp32" if options["quantize"] else output
+        with torch.no_grad():
+            torch.onnx.export(
+                LogitsOnly(model), (dummy,), export_path,
+                input_names=["pixel_values"], output_names=["logits"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=options["opset"],
+            )
+
+        if options["quantize"]:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(export_path, output, weight_type=QuantType.QInt8)
+            os.remove(export_path)
+
+        labels = [model.config.id2label[i] for i in range(len(model.config.id2label))]
+        with open(labels_path(output), "w") as labels_file:
+            json.dump(labels, labels_file)
+
+        self.stdout.write(f"Modelo exportado para {output} ({os.path.getsize(output) / 2 ** 20:.1f}MB), rótulos {labels}")
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.backgrounds.models import Background
+from apps.photo_processing.catalogue import get_catalogue
+from apps.photo_processing.variants import generate_variants, load_manifest, remove_variant_files, update_manifest
+from apps.poses.models import Pose
+
+KINDS = {
+    "backgrounds": (Background, "image_path"),
+    "poses": (Pose, "reference_image"),
+}
+
+
+class Command(BaseCommand):
+    help = "Gera as variantes WebP/JPEG redimensionadas das imagens de fundos e poses (pula as que não mudaram)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+        parser.add_argument("--force", action="store_true", help="Regenera mesmo as imagens que não mudaram")
+        parser.add_argument("--workers", type=int, default=settings.ASSET_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        manifest = load_manifest()
+        assets = {}
+        for kind in options["kinds"]:
+            model, field = KINDS[kind]
+            for instance in model.objects.all():
+                assets[f"{kind}/{instance.key}"] = getattr(instance, field)
+
+        started = time.perf_counter()
+        entries = {}
+        counts = {"geradas": 0, "inalteradas": 0, "erros": 0}
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(generate_variants, asset_id, source, manifest.get(asset_id), options["force"]): asset_id
+                for asset_id, source in assets.items()
+            }
+            for future in as_completed(futures):
+                asset_id = futures[future]
+                try:
+                    entry, generated = future.result()
+                except Exception as e:
+                    counts["erros"] += 1
+                    self.stderr.write(f"  {asset_id:<32} erro: {e}")
+                    continue
+                entries[asset_id] = entry
+                counts["geradas" if generated else "inalteradas"] += 1
+                self.stdout.write(
+                    f"  {asset_id:<32} {'gerada' if generated else 'inalterada':<10} "
+                    f"{len(entry['variants'])} variantes"
+                )
+
+        # Remove variantes de fundos e poses que não existem mais no banco
+        stale = [
+            asset_id for asset_id in manifest
+            if asset_id.split("/", 1)[0] in options["kinds"] and asset_id not in assets
+        ]
+        for asset_id in stale:
+            remove_variant_files(manifest[asset_id])
+        update_manifest(entries, removed=stale)
+        get_catalogue().invalidate()
+
+        self.stdout.write(
+            f"{counts['geradas']} geradas, {counts['inalteradas']} inalteradas, {counts['erros']} erros, "
+            f"{len(stale)} removidas em {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,113 @@
+import base64
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.photo_processing.benchmarking import (
+    encode_jpeg, environment_info, parse_size, summarize, synthetic_portrait, write_json,
+)
+
+ENDPOINTS = ("process-photo", "process-photo-base64")
+
+
+class Command(BaseCommand):
+    help = "Gera carga HTTP em /api/process-photo/ e /api/process-photo-base64/ de um servidor em execução"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000", help="Endereço base do servidor")
+        parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+        parser.add_argument("--requests", type=int, default=50, help="Requisições por endpoint")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--size", default="1600x1200", help="LARGURAxALTURA das fotos sintéticas")
+        parser.add_argument("--distinct", type=int, default=0,
+                            help="Quantidade de fotos diferentes; 0 gera uma por requisição (sem acerto no cache)")
+        parser.add_argument("--background", default="beach")
+        parser.add_argument("--timeout", type=float, default=120)
+        parser.add_argument("--output", help="Grava os resultados em JSON neste caminho")
+
+    def handle(self, *args, **options):
+        import requests
+
+        width, height = parse_size(options["size"])
+        count = options["distinct"] or options["requests"]
+        photos = [encode_jpeg(synthetic_portrait(width, height, seed=i)) for i in range(count)]
+        base_url = options["url"].rstrip("/")
+        local = threading.local()
+
+        def session():
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            return local.session
+
+        senders = {
+            "process-photo": lambda photo: session().post(
+                f"{base_url}/api/process-photo/",
+                files={"photo": ("bench.jpg", photo, "image/jpeg")},
+                data={"background": options["background"]},
+                timeout=options["timeout"],
+            ),
+            "process-photo-base64": lambda photo: session().post(
+                f"{base_url}/api/process-photo-base64/",
+                json={"photo_base64": base64.b64encode(photo).decode(), "background": options["background"]},
+                timeout=options["timeout"],
+            ),
+        }
+
+        results = {}
+        for endpoint in options["endpoints"]:
+            stats = self._run(senders[endpoint], photos, options)
+            stats["server_peak_rss_mb"] = self._server_peak_rss(session(), base_url)
+            results[endpoint] = stats
+            self.stdout.write(
+                f"{endpoint:<21} {stats['throughput_per_s']:6.2f} req/s  p50 {stats['p50_ms']:8.1f}ms  "
+                f"p95 {stats['p95_ms']:8.1f}ms  p99 {stats['p99_ms']:8.1f}ms  status {stats['status_codes']}"
+            )
+
+        if options["output"]:
+            write_json(options["output"], {
+                "environment": environment_info(),
+                "options": {key: options[key] for key in (
+                    "url", "endpoints", "requests", "concurrency", "size", "distinct", "background",
+                )},
+                "results": results,
+            })
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+    def _run(self, send, photos: list, options) -> dict:
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def request(index: int):
+            started = time.perf_counter()
+            try:
+                status = send(photos[index % len(photos)]).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses[str(status)] += 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            list(executor.map(request, range(options["requests"])))
+        stats = summarize(latencies, time.perf_counter() - started)
+        stats["status_codes"] = dict(statuses)
+        return stats
+
+    def _server_peak_rss(self, session, base_url: str):
+        """
+        Pico de RSS informado por /api/metrics/ (do worker que atender a coleta)
+        """
+        try:
+            text = session.get(f"{base_url}/api/metrics/", timeout=10).text
+        except Exception:
+            return None
+        match = re.search(r"^process_peak_resident_memory_bytes (\S+)$", text, re.MULTILINE)
+        return float(match.group(1)) / 2 ** 20 if match else None
@@ -0,0 +1,91 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.photo_processing.benchmarking import write_json
+
+FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def read_smaps_rollup(pid: int) -> dict:
+    """
+    Memória do processo em bytes a partir de /proc/<pid>/smaps_rollup (Linux 4.14+).
+
+    ``pss`` divide cada página compartilhada entre os processos que a usam; ``uss`` é a memória
+    exclusiva do processo, que seria liberada se ele terminasse.
+    """
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if parts and parts[0].rstrip(":") in FIELDS:
+                memory[FIELDS[parts[0].rstrip(":")]] = int(parts[1]) * 1024
+    memory["uss"] = memory.get("private_clean", 0) + memory.get("private_dirty", 0)
+    return memory
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # O nome do processo pode conter espaços: o ppid vem depois do último ")"
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+class Command(BaseCommand):
+    help = "Mede RSS, PSS e memória exclusiva (USS) do master do gunicorn e de cada worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, help="PID do master do gunicorn")
+        parser.add_argument("--pidfile", help="Arquivo de PID do gunicorn (opção --pid do gunicorn)")
+        parser.add_argument("--output", help="Grava os resultados em JSON neste caminho")
+
+    def handle(self, *args, **options):
+        pid = options["pid"]
+        if options["pidfile"]:
+            with open(options["pidfile"]) as pidfile:
+                pid = int(pidfile.read().strip())
+        if not pid:
+            raise CommandError("Informe --pid ou --pidfile do master do gunicorn")
+        if not os.path.exists(f"/proc/{pid}/smaps_rollup"):
+            raise CommandError(f"/proc/{pid}/smaps_rollup não encontrado (requer Linux e permissão sobre o processo)")
+
+        processes = {"master": read_smaps_rollup(pid)}
+        workers = child_pids(pid)
+        for worker_pid in workers:
+            processes[f"worker {worker_pid}"] = read_smaps_rollup(worker_pid)
+
+        self.stdout.write(f"{'processo':<16} {'RSS':>9} {'PSS':>9} {'USS':>9} {'compart.':>9}")
+        for name, memory in processes.items():
+            shared = memory.get("shared_clean", 0) + memory.get("shared_dirty", 0)
+            self.stdout.write(
+                f"{name:<16} {memory['rss'] / 2 ** 20:8.1f}M {memory['pss'] / 2 ** 20:8.1f}M "
+                f"{memory['uss'] / 2 ** 20:8.1f}M {shared / 2 ** 20:8.1f}M"
+            )
+
+        total_pss = sum(memory["pss"] for memory in processes.values())
+        summary = {
+            "workers": len(workers),
+            "total_pss_mb": total_pss / 2 ** 20,
+            "worker_uss_mb": [processes[f"worker {worker_pid}"]["uss"] / 2 ** 20 for worker_pid in workers],
+        }
+        self.stdout.write(f"PSS total (memória efetivamente usada pelo servidor): {summary['total_pss_mb']:.1f}M")
+
+        if options["output"]:
+            write_json(options["output"], {"pid": pid, "processes": processes, "summary": summary})
+            self.stdout.write(f"Resultados gravados em {options['output']}")
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.photo_processing.encoding import InvalidEncoding, encoding_from_request
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff", ".heic", ".avif"}
+CHECKPOINT_NAME = ".process_photos.jsonl"
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada processo do pool, criado por _init_worker
+_processor = None
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def is_safe_name(name: str) -> bool:
+    """
+    Nome relativo que não sai do diretório de saída: sem caminho absoluto, ``..`` ou separador do Windows
+    """
+    path = PurePosixPath(name)
+    return bool(path.parts) and not path.is_absolute() and ".." not in path.parts and "\\" not in name
+
+
+def iter_sources(source: Path):
+    """
+    Fotos de um diretório (recursivo) ou de um arquivo .zip/.tar[.gz], em ordem de nome:
+    (nome relativo, função que lê os bytes). Entradas do arquivo com nomes que sairiam
+    do diretório de saída (absolutos ou com ``..``) são ignoradas
+    """
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                yield path.relative_to(source).as_posix(), path.read_bytes
+        return
+
+    # Leituras de um mesmo arquivo compactado não podem ser simultâneas
+    lock = threading.Lock()
+
+    def reader(read):
+        def read_locked():
+            with lock:
+                return read()
+        return read_locked
+
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            if not info.is_dir() and PurePosixPath(info.filename).suffix.lower() in IMAGE_EXTENSIONS:
+                if not is_safe_name(info.filename):
+                    logger.warning(f"Entrada ignorada, fora do diretório de saída: {info.filename}")
+                    continue
+                yield info.filename, reader(lambda info=info: archive.read(info))
+    elif tarfile.is_tarfile(source):
+        archive = tarfile.open(source)
+        for member in sorted(archive.getmembers(), key=lambda member: member.name):
+            if member.isfile() and PurePosixPath(member.name).suffix.lower() in IMAGE_EXTENSIONS:
+                if not is_safe_name(member.name):
+                    logger.warning(f"Entrada ignorada, fora do diretório de saída: {member.name}")
+                    continue
+                yield member.name, reader(lambda member=member: archive.extractfile(member).read())
+    else:
+        raise CommandError(f"{source} não é um diretório, .zip ou .tar")
+
+
+def load_checkpoint(path: Path) -> set:
+    """
+    Nomes já concluídos (processados ou reprovados pelo NSFW) numa execução anterior;
+    fotos com erro são tentadas de novo
+    """
+    done = set()
+    if path.exists():
+        with open(path) as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última linha truncada por uma interrupção
+                    continue
+                if entry["status"] in ("ok", "nsfw"):
+                    done.add(entry["name"])
+    return done
+
+
+def _init_worker(intra_op_threads: int, stub: bool) -> None:
+    """
+    Inicializa um processo do pool: limita as threads dos modelos à fatia de núcleos
+    do processo e carrega os modelos uma vez, antes da primeira foto
+    """
+    global _processor
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from apps.photo_processing.registry import registry
+    from apps.photo_processing.services import PhotoBackgroundChanger
+
+    settings.ONNXRUNTIME_INTRA_OP_THREADS = intra_op_threads
+    # Cada foto é vista uma vez: o cache de resultados só ocuparia memória
+    settings.RESULT_CACHE_ENABLED = False
+    if settings.NSFW_BACKEND == "torch" and not stub:
+        import torch
+
+        torch.set_num_threads(intra_op_threads)
+
+    _processor = PhotoBackgroundChanger()
+    if stub:
+        from apps.photo_processing.benchmarking import stub_models
+
+        stub_models(_processor)
+        registry.get("background_cache")
+    else:
+        registry.load_all()
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_file.name, path)
+
+
+def _process_one(name: str, photo_data: bytes, person_image, backgrounds: list, encoding, output: str):
+    """
+    Segmenta uma foto já decodificada e grava a composição com cada fundo (no processo do pool).
+    Retorna (status, segundos, imagens gravadas)
+    """
+    started = time.perf_counter()
+    analysis = _processor.analyze_photo(photo_data, person_image=person_image)
+    if analysis is None:
+        return "nsfw", time.perf_counter() - started, 0
+
+    person_array, alpha = analysis
+    smoothed_alpha, regions = _processor.smooth_alpha_regions(alpha, blur_radius=2.5, feather_size=2)
+    stem = PurePosixPath(name).with_suffix("").as_posix()
+    root = Path(output).resolve()
+    for background in backgrounds:
+        target = (root / f"{stem}_{background}.{encoding.extension}").resolve()
+        if not target.is_relative_to(root):
+            raise ValueError(f"Caminho de saída fora de {root}: {name}")
+        result_bytes = _processor.render_smoothed(person_array, smoothed_alpha, background, encoding, regions)
+        _write_atomic(target, result_bytes)
+    return "ok", time.perf_counter() - started, len(backgrounds)
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa em lote as fotos de um diretório ou arquivo .zip/.tar num pool de processos "
+        "(um modelo carregado por processo), com pré-carga e decodificação em paralelo e checkpoint para retomar"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Diretório ou arquivo .zip/.tar com as fotos")
+        parser.add_argument("output", help="Diretório das imagens geradas (<foto>_<fundo>.<ext>)")
+        parser.add_argument("--backgrounds", nargs="+", help="Fundos a compor (padrão: todos do catálogo)")
+        parser.add_argument("--format", help="Formato de saída (padrão: PHOTO_OUTPUT_FORMAT)")
+        parser.add_argument("--quality", type=int)
+        parser.add_argument("--workers", type=int, default=available_cores(),
+                            help="Processos de inferência (padrão: núcleos disponíveis)")
+        parser.add_argument("--threads-per-worker", type=int,
+                            help="Threads do onnxruntime/torch por processo (padrão: núcleos / processos)")
+        parser.add_argument("--decode-workers", type=int, default=2,
+                            help="Threads que leem e decodificam as próximas fotos")
+        parser.add_argument("--prefetch", type=int, help="Fotos decodificadas à frente (padrão: 2 por processo)")
+        parser.add_argument("--checkpoint", help=f"Arquivo de progresso (padrão: <output>/{CHECKPOINT_NAME})")
+        parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e processa tudo de novo")
+        parser.add_argument("--stub-models", action="store_true",
+                            help="Substitui NSFW e segmentação por stubs (mede o pipeline sem os modelos)")
+
+    def handle(self, *args, **options):
+        from apps.photo_processing.services import PhotoBackgroundChanger
+
+        try:
+            encoding = encoding_from_request({"format": options["format"], "quality": options["quality"]})
+        except InvalidEncoding as e:
+            raise CommandError(str(e))
+
+        source = Path(options["source"])
+        if not source.exists():
+            raise CommandError(f"{source} não existe")
+        output = Path(options["output"])
+        output.mkdir(parents=True, exist_ok=True)
+
+        processor = PhotoBackgroundChanger()
+        available = processor.get_available_backgrounds()
+        backgrounds = options["backgrounds"] or list(available)
+        invalid = [key for key in backgrounds if key not in available]
+        if invalid:
+            raise CommandError(f"Fundo(s) inválido(s): {invalid}. Disponíveis: {list(available)}")
+
+        checkpoint = Path(options["checkpoint"] or output / CHECKPOINT_NAME)
+        if options["restart"] and checkpoint.exists():
+            checkpoint.unlink()
+        done = load_checkpoint(checkpoint)
+
+        workers = max(1, options["workers"])
+        threads = options["threads_per_worker"] or max(1, available_cores() // workers)
+        prefetch = options["prefetch"] or 2 * workers
+        self.stdout.write(
+            f"{workers} processos x {threads} threads, {options['decode_workers']} threads de decodificação, "
+            f"{len(backgrounds)} fundos, formato {encoding.format}"
+            + (f"; {len(done)} fotos já concluídas no checkpoint" if done else "")
+        )
+
+        pending = ((name, read) for name, read in iter_sources(source) if name not in done)
+        counts = {"ok": 0, "nsfw": 0, "error": 0}
+        images = 0
+        # Conexões abertas não podem ser herdadas pelos processos do pool
+        connections.close_all()
+        with open(checkpoint, "a") as checkpoint_file, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(threads, options["stub_models"])) as pool, \
+                ThreadPoolExecutor(max_workers=options["decode_workers"], thread_name_prefix="photo-prefetch") as decoder:
+            # Com fork, a primeira tarefa cria todos os processos: antes das threads de decodificação existirem
+            warmup_started = time.perf_counter()
+            pool.submit(_worker_ready).result()
+            self.stdout.write(f"Pool pronto em {time.perf_counter() - warmup_started:.1f}s")
+            started = time.perf_counter()
+
+            def record(name, status, seconds, error=None):
+                entry = {"name": name, "status": status, "seconds": round(seconds, 3)}
+                if error:
+                    entry["error"] = error
+                checkpoint_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                checkpoint_file.flush()
+                counts[status] += 1
+                if error:
+                    self.stderr.write(f"  {name}: {error}")
+                total = sum(counts.values())
+                if total % 50 == 0:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"  {total} fotos, {total / elapsed:.2f} fotos/s")
+
+            def prefetch_one(name, read):
+                # Leitura e decodificação fora dos processos de inferência
+                read_started = time.perf_counter()
+                try:
+                    photo_data = read()
+                    return name, photo_data, processor.decode_photo(photo_data), None, read_started
+                except Exception as e:
+                    return name, None, None, f"{type(e).__name__}: {e}", read_started
+
+            decoding = deque()
+            running = {}
+
+            def fill():
+                while len(decoding) < prefetch:
+                    item = next(pending, None)
+                    if item is None:
+                        return
+                    decoding.append(decoder.submit(prefetch_one, *item))
+
+            fill()
+            while decoding or running:
+                # Mantém até dois lotes de fotos por processo em voo, na ordem dos nomes
+                while decoding and len(running) < 2 * workers:
+                    name, photo_data, person_image, error, read_started = decoding.popleft().result()
+                    fill()
+                    if error:
+                        record(name, "error", time.perf_counter() - read_started, error)
+                        continue
+                    future = pool.submit(_process_one, name, photo_data, person_image, backgrounds, encoding, str(output))
+                    running[future] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        status, seconds, written = future.result()
+                    except Exception as e:
+                        record(name, "error", 0, f"{type(e).__name__}: {e}")
+                        continue
+                    images += written
+                    record(name, status, seconds)
+
+        elapsed = time.perf_counter() - started
+        photos = sum(counts.values())
+        self.stdout.write(
+            f"{photos} fotos em {elapsed:.1f}s: {counts['ok']} processadas, {counts['nsfw']} NSFW, "
+            f"{counts['error']} erros; {photos / max(elapsed, 1e-9):.2f} fotos/s, "
+            f"{images / max(elapsed, 1e-9):.2f} imagens/s ({images} imagens)"
+        )
@@ -0,0 +1,124 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.photo_processing.encoding import InvalidEncoding, encoding_from_request
+from apps.photo_processing.masks import MaskStore
+from apps.photo_processing.result_cache import get_result_cache
+from apps.photo_processing.services import PhotoBackgroundChanger
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompõe as fotos do MaskStore com fundos novos ou alterados a partir das máscaras "
+        "gravadas, sem executar a segmentação, e grava os resultados no cache em disco ou num diretório"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backgrounds", nargs="+", help="Fundos a compor (padrão: todos do catálogo)")
+        parser.add_argument("--format", help="Formato de saída (padrão: PHOTO_OUTPUT_FORMAT)")
+        parser.add_argument("--quality", type=int)
+        parser.add_argument("--output", help="Grava as imagens neste diretório em vez do cache de resultados")
+        parser.add_argument("--force", action="store_true", help="Recompõe mesmo os resultados já em cache")
+        parser.add_argument("--limit", type=int, help="Número máximo de fotos")
+        parser.add_argument("--workers", type=int, default=settings.PHOTO_RENDER_WORKERS)
+
+    def handle(self, *args, **options):
+        try:
+            encoding = encoding_from_request({"format": options["format"], "quality": options["quality"]})
+        except InvalidEncoding as e:
+            raise CommandError(str(e))
+
+        cache = get_result_cache()
+        if not options["output"] and (cache is None or cache.disk is None):
+            raise CommandError(
+                "Sem --output, os resultados vão para o cache em disco: habilite "
+                "RESULT_CACHE_ENABLED e RESULT_CACHE_DISK_ENABLED"
+            )
+        if options["output"]:
+            os.makedirs(options["output"], exist_ok=True)
+
+        processor = PhotoBackgroundChanger()
+        available = processor.get_available_backgrounds()
+        backgrounds = options["backgrounds"] or list(available)
+        invalid = [key for key in backgrounds if key not in available]
+        if invalid:
+            raise CommandError(f"Fundo(s) inválido(s): {invalid}. Disponíveis: {list(available)}")
+
+        # O comando lê o store mesmo com MASK_STORE_ENABLED desligado nos workers
+        store = MaskStore(settings.MASK_STORE_ROOT)
+        digests = list(store.digests())[:options["limit"]]
+        self.stdout.write(f"{len(digests)} fotos no MaskStore, {len(backgrounds)} fundos, formato {encoding.format}")
+
+        started = time.perf_counter()
+        counts = {"compostas": 0, "em_cache": 0, "desatualizadas": 0, "erros": 0}
+        sizes = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(self._recomposite, processor, store, digest, backgrounds, encoding, options): digest
+                for digest in digests
+            }
+            for future in as_completed(futures):
+                digest = futures[future]
+                try:
+                    outcome, composed, cached, size = future.result()
+                except Exception as e:
+                    counts["erros"] += 1
+                    self.stderr.write(f"  {digest[:12]} erro: {e}")
+                    continue
+                if outcome == "stale":
+                    counts["desatualizadas"] += 1
+                    continue
+                counts["compostas"] += composed
+                counts["em_cache"] += cached
+                sizes.append(size)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{counts['compostas']} imagens compostas ({counts['compostas'] / max(elapsed, 1e-9):.1f}/s), "
+            f"{counts['em_cache']} já em cache, {counts['desatualizadas']} máscaras de outros parâmetros "
+            f"de segmentação, {counts['erros']} erros em {elapsed:.1f}s"
+        )
+        if sizes:
+            mask_bytes, photo_bytes, raw_bytes = (sum(column) / len(sizes) for column in zip(*sizes))
+            self.stdout.write(
+                f"Por foto: máscara {mask_bytes / 1024:.1f}KB ({mask_bytes / raw_bytes:.1%} do alpha cru), "
+                f"foto {photo_bytes / 1024:.1f}KB"
+            )
+
+    def _recomposite(self, processor, store, digest, backgrounds, encoding, options):
+        """
+        Compõe uma foto com cada fundo; retorna (resultado, compostas, já em cache, tamanhos)
+        """
+        alpha = store.load(digest, processor.analysis_cache_key(digest))
+        if alpha is None:
+            return "stale", 0, 0, None
+
+        keys = {key: processor.result_cache_key(digest, key, encoding) for key in backgrounds}
+        cache = get_result_cache()
+        if not options["output"] and not options["force"]:
+            keys = {key: result_key for key, result_key in keys.items() if cache.get_result(result_key) is None}
+        cached = len(backgrounds) - len(keys)
+
+        mask_bytes, photo_bytes = store.sizes(digest)
+        sizes = (mask_bytes, photo_bytes, alpha.size)
+        if not keys:
+            return "ok", 0, cached, sizes
+
+        person_array = np.array(processor.decode_photo(store.photo(digest)).convert("RGB"))
+        if person_array.shape[:2] != alpha.shape[:2]:
+            return "stale", 0, 0, None
+        smoothed_alpha, regions = processor.smooth_alpha_regions(alpha, blur_radius=2.5, feather_size=2)
+        for key, result_key in keys.items():
+            result_bytes = processor.render_smoothed(person_array, smoothed_alpha, key, encoding, regions)
+            if options["output"]:
+                path = os.path.join(options["output"], f"{digest[:16]}_{key}.{encoding.extension}")
+                with open(path, "wb") as result_file:
+                    result_file.write(result_bytes)
+            else:
+                processor.store_result(result_key, result_bytes)
+        return "ok", len(keys), cached, sizes
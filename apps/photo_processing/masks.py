@@ -0,0 +1,234 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Formato compacto da máscara alpha: cabeçalho fixo, metadados JSON e o plano uint8 recortado
+# na caixa da pessoa (fora dela o alpha é 0), comprimido em PNG ou run-length.
+#
+#   magic (4s) | versão (B) | codec (B) | tamanho dos metadados (H)
+#   altura, largura, y0, x0, y1, x1 (6I) | metadados | plano comprimido
+MAGIC = b"PMSK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBH6I")
+CODECS = {"png": 1, "rle": 2}
+CODEC_NAMES = {code: name for name, code in CODECS.items()}
+# Runs mais longos são divididos para caber em uint16
+MAX_RUN = 0xFFFF
+
+
+class InvalidMask(ValueError):
+    """
+    Dados que não são uma máscara neste formato
+    """
+
+
+def bounding_box(alpha: np.ndarray):
+    """
+    Caixa (y0, x0, y1, x1) dos pixels com alpha > 0; (0, 0, 0, 0) se a máscara estiver vazia
+    """
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not rows.size:
+        return 0, 0, 0, 0
+    columns = np.flatnonzero(alpha[rows[0]:rows[-1] + 1].any(axis=0))
+    return int(rows[0]), int(columns[0]), int(rows[-1]) + 1, int(columns[-1]) + 1
+
+
+def _encode_rle(plane: np.ndarray) -> bytes:
+    flat = plane.ravel()
+    if not flat.size:
+        return b""
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, flat.size))
+    values = flat[starts]
+    # Divide runs maiores que MAX_RUN em pedaços de MAX_RUN mais o resto
+    pieces = (lengths + MAX_RUN - 1) // MAX_RUN
+    if (pieces > 1).any():
+        values = np.repeat(values, pieces)
+        split = np.full(int(pieces.sum()), MAX_RUN, dtype=np.int64)
+        last = np.cumsum(pieces) - 1
+        split[last] = lengths - (pieces - 1) * MAX_RUN
+        lengths = split
+    return struct.pack("<I", len(values)) + values.astype(np.uint8).tobytes() + lengths.astype("<u2").tobytes()
+
+
+def _decode_rle(buffer, offset: int, shape) -> np.ndarray:
+    if not shape[0] or not shape[1]:
+        return np.zeros(shape, dtype=np.uint8)
+    if len(buffer) < offset + 4:
+        raise InvalidMask("Runs da máscara truncados")
+    (count,) = struct.unpack_from("<I", buffer, offset)
+    if len(buffer) < offset + 4 + 3 * count:
+        raise InvalidMask("Runs da máscara truncados")
+    values = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=offset + 4)
+    lengths = np.frombuffer(buffer, dtype="<u2", count=count, offset=offset + 4 + count)
+    plane = np.repeat(values, lengths)
+    if plane.size != shape[0] * shape[1]:
+        raise InvalidMask("Runs não cobrem a máscara")
+    return plane.reshape(shape)
+
+
+def encode_mask(alpha: np.ndarray, codec: str = None, crop: bool = None, metadata: dict = None) -> bytes:
+    """
+    Serializa a máscara alpha (uint8 HxW) no formato compacto, recortada na caixa da pessoa
+    (MASK_CROP) e comprimida com ``codec`` (MASK_CODEC: ``png`` ou ``rle``)
+    """
+    codec = codec or settings.MASK_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Codec de máscara desconhecido: {codec}")
+    crop = settings.MASK_CROP if crop is None else crop
+    height, width = alpha.shape[:2]
+    y0, x0, y1, x1 = bounding_box(alpha) if crop else (0, 0, height, width)
+    plane = np.ascontiguousarray(alpha[y0:y1, x0:x1], dtype=np.uint8)
+
+    if codec == "png":
+        payload = b""
+        if plane.size:
+            _, encoded = cv2.imencode(".png", plane, [cv2.IMWRITE_PNG_COMPRESSION, 6])
+            payload = encoded.tobytes()
+    else:
+        payload = _encode_rle(plane)
+
+    meta = json.dumps(metadata or {}, separators=(",", ":")).encode()
+    return HEADER.pack(MAGIC, VERSION, CODECS[codec], len(meta), height, width, y0, x0, y1, x1) + meta + payload
+
+
+def read_header(buffer):
+    """
+    Retorna (codec, (altura, largura), caixa, metadados, posição do plano) de uma máscara serializada
+    """
+    if len(buffer) < HEADER.size:
+        raise InvalidMask("Máscara truncada")
+    magic, version, codec, meta_size, height, width, y0, x0, y1, x1 = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION or codec not in CODEC_NAMES:
+        raise InvalidMask("Cabeçalho de máscara inválido")
+    if not (0 <= y0 <= y1 <= height and 0 <= x0 <= x1 <= width):
+        raise InvalidMask("Caixa da máscara fora da imagem")
+    offset = HEADER.size + meta_size
+    if len(buffer) < offset:
+        raise InvalidMask("Metadados da máscara truncados")
+    try:
+        metadata = json.loads(bytes(buffer[HEADER.size:offset]) or b"{}")
+    except ValueError as e:
+        raise InvalidMask(f"Metadados da máscara inválidos: {e}")
+    if not isinstance(metadata, dict):
+        raise InvalidMask("Metadados da máscara inválidos")
+    return CODEC_NAMES[codec], (height, width), (y0, x0, y1, x1), metadata, offset
+
+
+def decode_mask(buffer) -> np.ndarray:
+    """
+    Reconstrói a máscara alpha em tamanho original a partir de bytes ou de um mmap.
+
+    O plano comprimido é copiado do buffer antes de decodificar: nenhum array fica apontando
+    para o mmap (nem no traceback de uma máscara corrompida), que pode então ser fechado
+    """
+    codec, (height, width), (y0, x0, y1, x1), _, offset = read_header(buffer)
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    if y1 > y0 and x1 > x0:
+        payload = bytes(buffer[offset:])
+        if codec == "png":
+            plane = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if plane is None or plane.shape != (y1 - y0, x1 - x0):
+                raise InvalidMask("PNG da máscara inválido")
+        else:
+            plane = _decode_rle(payload, 0, (y1 - y0, x1 - x0))
+        alpha[y0:y1, x0:x1] = plane
+    alpha.flags.writeable = False
+    return alpha
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_file.name, path)
+
+
+class MaskStore:
+    """
+    Armazenamento persistente das máscaras das fotos processadas, com a foto enviada ao lado,
+    para recompor fotos com fundos novos ou alterados (``manage.py recomposite_masks``)
+    sem executar o U2Net de novo. Sem limite de tamanho nem remoção automática.
+
+    Cada foto ocupa ``<hash>.mask`` (máscara compacta, com a chave da análise nos metadados)
+    e ``<hash>.photo`` (bytes originais do upload) em ``root/<hash[:2]>/``.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.{suffix}")
+
+    def save(self, digest: str, analysis_key: str, alpha: np.ndarray, photo_data: bytes, codec: str = None) -> None:
+        # A foto primeiro: uma máscara só existe com a foto correspondente
+        photo_path = self._path(digest, "photo")
+        if not os.path.exists(photo_path):
+            _write_atomic(photo_path, photo_data)
+        _write_atomic(self._path(digest, "mask"), encode_mask(alpha, codec, metadata={"key": analysis_key}))
+
+    def load(self, digest: str, analysis_key: str = None):
+        """
+        Máscara da foto, ou None se não existir ou tiver sido gerada com outros parâmetros
+        de segmentação (chave da análise diferente de ``analysis_key``)
+        """
+        path = self._path(digest, "mask")
+        try:
+            with open(path, "rb") as mask_file:
+                with mmap.mmap(mask_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if analysis_key is not None and read_header(mapped)[3].get("key") != analysis_key:
+                        return None
+                    return decode_mask(mapped)
+        except FileNotFoundError:
+            return None
+        except (InvalidMask, ValueError, OSError) as e:
+            logger.error(f"Máscara {digest} inválida: {e}")
+            return None
+
+    def photo(self, digest: str) -> bytes:
+        with open(self._path(digest, "photo"), "rb") as photo_file:
+            return photo_file.read()
+
+    def digests(self):
+        """
+        Hashes das fotos com máscara armazenada
+        """
+        for directory, _, files in os.walk(self.root):
+            for name in sorted(files):
+                if name.endswith(".mask"):
+                    yield name[:-len(".mask")]
+
+    def sizes(self, digest: str):
+        """
+        (bytes da máscara, bytes da foto)
+        """
+        return tuple(os.path.getsize(self._path(digest, suffix)) for suffix in ("mask", "photo"))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_mask_store():
+    """
+    Retorna o MaskStore do processo, ou None se MASK_STORE_ENABLED estiver desligado
+    """
+    global _store
+    if not settings.MASK_STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MaskStore(settings.MASK_STORE_ROOT)
+    return _store
@@ -0,0 +1,296 @@
+import cProfile
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MEGAPIXEL_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 12, 16, 24, 48)
+MEMORY_BUCKETS = tuple(2 ** exponent * 2 ** 20 for exponent in range(0, 12))  # 1MB a 2GB
+
+# ru_maxrss vem em KB no Linux e em bytes no macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss() -> int:
+    """
+    Pico de memória residente do processo, em bytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def current_rss() -> int:
+    """
+    Memória residente atual do processo, em bytes (0 fora do Linux)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Métrica no formato de exposição em texto do Prometheus
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple((name, labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """
+    Gauge com valor próprio ou, com ``function``, lido a cada coleta
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [("", (), self.function())]
+            except Exception as e:
+                logger.debug(f"Erro ao coletar {self.name}: {e}")
+                return []
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+        samples = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", key + (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, total))
+            samples.append(("_count", key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas do processo, exposto em /api/metrics/.
+
+    Cada worker do gunicorn mantém as próprias métricas.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, buckets: tuple, labelnames: tuple = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "photo_stage_seconds", "Duração de cada etapa do processamento da foto", LATENCY_BUCKETS, ("stage",)
+)
+stage_peak_rss_delta = metrics.histogram(
+    "photo_stage_peak_rss_delta_bytes", "Aumento do pico de memória residente do processo durante a etapa",
+    MEMORY_BUCKETS, ("stage",)
+)
+input_megapixels = metrics.histogram(
+    "photo_input_megapixels", "Resolução das fotos recebidas, após o limite de PHOTO_OUTPUT_MAX_SIDE",
+    MEGAPIXEL_BUCKETS
+)
+photos_processed = metrics.counter(
+    "photo_processed_total", "Fotos processadas por resultado", ("outcome",)
+)
+photos_in_progress = metrics.gauge(
+    "photo_in_progress", "Fotos sendo processadas neste momento pelo worker"
+)
+metrics.gauge("process_resident_memory_bytes", "Memória residente atual do worker", function=current_rss)
+metrics.gauge("process_peak_resident_memory_bytes", "Pico de memória residente do worker", function=peak_rss)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Mede duração e aumento do pico de RSS de uma etapa do pipeline
+    """
+    rss_before = peak_rss()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name)
+        stage_peak_rss_delta.observe(peak_rss() - rss_before, stage=name)
+        logger.debug(f"Etapa {name}: {elapsed * 1000:.1f}ms")
+
+
+_profiling_lock = threading.Lock()
+
+
+@contextmanager
+def maybe_profile(label: str):
+    """
+    Perfila uma fração PHOTO_PROFILING_SAMPLE_RATE das chamadas com cProfile ou pyinstrument
+    (PHOTO_PROFILING_BACKEND), gravando o resultado em PHOTO_PROFILING_DIR
+    """
+    rate = settings.PHOTO_PROFILING_SAMPLE_RATE
+    # Só um profiler pode estar ativo por vez no processo
+    if not rate or random.random() >= rate or not _profiling_lock.acquire(blocking=False):
+        yield
+        return
+
+    try:
+        with _profile(label):
+            yield
+    finally:
+        _profiling_lock.release()
+
+
+@contextmanager
+def _profile(label: str):
+    from .middleware import get_request_id
+
+    os.makedirs(settings.PHOTO_PROFILING_DIR, exist_ok=True)
+    basename = os.path.join(
+        str(settings.PHOTO_PROFILING_DIR),
+        f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{get_request_id() or os.getpid()}",
+    )
+
+    if settings.PHOTO_PROFILING_BACKEND == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(basename + ".html", "w") as output:
+                output.write(profiler.output_html())
+            logger.info(f"Perfil gravado em {basename}.html")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(basename + ".prof")
+        logger.info(f"Perfil gravado em {basename}.prof")
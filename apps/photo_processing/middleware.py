@@ -0,0 +1,73 @@
+import contextvars
+import logging
+import re
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_valid_request_id = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def get_request_id():
+    """
+    Id da requisição atual (ou do job que ela criou), ou None fora de uma requisição
+    """
+    return _request_id.get()
+
+
+class RequestIDMiddleware:
+    """
+    Atribui um id a cada requisição (reaproveitando o X-Request-ID recebido, se válido),
+    disponível nos logs via RequestIDFilter e devolvido no header da resposta.
+
+    Funciona nos modos síncrono e assíncrono, para não levar as views assíncronas para uma thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    def _start(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _valid_request_id.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return _request_id.set(request_id)
+
+
+class RequestIDFilter(logging.Filter):
+    """
+    Adiciona ``request_id`` aos registros de log ("-" fora de uma requisição)
+    """
+
+    def filter(self, record):
+        record.request_id = get_request_id() or '-'
+        return True
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Na fila'), ('processing', 'Processando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='queued', max_length=20)),
+                ('background', models.CharField(max_length=50)),
+                ('error', models.TextField(blank=True, default='')),
+                ('result', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['updated_at'], name='photo_proce_updated_84cfb1_idx')],
+            },
+        ),
+    ]
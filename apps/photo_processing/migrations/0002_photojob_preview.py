@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photo_processing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photojob',
+            name='preview',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -1 +1,23 @@
+import uuid
+
 from django.db import models
+
+from .jobs import JobStatus
+
+
+class PhotoJob(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=JobStatus.CHOICES, default=JobStatus.QUEUED)
+    background = models.CharField(max_length=50)
+    error = models.TextField(blank=True, default='')
+    result = models.BinaryField(null=True, blank=True)
+    preview = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['updated_at'])]
+
+    def __str__(self):
+        return f"{self.id} - {self.status}"
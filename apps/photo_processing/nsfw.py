@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+
+import numpy as np
+from PIL import Image
+
+from .sessions import onnx_session_options
+
+logger = logging.getLogger(__name__)
+
+NSFW_LABEL = "nsfw"
+INPUT_SIZE = (224, 224)
+DEFAULT_LABELS = ["normal", "nsfw"]
+
+
+def nsfw_thumbnail(image: Image.Image) -> Image.Image:
+    """
+    Cópia 224x224 (bilinear) da foto para o classificador, o mesmo redimensionamento que o
+    ViTImageProcessor faria dentro do pipeline, mas feito uma vez só e sem passar a imagem
+    em resolução total para o classificador
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.resize(INPUT_SIZE, Image.Resampling.BILINEAR)
+
+
+def labels_path(model_path) -> str:
+    """
+    Caminho do arquivo com os rótulos do modelo exportado, ao lado do .onnx
+    """
+    return os.path.splitext(str(model_path))[0] + ".labels.json"
+
+
+class TorchNSFWClassifier:
+    """
+    Classificador NSFW via pipeline do transformers (torch)
+    """
+
+    def __init__(self, model_name: str):
+        from transformers import pipeline
+
+        self.pipeline = pipeline("image-classification", model=model_name)
+
+    def scores(self, images: list) -> list:
+        """
+        Retorna o score NSFW de cada imagem PIL
+        """
+        results = self.pipeline(images, batch_size=len(images))
+        return [
+            next((r["score"] for r in result if r["label"] == NSFW_LABEL), 0.0)
+            for result in results
+        ]
+
+
+class OnnxNSFWClassifier:
+    """
+    Classificador NSFW a partir do modelo exportado para ONNX (``manage.py export_nsfw_onnx``),
+    com o pré-processamento do ViTImageProcessor feito em numpy
+    """
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=onnx_session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        labels = DEFAULT_LABELS
+        if os.path.exists(labels_path(model_path)):
+            with open(labels_path(model_path)) as labels_file:
+                labels = json.load(labels_file)
+        self.nsfw_index = labels.index(NSFW_LABEL)
+
+    def preprocess(self, images: list) -> np.ndarray:
+        """
+        Redimensiona para 224x224 (bilinear) e normaliza para [-1, 1], em NCHW
+        """
+        batch = np.empty((len(images), INPUT_SIZE[1], INPUT_SIZE[0], 3), dtype=np.float32)
+        for i, image in enumerate(images):
+            resized = image.convert("RGB").resize(INPUT_SIZE, Image.Resampling.BILINEAR)
+            batch[i] = np.asarray(resized, dtype=np.float32)
+        batch *= 2.0 / 255.0
+        batch -= 1.0
+        return batch.transpose((0, 3, 1, 2))
+
+    def scores(self, images: list) -> list:
+        logits = self.session.run(None, {self.input_name: np.ascontiguousarray(self.preprocess(images))})[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return [float(score) for score in probabilities[:, self.nsfw_index]]
+
+
+def create_classifier(backend: str, model_name: str, onnx_model_path):
+    """
+    Cria o classificador do backend escolhido (``torch`` ou ``onnx``)
+    """
+    if backend == "onnx":
+        return OnnxNSFWClassifier(onnx_model_path)
+    if backend == "torch":
+        return TorchNSFWClassifier(model_name)
+    raise ValueError(f"Backend NSFW desconhecido: {backend}")
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+stage_waiting = metrics.gauge(
+    "photo_async_stage_waiting", "Requisições assíncronas aguardando vaga na etapa", ("stage",)
+)
+stage_running = metrics.gauge(
+    "photo_async_stage_running", "Requisições assíncronas executando a etapa", ("stage",)
+)
+
+
+class StageExecutor:
+    """
+    Executa as etapas CPU-bound das views assíncronas fora do event loop, num pool de threads
+    limitado, com um limite de concorrência por etapa (``limits``: etapa -> vagas).
+
+    O pool tem uma thread por vaga, então uma etapa cheia (ex.: inferência) não ocupa as
+    threads das demais, e o event loop continua livre para uploads e requisições leves.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = dict(limits)
+        self._executor = ThreadPoolExecutor(
+            max_workers=sum(self.limits.values()),
+            thread_name_prefix="photo-stage",
+        )
+        # Semáforos do asyncio pertencem a um event loop; em servidores com mais de um loop
+        # (ou no runserver, que cria um loop por requisição assíncrona) cada loop tem os seus
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.get(loop)
+            if semaphores is None:
+                semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()}
+                self._semaphores[loop] = semaphores
+        return semaphores[stage]
+
+    async def run(self, stage: str, fn, *args, **kwargs):
+        """
+        Executa ``fn`` no pool quando houver vaga em ``stage``, no contexto da requisição atual
+        """
+        semaphore = self._semaphore(stage)
+        with stage_waiting.track_in_progress(stage=stage):
+            await semaphore.acquire()
+        try:
+            with stage_running.track_in_progress(stage=stage):
+                call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+                return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            semaphore.release()
+
+
+_stage_executor = None
+_stage_executor_lock = threading.Lock()
+
+
+def get_stage_executor() -> StageExecutor:
+    """
+    Retorna o StageExecutor do processo, configurado por PHOTO_ASYNC_STAGE_LIMITS
+    """
+    global _stage_executor
+    if _stage_executor is None:
+        with _stage_executor_lock:
+            if _stage_executor is None:
+                _stage_executor = StageExecutor(settings.PHOTO_ASYNC_STAGE_LIMITS)
+    return _stage_executor
+
+
+def _reset_after_fork() -> None:
+    global _stage_executor, _stage_executor_lock
+    _stage_executor = None
+    _stage_executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
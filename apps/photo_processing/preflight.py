@@ -0,0 +1,110 @@
+import io
+import logging
+import math
+from dataclasses import dataclass
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Formatos em que ``Image.draft`` reduz a imagem durante a decodificação; os demais
+# são decodificados em resolução original antes de reduzir
+DRAFT_FORMATS = ("JPEG", "MPO")
+
+
+class InvalidImage(ValueError):
+    """
+    O arquivo não é uma imagem em formato aceito
+    """
+
+
+class ImageTooLarge(Exception):
+    """
+    A imagem passa dos limites de bytes ou de pixels
+    """
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(f"Imagem grande demais: {e}")
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidImage(f"Arquivo de imagem inválido: {e}")
+
+
+def inspect_image(source) -> ImageInfo:
+    """
+    Lê apenas o cabeçalho da imagem (bytes ou arquivo) e valida formato e dimensões,
+    sem decodificar os pixels. Arquivos são devolvidos à posição inicial.
+
+    Só JPEGs são decodificados já reduzidos: os demais formatos passam por inteiro na memória,
+    então o limite deles é PHOTO_MAX_DECODE_PIXELS, e não PHOTO_MAX_INPUT_PIXELS.
+    """
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with _open(source) as image:
+            info = ImageInfo(image.format, image.width, image.height)
+    finally:
+        if position is not None:
+            source.seek(position)
+
+    if info.format not in settings.PHOTO_ALLOWED_FORMATS:
+        raise InvalidImage(f"Formato {info.format} não aceito. Aceitos: {list(settings.PHOTO_ALLOWED_FORMATS)}")
+    if info.width <= 0 or info.height <= 0:
+        raise InvalidImage("Imagem sem dimensões válidas")
+    max_pixels = settings.PHOTO_MAX_INPUT_PIXELS if info.format in DRAFT_FORMATS else settings.PHOTO_MAX_DECODE_PIXELS
+    if info.pixels > max_pixels:
+        raise ImageTooLarge(
+            f"Imagem {info.format} de {info.width}x{info.height} passa do limite de "
+            f"{max_pixels / 1e6:.0f} megapixels"
+        )
+    return info
+
+
+def target_size(width: int, height: int, max_side: int = None, max_pixels: int = None):
+    """
+    Tamanho de decodificação que respeita o maior lado e o orçamento de pixels, mantendo a proporção
+    """
+    scale = 1.0
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+    if max_pixels and width * height * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / (width * height))
+    if scale >= 1.0:
+        return width, height
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def decode_image(source, max_side: int = None, max_pixels: int = None) -> Image.Image:
+    """
+    Decodifica a imagem já no tamanho final. Em JPEG, ``draft`` faz o decoder reduzir a imagem
+    em 1/2, 1/4 ou 1/8 durante a própria decodificação (sem materializar a resolução original);
+    o ajuste fino até o tamanho alvo é feito depois, sobre a imagem já reduzida.
+    """
+    image = _open(source)
+    size = target_size(image.width, image.height, max_side, max_pixels)
+    if size != image.size and image.format in DRAFT_FORMATS:
+        image.draft("RGB", size)
+    try:
+        image.load()
+    except (OSError, SyntaxError) as e:
+        raise InvalidImage(f"Arquivo de imagem inválido: {e}")
+
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return image
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+TILE_SIZE = 64
+
+# Tipo de cada bloco da máscara
+TRANSPARENT = 0
+OPAQUE = 1
+EDGE = 2
+
+
+@dataclass
+class AlphaRegions:
+    """
+    Mínimo e máximo do alpha em cada bloco ``tile_size`` x ``tile_size`` da máscara, calculados
+    uma vez e usados pela suavização (blocos uniformes não são filtrados) e pela composição
+    (blocos transparentes copiam o fundo, opacos copiam a pessoa e só os de borda são misturados)
+    """
+
+    height: int
+    width: int
+    tile_size: int
+    tile_min: np.ndarray
+    tile_max: np.ndarray
+
+    @classmethod
+    def from_alpha(cls, alpha: np.ndarray, tile_size: int = TILE_SIZE) -> "AlphaRegions":
+        height, width = alpha.shape[:2]
+        row_starts = np.arange(0, height, tile_size)
+        col_starts = np.arange(0, width, tile_size)
+        rows_min = np.minimum.reduceat(alpha, row_starts, axis=0)
+        rows_max = np.maximum.reduceat(alpha, row_starts, axis=0)
+        return cls(
+            height, width, tile_size,
+            np.minimum.reduceat(rows_min, col_starts, axis=1),
+            np.maximum.reduceat(rows_max, col_starts, axis=1),
+        )
+
+    @classmethod
+    def full_frame(cls, height: int, width: int, tile_size: int = TILE_SIZE) -> "AlphaRegions":
+        """
+        Todos os blocos como borda: composição do quadro inteiro, sem atalhos
+        """
+        shape = (-(-height // tile_size), -(-width // tile_size))
+        return cls(height, width, tile_size, np.zeros(shape, dtype=np.uint8), np.full(shape, 255, dtype=np.uint8))
+
+    @property
+    def kinds(self) -> np.ndarray:
+        kinds = np.full(self.tile_min.shape, EDGE, dtype=np.uint8)
+        kinds[self.tile_max == 0] = TRANSPARENT
+        kinds[self.tile_min == 255] = OPAQUE
+        return kinds
+
+    def bounding_box(self):
+        """
+        Caixa (y0, x0, y1, x1) dos blocos com alguma parte da pessoa, em pixels;
+        (0, 0, 0, 0) se a máscara estiver vazia
+        """
+        rows, cols = np.nonzero(self.tile_max)
+        if not rows.size:
+            return 0, 0, 0, 0
+        return (
+            int(rows.min()) * self.tile_size,
+            int(cols.min()) * self.tile_size,
+            min(self.height, (int(rows.max()) + 1) * self.tile_size),
+            min(self.width, (int(cols.max()) + 1) * self.tile_size),
+        )
+
+    def coverage(self) -> dict:
+        """
+        Fração dos blocos de cada tipo
+        """
+        kinds = self.kinds
+        return {
+            name: float(np.mean(kinds == kind))
+            for name, kind in (("transparent", TRANSPARENT), ("opaque", OPAQUE), ("edge", EDGE))
+        }
+
+    def runs(self):
+        """
+        Percorre a máscara em faixas de ``tile_size`` linhas, agrupando blocos vizinhos do mesmo
+        tipo: (tipo, y0, y1, x0, x1) de cada trecho, para copiar ou misturar cada um de uma vez
+        """
+        kinds = self.kinds
+        for ty, row in enumerate(kinds):
+            y0 = ty * self.tile_size
+            y1 = min(y0 + self.tile_size, self.height)
+            starts = np.concatenate(([0], np.flatnonzero(row[1:] != row[:-1]) + 1))
+            ends = np.append(starts[1:], len(row))
+            for start, end in zip(starts, ends):
+                yield int(row[start]), y0, y1, int(start) * self.tile_size, min(int(end) * self.tile_size, self.width)
@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Registro de modelos carregados sob demanda.
+
+    Cada modelo é carregado uma única vez por processo, na primeira chamada a ``get``
+    ou por ``load_all``/``load_in_background`` na inicialização do worker; nada pesado
+    (torch, transformers, onnxruntime) é importado antes disso.
+
+    Modelos registrados com ``fork_safe=False`` (sessões do onnxruntime, cujos pools de threads
+    não sobrevivem ao fork) são descartados no processo filho e recarregados por ele.
+    """
+
+    NOT_LOADED = 'not_loaded'
+    LOADING = 'loading'
+    LOADED = 'loaded'
+    FAILED = 'failed'
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._fork_safe = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader, fork_safe: bool = True) -> None:
+        with self._lock:
+            self._loaders[name] = loader
+            self._fork_safe[name] = fork_safe
+            self._status.setdefault(name, self.NOT_LOADED)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        """
+        Retorna o modelo, carregando-o se necessário
+        """
+        if self._status.get(name) == self.LOADED:
+            return self._models[name]
+
+        with self._locks[name]:
+            if self._status[name] == self.LOADED:
+                return self._models[name]
+
+            self._status[name] = self.LOADING
+            started = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._status[name] = self.FAILED
+                self._errors[name] = str(e)
+                logger.error(f"Erro ao carregar modelo {name}: {e}")
+                raise
+
+            self._models[name] = model
+            self._load_seconds[name] = time.perf_counter() - started
+            self._errors.pop(name, None)
+            self._status[name] = self.LOADED
+            logger.info(f"Modelo {name} carregado em {self._load_seconds[name]:.2f}s")
+            return model
+
+    def load_all(self, fork_safe_only: bool = False) -> None:
+        for name in list(self._loaders):
+            if fork_safe_only and not self._fork_safe[name]:
+                continue
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    def load_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.load_all, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def reset_after_fork(self) -> None:
+        """
+        Chamado no processo filho logo após o fork: descarta modelos que não podem ser
+        compartilhados e os carregamentos interrompidos (a thread que carregava ficou no pai)
+        """
+        self._lock = threading.Lock()
+        for name in list(self._loaders):
+            self._locks[name] = threading.Lock()
+            status = self._status[name]
+            if status == self.LOADING or (status == self.LOADED and not self._fork_safe[name]):
+                self._models.pop(name, None)
+                self._status[name] = self.NOT_LOADED
+
+    def is_ready(self) -> bool:
+        return all(status == self.LOADED for status in self._status.values())
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "status": self._status[name],
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+def load_nsfw_classifier():
+    from .nsfw import create_classifier
+
+    return create_classifier(settings.NSFW_BACKEND, settings.NSFW_MODEL_NAME, settings.NSFW_ONNX_MODEL_PATH)
+
+
+def load_rembg_session_pool():
+    from .sessions import get_session_pool
+
+    pool = get_session_pool()
+    pool.warmup()
+    return pool
+
+
+def load_background_cache():
+    from .background_cache import get_background_cache
+    from .catalogue import get_catalogue
+
+    # Registra no cache os fundos cadastrados no banco
+    get_catalogue().backgrounds()
+    cache = get_background_cache()
+    cache.load_all()
+    return cache
+
+
+registry = ModelRegistry()
+registry.register("nsfw_classifier", load_nsfw_classifier, fork_safe=settings.NSFW_BACKEND == 'torch')
+registry.register("rembg_session_pool", load_rembg_session_pool, fork_safe=False)
+registry.register("background_cache", load_background_cache)
+
+os.register_at_fork(after_in_child=registry.reset_after_fork)
+
+
+def load_models_on_startup() -> None:
+    """
+    Carrega os modelos conforme MODEL_LOADING: ``eager`` bloqueia até carregar,
+    ``background`` carrega numa thread sem atrasar o boot, ``lazy`` espera a primeira requisição
+    e ``preload`` (master do gunicorn com ``preload_app``) carrega só os modelos que podem ser
+    compartilhados com os workers; o restante fica para ``load_models_after_fork``
+    """
+    from django.urls import get_resolver
+
+    mode = settings.MODEL_LOADING
+    if mode == 'lazy':
+        return
+
+    # Importa o URLconf (views e serviços) agora, e não na primeira requisição
+    get_resolver().url_patterns
+
+    if mode == 'eager':
+        registry.load_all()
+    elif mode == 'background':
+        registry.load_in_background()
+    elif mode == 'preload':
+        registry.load_all(fork_safe_only=True)
+
+
+def load_models_after_fork() -> None:
+    """
+    Carrega no worker, em segundo plano, os modelos que não vieram do master
+    """
+    if settings.MODEL_LOADING != 'lazy':
+        registry.load_in_background()
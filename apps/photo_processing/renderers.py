@@ -0,0 +1,69 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class BinaryRenderer(BaseRenderer):
+    """
+    Renderer de respostas binárias já prontas (bytes); respostas de erro continuam em JSON
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+
+class JPEGRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: image/jpeg``
+    """
+    media_type = 'image/jpeg'
+    format = 'jpg'
+
+
+class WebPRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: image/webp``
+    """
+    media_type = 'image/webp'
+    format = 'webp'
+
+
+class AVIFRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: image/avif``
+    """
+    media_type = 'image/avif'
+    format = 'avif'
+
+
+IMAGE_RENDERERS = [JPEGRenderer, WebPRenderer, AVIFRenderer]
+
+
+class ZipRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: application/zip``
+    """
+    media_type = 'application/zip'
+    format = 'zip'
+
+
+class MultipartMixedRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: multipart/mixed``; o corpo é gerado pela view em streaming
+    """
+    media_type = 'multipart/mixed'
+    format = 'multipart'
+
+
+class EventStreamRenderer(BinaryRenderer):
+    """
+    Permite negociar ``Accept: text/event-stream``; os eventos são gerados pela view em streaming
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
@@ -0,0 +1,238 @@
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .masks import InvalidMask, decode_mask, encode_mask
+
+logger = logging.getLogger(__name__)
+
+
+def photo_hash(data: bytes) -> str:
+    """
+    Hash de conteúdo dos bytes enviados, usado como chave dos caches
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_size_of(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 64
+
+
+class MemoryTier:
+    """
+    LRU em memória limitado pelo total de bytes dos valores
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._bytes -= _size_of(previous)
+            self._items[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= _size_of(evicted)
+
+
+class DiskTier:
+    """
+    Cache em disco (um arquivo por chave) limitado em bytes, removendo os arquivos
+    acessados há mais tempo. Pode ser compartilhado entre os workers.
+    """
+
+    def __init__(self, root, max_bytes: int):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _scan(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                data = cache_file.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def read_mapped(self, key: str, reader):
+        """
+        Chama ``reader`` com o arquivo da chave mapeado em memória (somente leitura) e
+        retorna o resultado, ou None se a chave não existir
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                if not os.fstat(cache_file.fileno()).st_size:
+                    return None
+                with mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    value = reader(mapped)
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, path)
+
+        with self._lock:
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Reconta pelo disco, já que outros workers também escrevem no diretório
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        limit = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._bytes = total
+
+
+class ResultCache:
+    """
+    Cache em dois níveis, endereçado pelo hash dos bytes da foto:
+
+    - análise: veredito NSFW e máscara alpha, por (hash, parâmetros de segmentação);
+    - resultado: imagem final, por (hash, fundo, parâmetros de composição).
+
+    Trocar o fundo de uma foto já vista reaproveita a análise e não executa nenhum modelo.
+    """
+
+    def __init__(self, memory_bytes: int, disk_root=None, disk_bytes: int = 0):
+        self.memory = MemoryTier(memory_bytes)
+        self.disk = DiskTier(disk_root, disk_bytes) if disk_root else None
+
+    def get_analysis(self, key: str):
+        """
+        Retorna (nsfw, alpha) ou None; alpha é None quando a foto foi rejeitada
+        """
+        entry = self.memory.get(("analysis", key))
+        if entry is not None or self.disk is None:
+            return entry
+
+        try:
+            entry = self.disk.read_mapped(f"analysis:{key}", self._decode_analysis)
+        except InvalidMask as e:
+            logger.error(f"Análise inválida no cache em disco: {e}")
+            return None
+        if entry is not None:
+            self.memory.set(("analysis", key), entry)
+        return entry
+
+    @staticmethod
+    def _decode_analysis(mapped):
+        # b"1" para fotos rejeitadas; senão a máscara no formato compacto de masks.py
+        if mapped[:1] == b"1":
+            return True, None
+        return False, decode_mask(mapped)
+
+    def set_analysis(self, key: str, nsfw: bool, alpha: np.ndarray = None) -> None:
+        if alpha is not None:
+            alpha = np.ascontiguousarray(alpha)
+            alpha.flags.writeable = False
+        self.memory.set(("analysis", key), (nsfw, alpha))
+        if self.disk is not None:
+            payload = b"1" if nsfw else encode_mask(alpha)
+            self._write_disk(f"analysis:{key}", payload)
+
+    def get_result(self, key: str):
+        result = self.memory.get(("result", key))
+        if result is not None or self.disk is None:
+            return result
+        result = self.disk.get(f"result:{key}")
+        if result is not None:
+            self.memory.set(("result", key), result)
+        return result
+
+    def set_result(self, key: str, data: bytes) -> None:
+        self.memory.set(("result", key), data)
+        if self.disk is not None:
+            self._write_disk(f"result:{key}", data)
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        try:
+            self.disk.set(key, data)
+        except OSError as e:
+            logger.error(f"Erro ao gravar cache em disco: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Retorna o cache de resultados do processo, ou None se estiver desabilitado
+    """
+    global _cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    memory_bytes=settings.RESULT_CACHE_MEMORY_BYTES,
+                    disk_root=settings.RESULT_CACHE_DISK_ROOT if settings.RESULT_CACHE_DISK_ENABLED else None,
+                    disk_bytes=settings.RESULT_CACHE_DISK_MAX_BYTES,
+                )
+    return _cache
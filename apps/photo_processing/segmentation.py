@@ -0,0 +1,164 @@
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+U2NET_INPUT_SIZE = (320, 320)
+U2NET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+U2NET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def preprocess(image_array: np.ndarray) -> np.ndarray:
+    """
+    Redimensiona e normaliza a imagem para a entrada do U2Net (3, 320, 320),
+    seguindo o mesmo pré-processamento da sessão u2net_human_seg do rembg
+    """
+    resized = np.asarray(Image.fromarray(image_array).resize(U2NET_INPUT_SIZE, Image.Resampling.LANCZOS), dtype=np.float32)
+    resized /= max(float(resized.max()), 1e-6)
+    resized -= U2NET_MEAN
+    resized /= U2NET_STD
+    return resized.transpose((2, 0, 1))
+
+
+def postprocess(prediction: np.ndarray, size) -> np.ndarray:
+    """
+    Converte a saída do U2Net (320, 320) em máscara uint8 no tamanho original (largura, altura)
+    """
+    ma = prediction.max()
+    mi = prediction.min()
+    prediction = (prediction - mi) / max(ma - mi, 1e-6)
+    mask = Image.fromarray((prediction * 255).astype(np.uint8), mode="L")
+    return np.asarray(mask.resize(size, Image.Resampling.LANCZOS))
+
+
+class SegmentationCancelled(Exception):
+    """
+    A segmentação foi cancelada (ex.: a foto foi reprovada pelo NSFW enquanto era segmentada)
+    """
+
+
+class CancelToken:
+    """
+    Cancelamento de uma segmentação em andamento a partir de outra thread.
+
+    ``cancel`` marca o token e liga ``terminate`` nos RunOptions do onnxruntime das execuções
+    em curso, que então abortam em vez de terminar a inferência.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._run_options = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            for run_options in self._run_options:
+                run_options.terminate = True
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled:
+            raise SegmentationCancelled()
+
+    def run_options(self):
+        """
+        RunOptions para uma chamada ``InferenceSession.run`` que este token pode interromper
+        """
+        import onnxruntime as ort
+
+        run_options = ort.RunOptions()
+        with self._lock:
+            run_options.terminate = self._cancelled
+            self._run_options.append(run_options)
+        return run_options
+
+
+def predict_masks(session, image_arrays: list, cancel: CancelToken = None) -> list:
+    """
+    Executa o U2Net de uma sessão rembg sobre várias imagens RGB de uma vez.
+
+    Se o modelo exportado tiver o lote fixo em 1, as imagens são executadas
+    uma a uma na mesma sessão. Com ``cancel``, a inferência é interrompida quando o
+    token é cancelado (levanta SegmentationCancelled).
+    """
+    inner = session.inner_session
+    model_input = inner.get_inputs()[0]
+    batch = np.stack([preprocess(image_array) for image_array in image_arrays])
+    run_options = None
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+        run_options = cancel.run_options()
+
+    try:
+        if isinstance(model_input.shape[0], int) and model_input.shape[0] == 1:
+            predictions = np.concatenate([
+                inner.run(None, {model_input.name: batch[i:i + 1]}, run_options)[0]
+                for i in range(len(batch))
+            ])
+        else:
+            predictions = inner.run(None, {model_input.name: batch}, run_options)[0]
+    except Exception as e:
+        # O onnxruntime sinaliza o terminate com um erro genérico
+        if cancel is not None and cancel.cancelled:
+            raise SegmentationCancelled() from e
+        raise
+
+    return [
+        postprocess(predictions[i, 0], (image_array.shape[1], image_array.shape[0]))
+        for i, image_array in enumerate(image_arrays)
+    ]
+
+
+def cutout(image_array: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Monta o RGBA recortado a partir da máscara, como o ``naive_cutout`` do rembg
+    """
+    mask16 = mask.astype(np.uint16)[:, :, None]
+    rgb = (image_array.astype(np.uint16) * mask16 + 127) // 255
+    return np.dstack([rgb.astype(np.uint8), mask])
+
+
+def _box(image: np.ndarray, radius: int) -> np.ndarray:
+    return cv2.boxFilter(image, -1, (2 * radius + 1, 2 * radius + 1), borderType=cv2.BORDER_REFLECT)
+
+
+def upscale_alpha(proxy_alpha: np.ndarray, proxy_rgb: np.ndarray, full_rgb: np.ndarray,
+                  refine: bool = True, radius: int = 4, eps: float = 1e-4) -> np.ndarray:
+    """
+    Amplia a máscara calculada na imagem reduzida para a resolução original.
+
+    Com ``refine`` usa um guided filter rápido: os coeficientes lineares são calculados
+    na resolução reduzida, usando a imagem reduzida em tons de cinza como guia, e só eles
+    são ampliados e aplicados sobre a imagem original, o que devolve às bordas os detalhes
+    (cabelo, contornos) perdidos na redução sem filtrar a imagem inteira em alta resolução.
+    """
+    height, width = full_rgb.shape[:2]
+    if not refine:
+        return cv2.resize(proxy_alpha, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    guide = cv2.cvtColor(proxy_rgb, cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+    alpha = proxy_alpha.astype(np.float32) / 255.0
+
+    mean_guide = _box(guide, radius)
+    mean_alpha = _box(alpha, radius)
+    cov = _box(guide * alpha, radius) - mean_guide * mean_alpha
+    var = _box(guide * guide, radius) - mean_guide * mean_guide
+    a = cov / (var + eps)
+    b = mean_alpha - a * mean_guide
+    mean_a = _box(a, radius)
+    mean_b = _box(b, radius)
+
+    result = cv2.resize(mean_a, (width, height), interpolation=cv2.INTER_LINEAR)
+    full_guide = cv2.cvtColor(full_rgb, cv2.COLOR_RGB2GRAY)
+    result *= full_guide
+    result *= 1.0 / 255.0
+    result += cv2.resize(mean_b, (width, height), interpolation=cv2.INTER_LINEAR)
+    np.clip(result, 0.0, 1.0, out=result)
+    result *= 255.0
+    result += 0.5
+    return result.astype(np.uint8)
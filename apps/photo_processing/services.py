@@ -1,147 +1,502 @@
-import rembg
+import cv2
 import numpy as np
-from PIL import Image, ImageFilter, ImageFile
-import io
-import os
+from PIL import Image, ImageFile
 from django.conf import settings
 import logging
-from transformers import pipeline
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .background_cache import get_background_cache
+from .catalogue import get_catalogue
+from .encoding import EncodeOptions, default_encoding, encode_image
+from .batching import MicroBatcher
+from .compositing import Compositor
+from .feathering import smooth_alpha_regions
+from .nsfw import nsfw_thumbnail
+from .masks import get_mask_store
+from .metrics import input_megapixels, maybe_profile, metrics, photos_in_progress, photos_processed, stage
+from .preflight import decode_image, inspect_image
+from .regions import AlphaRegions
+from .registry import registry
+from .result_cache import get_result_cache, photo_hash
+from .segmentation import CancelToken, SegmentationCancelled, cutout, predict_masks, upscale_alpha
+from .sessions import get_session_pool
 
 logger = logging.getLogger(__name__)
-classifier = pipeline("image-classification", model="Falconsai/nsfw_image_detection")
+
+metrics.gauge(
+    "photo_rembg_sessions_in_use", "Sessões rembg emprestadas no momento",
+    function=lambda: get_session_pool().in_use(),
+)
+
+
+def nsfw_scores_batch(images: list) -> list:
+    """
+    Classifica um lote de imagens PIL e retorna o score NSFW de cada uma
+    """
+    return registry.get("nsfw_classifier").scores(images)
+
+
+def segment_batch(image_arrays: list) -> list:
+    """
+    Remove o fundo de um lote de imagens RGB com uma única inferência do U2Net
+    """
+    with get_session_pool().session(timeout=settings.REMBG_SESSION_TIMEOUT) as session:
+        masks = predict_masks(session, image_arrays)
+    return [cutout(image_array, mask) for image_array, mask in zip(image_arrays, masks)]
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+_nsfw_executor = None
+_nsfw_executor_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # As threads dos batchers e dos pools de renderização e NSFW não existem no processo filho
+    global _batchers_lock, _render_executor, _render_executor_lock, _nsfw_executor, _nsfw_executor_lock
+    _batchers.clear()
+    _batchers_lock = threading.Lock()
+    _render_executor = None
+    _render_executor_lock = threading.Lock()
+    _nsfw_executor = None
+    _nsfw_executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_batcher(name: str) -> MicroBatcher:
+    """
+    Retorna o MicroBatcher do processo para ``nsfw`` ou ``segmentation``
+    """
+    with _batchers_lock:
+        if name not in _batchers:
+            batch_fn = {"nsfw": nsfw_scores_batch, "segmentation": segment_batch}[name]
+            _batchers[name] = MicroBatcher(
+                batch_fn,
+                max_batch_size=settings.PHOTO_BATCH_MAX_SIZE,
+                max_wait_ms=settings.PHOTO_BATCH_MAX_WAIT_MS,
+                name=name,
+            )
+        return _batchers[name]
+
+
+def get_render_executor() -> ThreadPoolExecutor:
+    """
+    Pool de threads do processo para composição e codificação JPEG (numpy, OpenCV e PIL
+    liberam o GIL), criado no primeiro uso para não atravessar o fork dos workers
+    """
+    global _render_executor
+    if _render_executor is None:
+        with _render_executor_lock:
+            if _render_executor is None:
+                _render_executor = ThreadPoolExecutor(
+                    max_workers=settings.PHOTO_RENDER_WORKERS,
+                    thread_name_prefix="photo-render",
+                )
+    return _render_executor
+
+
+def get_nsfw_executor() -> ThreadPoolExecutor:
+    """
+    Pool de threads do processo que classifica as miniaturas NSFW enquanto a thread
+    da requisição segmenta a mesma foto (NSFW_OVERLAP_SEGMENTATION)
+    """
+    global _nsfw_executor
+    if _nsfw_executor is None:
+        with _nsfw_executor_lock:
+            if _nsfw_executor is None:
+                _nsfw_executor = ThreadPoolExecutor(
+                    max_workers=settings.NSFW_SCREENING_WORKERS,
+                    thread_name_prefix="photo-nsfw",
+                )
+    return _nsfw_executor
 
 
 class PhotoBackgroundChanger:
     def __init__(self):
-        self.backgrounds = {
-            "spiderman_building": "assets/backgrounds/building.jpg",
-            "goku_clouds": "assets/backgrounds/clouds.jpg",
-            "space": "assets/backgrounds/space.webp",
-            "beach": "assets/backgrounds/beach.jpeg",
-            "forest": "assets/backgrounds/forest.jpg"
-        }
-        
-        self.poses = {
-            "spiderman": {
-                "name": "Homem-Aranha",
-                "description": "Pose agachado com mão no chão",
-                "reference_image": "assets/poses/spiderman_pose.jpg"
-            },
-            "sitting_cross_legs": {
-                "name": "Sentado de pernas cruzadas",
-                "description": "Posição de meditação",
-                "reference_image": "assets/poses/sitting_cross_legs.jpg"
-            },
-            "flying": {
-                "name": "Voando",
-                "description": "Braços estendidos como se estivesse voando",
-                "reference_image": "assets/poses/flying_pose.jpg"
-            },
-            "superhero": {
-                "name": "Super-herói",
-                "description": "Mãos na cintura, peito estufado",
-                "reference_image": "assets/poses/superhero_pose.jpg"
-            }
-        }
+        self.catalogue = get_catalogue()
+        self.compositor = Compositor()
+        self.background_cache = get_background_cache()
 
-    def remove_background(self, image_array: np.ndarray) -> np.ndarray:
+    def remove_background(self, image_array: np.ndarray, cancel: CancelToken = None) -> np.ndarray:
         """
-        Remove background using rembg with u2net_human_seg model
+        Remove background using rembg with u2net_human_seg model.
+
+        Com ``cancel``, levanta SegmentationCancelled quando o token é cancelado: a inferência
+        em andamento é interrompida (ou, em lote, o resultado desta foto é descartado).
         """
+        import rembg
+
         try:
-            session = rembg.new_session(model_name="u2net_human_seg")
-            output_array = rembg.remove(image_array, session=session)
+            if settings.PHOTO_BATCHING_ENABLED:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                # O lote é compartilhado com outras requisições: não é interrompido, só descartado
+                request = get_batcher("segmentation").submit(image_array)
+                logger.debug(f"Segmentação aguardou {request.wait_ms:.1f}ms em lote de {request.batch_size}")
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                return request.result
+
+            with get_session_pool().session(timeout=settings.REMBG_SESSION_TIMEOUT) as session:
+                if cancel is not None:
+                    # Mesma inferência do rembg.remove, com RunOptions que o token pode interromper
+                    return cutout(image_array, predict_masks(session, [image_array], cancel)[0])
+                output_array = rembg.remove(image_array, session=session)
             return output_array
+        except SegmentationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error in rembg background removal: {e}")
             raise
 
-    def smooth_alpha_edges(self, alpha_channel: np.ndarray, blur_radius: float = 2.0, feather_size: int = 3) -> np.ndarray:
+    def segment_alpha(self, image_array: np.ndarray, cancel: CancelToken = None) -> np.ndarray:
         """
-        Suaviza as bordas do canal alpha para uma composição mais suave
+        Retorna a máscara alpha (uint8) da pessoa na resolução de ``image_array``.
+
+        Imagens maiores que SEGMENTATION_MAX_SIDE são segmentadas numa cópia reduzida
+        e apenas a máscara é ampliada (com refinamento de bordas) para a resolução original.
         """
-        alpha_pil = Image.fromarray((alpha_channel * 255).astype(np.uint8).squeeze())
-        
-        blurred = alpha_pil.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-        
-        smoothed_alpha = np.array(blurred).astype(np.float32) / 255.0
-        
-        if feather_size > 0:
-            from scipy.ndimage import binary_erosion, gaussian_filter
+        height, width = image_array.shape[:2]
+        max_side = settings.SEGMENTATION_MAX_SIDE
+        if not max_side or max(height, width) <= max_side:
+            return self.remove_background(image_array, cancel=cancel)[:, :, 3]
+
+        scale = max_side / max(height, width)
+        proxy_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        proxy = cv2.resize(image_array, proxy_size, interpolation=cv2.INTER_AREA)
+        proxy_alpha = self.remove_background(proxy, cancel=cancel)[:, :, 3]
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        return upscale_alpha(proxy_alpha, proxy, image_array, refine=settings.SEGMENTATION_REFINE_EDGES)
+
+    def smooth_alpha_regions(self, alpha_channel: np.ndarray, blur_radius: float = 2.5, feather_size: int = 2):
+        """
+        Suaviza as bordas do canal alpha (uint8 HxW), processando apenas os blocos próximos da
+        silhueta, e retorna também os blocos transparentes, opacos e de borda da máscara
+        suavizada (AlphaRegions), que a composição usa para misturar só a borda
+        """
+        return smooth_alpha_regions(alpha_channel, blur_radius=blur_radius, feather_size=feather_size)
+
+    def analysis_cache_key(self, digest: str) -> str:
+        """
+        Chave da análise no cache: hash da foto mais os parâmetros que mudam a máscara
+        """
+        return ":".join(str(part) for part in (
+            digest,
+            settings.PHOTO_OUTPUT_MAX_SIDE,
+            settings.PHOTO_MAX_DECODE_PIXELS,
+            settings.SEGMENTATION_MAX_SIDE,
+            settings.SEGMENTATION_REFINE_EDGES,
+        ))
+
+    def decode_photo(self, person_image_data: bytes) -> Image.Image:
+        """
+        Decodifica a foto já limitada a PHOTO_OUTPUT_MAX_SIDE e ao orçamento PHOTO_MAX_DECODE_PIXELS,
+        reduzindo JPEGs durante a própria decodificação
+        """
+        with stage("decode"):
+            inspect_image(person_image_data)
+            image = decode_image(
+                person_image_data,
+                max_side=settings.PHOTO_OUTPUT_MAX_SIDE,
+                max_pixels=settings.PHOTO_MAX_DECODE_PIXELS,
+            )
+        input_megapixels.observe(image.width * image.height / 1e6)
+        return image
+
+    def _decoded(self, person_image_data: bytes, person_image: Image.Image = None) -> Image.Image:
+        return person_image if person_image is not None else self.decode_photo(person_image_data)
+
+    def analyze_photo(self, person_image_data: bytes, digest: str = None, person_image: Image.Image = None):
+        """
+        Decodifica a foto, verifica NSFW e segmenta a pessoa. ``person_image`` é a foto já
+        decodificada com ``decode_photo`` (ex.: numa etapa de pré-carga), que então não é decodificada aqui.
+
+        Retorna (person_array, alpha), ou None se a imagem for NSFW. Com o cache de resultados
+        ou o MaskStore habilitado, uma foto já vista (mesmos bytes) não passa pelos modelos de novo.
+        """
+        cache = get_result_cache()
+        store = get_mask_store()
+        cache_key = None
+        if cache is not None or store is not None:
+            digest = digest or photo_hash(person_image_data)
+            cache_key = self.analysis_cache_key(digest)
+        if cache is not None:
+            cached = cache.get_analysis(cache_key)
+            if cached is not None:
+                nsfw, alpha = cached
+                if nsfw:
+                    return None
+                person_array = np.array(self._decoded(person_image_data, person_image).convert('RGB'))
+                if person_array.shape[:2] == alpha.shape[:2]:
+                    return person_array, alpha
+        if store is not None:
+            # Só fotos aprovadas são armazenadas: uma máscara no store dispensa os dois modelos
+            alpha = store.load(digest, cache_key)
+            if alpha is not None:
+                person_array = np.array(self._decoded(person_image_data, person_image).convert('RGB'))
+                if person_array.shape[:2] == alpha.shape[:2]:
+                    if cache is not None:
+                        cache.set_analysis(cache_key, False, alpha)
+                    return person_array, alpha
+
+        person_pil = self._decoded(person_image_data, person_image).convert('RGB')
+        # O classificador só vê 224x224: reduz uma vez aqui em vez de passar a foto inteira
+        with stage("nsfw_thumbnail"):
+            thumbnail = nsfw_thumbnail(person_pil)
+        person_array = np.array(person_pil)
+
+        if settings.NSFW_OVERLAP_SEGMENTATION:
+            alpha = self._screen_and_segment(person_array, thumbnail)
+        else:
+            with stage("nsfw"):
+                nsfw = self.is_nsfw(thumbnail)
+            # Segmenta numa cópia de tamanho limitado e mantém os pixels originais da pessoa
+            alpha = None
+            if not nsfw:
+                with stage("segmentation"):
+                    alpha = self.segment_alpha(person_array)
+
+        if alpha is None:
+            if cache is not None:
+                cache.set_analysis(cache_key, True)
+            return None
+        if cache is not None:
+            cache.set_analysis(cache_key, False, alpha)
+        if store is not None:
             try:
-                eroded = binary_erosion(smoothed_alpha > 0.5, iterations=feather_size)
-                feathered = gaussian_filter(eroded.astype(np.float32), sigma=feather_size/2)
-                smoothed_alpha = np.minimum(smoothed_alpha, feathered)
-            except ImportError:
-                pass
-        
-        return np.expand_dims(smoothed_alpha, axis=2)
+                store.save(digest, cache_key, alpha, person_image_data)
+            except OSError as e:
+                logger.error(f"Erro ao gravar máscara no MaskStore: {e}")
+        return person_array, alpha
 
-    def compose_images(self, person_rgba: np.ndarray, background_image: np.ndarray, smooth_edges: bool = True) -> np.ndarray:
+    def _screen_and_segment(self, person_array: np.ndarray, thumbnail: Image.Image):
         """
-        Compõe a imagem da pessoa (com transparência) com o fundo usando técnicas avançadas de suavização
+        Classifica a miniatura no pool NSFW enquanto segmenta a foto nesta thread, de modo que
+        a latência seja a do mais lento dos dois modelos. Se a foto for reprovada, a segmentação
+        é cancelada. Retorna a máscara alpha, ou None se a imagem for NSFW.
         """
-        person_h, person_w = person_rgba.shape[:2]
-        background_resized = background_image.resize((person_w, person_h))
-        background_array = np.array(background_resized)
-        
-        alpha = person_rgba[:, :, 3:4] / 255.0
-        person_rgb = person_rgba[:, :, :3].copy().astype(np.float32)
-        
-        if smooth_edges:
-            alpha = self.smooth_alpha_edges(alpha, blur_radius=2.5, feather_size=2)
-            
-            background_mean_color = np.mean(background_array, axis=(0, 1))
-            edge_mask = (alpha > 0.1) & (alpha < 0.9) 
+        cancel = CancelToken()
+
+        def screen() -> bool:
+            with stage("nsfw"):
+                nsfw = self.is_nsfw(thumbnail)
+            if nsfw:
+                cancel.cancel()
+            return nsfw
+
+        screening = get_nsfw_executor().submit(contextvars.copy_context().run, screen)
+        try:
+            with stage("segmentation"):
+                alpha = self.segment_alpha(person_array, cancel=cancel)
+        except SegmentationCancelled:
+            alpha = None
+        except Exception:
+            # Uma foto NSFW é reprovada mesmo que a segmentação tenha falhado
+            if screening.result():
+                return None
+            raise
+
+        if screening.result():
+            logger.debug("Segmentação descartada: imagem reprovada pelo NSFW")
+            return None
+        return alpha
+
+    def render_photo(self, person_array: np.ndarray, alpha: np.ndarray, background_key: str,
+                     encoding: EncodeOptions = None) -> bytes:
+        """
+        Compõe a pessoa já segmentada com o fundo e codifica o resultado
+        (JPEG do settings, ou o formato de ``encoding``)
+        """
+        with stage("smooth_alpha"):
+            smoothed_alpha, regions = self.smooth_alpha_regions(alpha, blur_radius=2.5, feather_size=2)
+        return self.render_smoothed(person_array, smoothed_alpha, background_key, encoding, regions)
+
+    def render_preview(self, person_array: np.ndarray, alpha: np.ndarray, background_key: str) -> bytes:
+        """
+        Prévia da composição, reduzida para PHOTO_PREVIEW_MAX_SIDE e com JPEG de menor qualidade,
+        a partir da mesma máscara do resultado final
+        """
+        height, width = alpha.shape[:2]
+        max_side = settings.PHOTO_PREVIEW_MAX_SIDE
+        if max(height, width) > max_side:
+            scale = max_side / max(height, width)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            person_array = cv2.resize(person_array, size, interpolation=cv2.INTER_AREA)
+            alpha = cv2.resize(alpha, size, interpolation=cv2.INTER_AREA)
+        return self.render_photo(
+            person_array, alpha, background_key,
+            default_encoding(format="jpeg", quality=settings.PHOTO_PREVIEW_QUALITY, progressive=False),
+        )
+
+    def render_smoothed(self, person_array: np.ndarray, smoothed_alpha: np.ndarray, background_key: str,
+                        encoding: EncodeOptions = None, regions: AlphaRegions = None) -> bytes:
+        """
+        Como ``render_photo``, com o alpha já suavizado (compartilhado entre vários fundos)
+        e, opcionalmente, seus blocos (``smooth_alpha_regions``)
+        """
+        with stage("compose"):
+            # Fundo decodificado e redimensionado uma vez, compartilhado entre requisições;
+            # carregar o catálogo registra no cache os fundos do banco
+            self.catalogue.snapshot()
+            person_h, person_w = person_array.shape[:2]
+            background_array = self.background_cache.get(background_key, person_w, person_h)
+            if background_array is not None:
+                background_mean = self.background_cache.mean_color(background_key)
+            else:
+                background_array = np.asarray(self.create_colored_background((person_h, person_w), background_key))
+                background_mean = np.mean(background_array, axis=(0, 1))
             
-            if np.any(edge_mask):
-                color_correction_strength = 0.1 
-                for channel in range(3):
-                    person_rgb[:, :, channel] = np.where(
-                        edge_mask.squeeze(),
-                        person_rgb[:, :, channel] * (1 - color_correction_strength) + 
-                        background_mean_color[channel] * color_correction_strength,
-                        person_rgb[:, :, channel]
-                    )
-        
-        result = person_rgb * alpha + background_array * (1 - alpha)
+            # Compose images
+            result = self.compositor.compose(
+                person_array, smoothed_alpha, background_array, background_mean, regions=regions
+            )
         
-        return result.astype(np.uint8)
+        with stage("encode"):
+            return encode_image(result, encoding)
 
-    def process_photo(self, person_image_data: bytes, background_key: str) -> bytes:
+    def result_cache_key(self, digest: str, background_key: str, encoding: EncodeOptions = None) -> str:
         """
-        Processa a foto completa: remove fundo e compõe com novo fundo
+        Chave do resultado no cache: análise, fundo, versão do arquivo do fundo e parâmetros de saída
         """
-        person_pil = Image.open(io.BytesIO(person_image_data))
-        if self.is_nsfw(person_pil):
+        self.catalogue.snapshot()
+        return ":".join((
+            self.analysis_cache_key(digest),
+            background_key,
+            self.background_cache.version(background_key),
+            (encoding or default_encoding()).cache_key(),
+        ))
+
+    def process_photo(self, person_image_data: bytes, background_key: str, on_preview=None,
+                      encoding: EncodeOptions = None) -> bytes:
+        """
+        Processa a foto completa: remove fundo e compõe com novo fundo.
+
+        Com ``on_preview``, a prévia (``render_preview``) é entregue a essa função logo após a
+        segmentação, antes de compor a imagem em resolução total com a mesma máscara.
+        ``encoding`` escolhe formato e parâmetros da saída (padrão: PHOTO_OUTPUT_*).
+        """
+        with photos_in_progress.track_in_progress(), maybe_profile("process_photo"):
+            try:
+                result_bytes, outcome = self._process_photo(person_image_data, background_key, on_preview, encoding)
+            except Exception:
+                photos_processed.inc(outcome="error")
+                raise
+        photos_processed.inc(outcome=outcome)
+        return result_bytes
+
+    def _process_photo(self, person_image_data: bytes, background_key: str, on_preview=None,
+                       encoding: EncodeOptions = None):
+        digest, result_key, cached = self.lookup_result(person_image_data, background_key, encoding)
+        if cached is not None:
+            return cached, "cached"
+
+        analysis = self.analyze_photo(person_image_data, digest)
+        if analysis is None:
             logger.warning("Imagem NSFW detectada.")
-            return b""
-        person_array = np.array(person_pil.convert('RGB'))
+            return b"", "nsfw"
 
-        # Remove background using rembg
-        person_rgba_array = self.remove_background(person_array)
-        
-        # Load background image
-        if background_key in self.backgrounds:
+        if on_preview is not None:
+            on_preview(self.render_preview(*analysis, background_key))
+
+        result_bytes = self.render_photo(*analysis, background_key, encoding)
+        self.store_result(result_key, result_bytes)
+        return result_bytes, "ok"
+
+    def lookup_result(self, person_image_data: bytes, background_key: str, encoding: EncodeOptions = None):
+        """
+        Procura o resultado no cache; retorna (hash da foto, chave do resultado, imagem ou None).
+        Com o cache desabilitado, retorna (None, None, None).
+        """
+        cache = get_result_cache()
+        if cache is None:
+            return None, None, None
+        digest = photo_hash(person_image_data)
+        result_key = self.result_cache_key(digest, background_key, encoding)
+        return digest, result_key, cache.get_result(result_key)
+
+    def store_result(self, result_key: str, result_bytes: bytes) -> None:
+        cache = get_result_cache()
+        if cache is not None and result_key is not None:
+            cache.set_result(result_key, result_bytes)
+
+    def submit_backgrounds(self, person_image_data: bytes, background_keys: list, encoding: EncodeOptions = None):
+        """
+        Segmenta a foto uma única vez e agenda a composição com cada fundo de ``background_keys``
+        no pool de renderização.
+
+        Retorna None se a imagem for NSFW; caso contrário, (dict fundo -> imagem já em cache,
+        dict future -> fundo das composições agendadas).
+        """
+        cached = {}
+        digest = None
+        for key in background_keys:
+            digest, _, result = self.lookup_result(person_image_data, key, encoding)
+            if result is not None:
+                cached[key] = result
+
+        missing = [key for key in background_keys if key not in cached]
+        futures = {}
+        if missing:
+            analysis = self.analyze_photo(person_image_data, digest)
+            if analysis is None:
+                logger.warning("Imagem NSFW detectada.")
+                return None
+            person_array, alpha = analysis
+
+            # A suavização do alpha não depende do fundo: feita uma vez para todos
+            with stage("smooth_alpha"):
+                smoothed_alpha, regions = self.smooth_alpha_regions(alpha, blur_radius=2.5, feather_size=2)
+            executor = get_render_executor()
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self._render_background,
+                    person_array, smoothed_alpha, key, digest, encoding, regions,
+                ): key
+                for key in missing
+            }
+        return cached, futures
+
+    def _render_background(self, person_array: np.ndarray, smoothed_alpha: np.ndarray, background_key: str,
+                           digest: str = None, encoding: EncodeOptions = None,
+                           regions: AlphaRegions = None) -> bytes:
+        result_bytes = self.render_smoothed(person_array, smoothed_alpha, background_key, encoding, regions)
+        if digest is not None:
+            self.store_result(self.result_cache_key(digest, background_key, encoding), result_bytes)
+        return result_bytes
+
+    def process_photo_backgrounds(self, person_image_data: bytes, background_keys: list,
+                                  encoding: EncodeOptions = None):
+        """
+        Segmenta a foto uma única vez e compõe com cada fundo de ``background_keys``,
+        em paralelo no pool de renderização.
+
+        Retorna None se a imagem for NSFW; caso contrário, um iterador de (fundo, imagem)
+        na ordem em que as composições terminam.
+        """
+        submitted = self.submit_backgrounds(person_image_data, background_keys, encoding)
+        if submitted is None:
+            return None
+        cached, futures = submitted
+
+        def results():
             try:
-                background_path = os.path.join(settings.ASSETS_ROOT, 'backgrounds', 
-                                             f'{background_key.split("_")[-1]}.jpg')
-                background_pil = Image.open(background_path)
-            except:
-                background_pil = self.create_colored_background(
-                    person_rgba_array.shape[:2], background_key)
-        else:
-            background_pil = self.create_colored_background(
-                person_rgba_array.shape[:2], background_key)
-        
-        # Compose images
-        result = self.compose_images(person_rgba_array, background_pil)
-        
-        result_pil = Image.fromarray(result)
-        output_buffer = io.BytesIO()
-        result_pil.save(output_buffer, format='JPEG', quality=95)
-        
-        return output_buffer.getvalue()
+                yield from cached.items()
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return results()
 
     def create_colored_background(self, size, background_key: str) -> Image.Image:
         """
@@ -167,9 +522,12 @@ class PhotoBackgroundChanger:
         Retorna True se a imagem for considerada NSFW (pornográfica/sexual).
         threshold = confiança mínima para classificar como NSFW.
         """
-        results = classifier(image)
+        if settings.PHOTO_BATCHING_ENABLED:
+            request = get_batcher("nsfw").submit(image)
+            logger.debug(f"Classificação NSFW aguardou {request.wait_ms:.1f}ms em lote de {request.batch_size}")
+            return request.result >= threshold
 
-        nsfw_score = next((r["score"] for r in results if r["label"] == "nsfw"), 0.0)
+        nsfw_score = nsfw_scores_batch([image])[0]
 
         return nsfw_score >= threshold
 
@@ -177,17 +535,11 @@ class PhotoBackgroundChanger:
         """
         Retorna lista de fundos disponíveis
         """
-        return {
-            "spiderman_building": "Prédio da cidade (estilo Homem-Aranha)",
-            "goku_clouds": "Nuvens no céu (estilo Dragon Ball)",
-            "space": "Espaço sideral",
-            "beach": "Praia tropical", 
-            "forest": "Floresta mística"
-        }
+        return {key: background["description"] for key, background in self.catalogue.backgrounds().items()}
     
     def get_available_poses(self):
         """
         Retorna lista de poses disponíveis
         """
-        return self.poses
+        return self.catalogue.poses()
     
@@ -0,0 +1,160 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def onnx_session_options(intra_op_threads: int = None, inter_op_threads: int = None):
+    """
+    SessionOptions do onnxruntime com os limites de threads informados (ou os do settings)
+    """
+    import onnxruntime as ort
+
+    if intra_op_threads is None:
+        intra_op_threads = settings.ONNXRUNTIME_INTRA_OP_THREADS
+    if inter_op_threads is None:
+        inter_op_threads = settings.ONNXRUNTIME_INTER_OP_THREADS
+
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        sess_opts.inter_op_num_threads = inter_op_threads
+    return sess_opts
+
+
+class SessionPoolTimeout(Exception):
+    """
+    Nenhuma sessão ficou livre dentro do tempo limite
+    """
+
+
+class RembgSessionPool:
+    """
+    Pool de sessões rembg/onnxruntime já carregadas, compartilhado pelas threads do worker.
+
+    As sessões são criadas sob demanda até ``size`` e reaproveitadas entre requisições,
+    evitando recarregar o modelo ONNX do disco a cada foto.
+    """
+
+    def __init__(self, model_name: str, size: int = 1, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        self.model_name = model_name
+        self.size = max(1, int(size))
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._available = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _create_session(self):
+        import rembg
+        from rembg.sessions import sessions_class
+
+        sess_opts = onnx_session_options(self.intra_op_threads, self.inter_op_threads)
+
+        for session_class in sessions_class:
+            if session_class.name() == self.model_name:
+                return session_class(self.model_name, sess_opts)
+
+        logger.warning(f"Modelo {self.model_name} sem classe de sessão conhecida, usando rembg.new_session")
+        return rembg.new_session(model_name=self.model_name)
+
+    def acquire(self, timeout: float = None):
+        """
+        Retira uma sessão do pool, criando uma nova se o limite ainda não foi atingido
+        """
+        try:
+            return self._available.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+
+        if create:
+            try:
+                return self._create_session()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise SessionPoolTimeout(f"Nenhuma sessão {self.model_name} livre após {timeout}s")
+
+    def release(self, session) -> None:
+        """
+        Devolve a sessão ao pool
+        """
+        self._available.put(session)
+
+    def in_use(self) -> int:
+        """
+        Sessões emprestadas no momento
+        """
+        return self._created - self._available.qsize()
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        session = self.acquire(timeout=timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def warmup(self) -> None:
+        """
+        Cria todas as sessões do pool e executa uma inferência descartável em cada uma,
+        para que a primeira requisição não pague o custo de inicialização
+        """
+        import rembg
+
+        sessions = [self.acquire() for _ in range(self.size)]
+        try:
+            dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+            for session in sessions:
+                rembg.remove(dummy, session=session)
+        finally:
+            for session in sessions:
+                self.release(session)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+# Sessões do onnxruntime criadas no processo pai não funcionam no filho (pool de threads perdido)
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_session_pool() -> RembgSessionPool:
+    """
+    Retorna o pool de sessões do processo atual, configurado a partir do settings
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RembgSessionPool(
+                    model_name=settings.REMBG_MODEL_NAME,
+                    size=settings.REMBG_SESSION_POOL_SIZE,
+                    intra_op_threads=settings.ONNXRUNTIME_INTRA_OP_THREADS,
+                    inter_op_threads=settings.ONNXRUNTIME_INTER_OP_THREADS,
+                )
+    return _pool
@@ -0,0 +1,59 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.backgrounds.models import Background
+from apps.poses.models import Pose
+
+from .background_cache import get_background_cache
+from .catalogue import get_catalogue
+from .variants import generate_asset, remove_asset
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_variants(kind: str, key: str, source: str) -> None:
+    """
+    Gera as variantes da imagem alterada depois do commit e atualiza o catálogo
+    """
+    def generate():
+        try:
+            generate_asset(kind, key, source)
+        except Exception as e:
+            logger.error(f"Erro ao gerar variantes de {kind}/{key} ({source}): {e}")
+        get_catalogue().invalidate()
+
+    if settings.ASSET_VARIANTS_ON_SAVE:
+        transaction.on_commit(generate)
+
+
+@receiver(post_save, sender=Background)
+def refresh_cached_background(sender, instance, **kwargs):
+    """
+    Recarrega o fundo alterado no cache do processo
+    """
+    get_background_cache().register(instance.key, instance.image_path)
+    get_catalogue().invalidate()
+    refresh_variants("backgrounds", instance.key, instance.image_path)
+
+
+@receiver(post_delete, sender=Background)
+def drop_cached_background(sender, instance, **kwargs):
+    get_background_cache().remove(instance.key)
+    get_catalogue().invalidate()
+    remove_asset("backgrounds", instance.key)
+
+
+@receiver(post_save, sender=Pose)
+def refresh_cached_pose(sender, instance, **kwargs):
+    get_catalogue().invalidate()
+    refresh_variants("poses", instance.key, instance.reference_image)
+
+
+@receiver(post_delete, sender=Pose)
+def drop_cached_pose(sender, instance, **kwargs):
+    get_catalogue().invalidate()
+    remove_asset("poses", instance.key)
@@ -0,0 +1,293 @@
+import binascii
+import json
+
+# Múltiplo de 3 para que cada pedaço codificado não precise de padding
+ENCODE_CHUNK_SIZE = 48 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = b" \t\r\n"
+
+
+class PayloadTooLarge(Exception):
+    """
+    O corpo da requisição passou do limite configurado
+    """
+
+
+def iter_stream(stream, chunk_size: int = READ_CHUNK_SIZE, max_bytes: int = None):
+    """
+    Lê o stream em pedaços, levantando PayloadTooLarge se passar de ``max_bytes``
+    """
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise PayloadTooLarge(f"Corpo da requisição maior que {max_bytes} bytes")
+        yield chunk
+
+
+def content_length(meta, max_bytes: int = None) -> int:
+    """
+    Content-Length declarado pelo cliente (0 se ausente ou inválido), levantando PayloadTooLarge
+    antes de ler o corpo se passar de ``max_bytes``
+    """
+    try:
+        length = max(0, int(meta.get("CONTENT_LENGTH") or 0))
+    except ValueError:
+        return 0
+    if max_bytes is not None and length > max_bytes:
+        raise PayloadTooLarge(f"Corpo da requisição maior que {max_bytes} bytes")
+    return length
+
+
+def _capacity(size_hint: int, max_bytes: int = None) -> int:
+    # O Content-Length vem do cliente: nunca pré-aloca mais que o limite do corpo
+    size_hint = max(0, size_hint)
+    return size_hint if max_bytes is None else min(size_hint, max_bytes)
+
+
+def read_stream(stream, max_bytes: int = None, size_hint: int = 0) -> bytearray:
+    """
+    Lê o corpo inteiro num único bytearray, pré-alocado a partir de ``size_hint`` (Content-Length),
+    limitado a ``max_bytes``
+    """
+    buffer = bytearray(_capacity(size_hint, max_bytes))
+    view = memoryview(buffer)
+    length = 0
+    for chunk in iter_stream(stream, max_bytes=max_bytes):
+        end = length + len(chunk)
+        if end > len(buffer):
+            view.release()
+            buffer.extend(bytes(end - len(buffer)))
+            view = memoryview(buffer)
+        view[length:end] = chunk
+        length = end
+    view.release()
+    del buffer[length:]
+    return buffer
+
+
+class Base64Decoder:
+    """
+    Decodifica base64 incrementalmente num bytearray pré-alocado
+    """
+
+    def __init__(self, size_hint: int = 0):
+        self.buffer = bytearray(max(0, size_hint) * 3 // 4 + 3)
+        self.length = 0
+        self._pending = b""
+
+    def _write(self, decoded: bytes) -> None:
+        end = self.length + len(decoded)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(end - len(self.buffer)))
+        self.buffer[self.length:end] = decoded
+        self.length = end
+
+    def feed(self, data: bytes) -> None:
+        data = self._pending + data
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._write(binascii.a2b_base64(data[:usable], strict_mode=True))
+        self._pending = data[usable:]
+
+    def finish(self) -> bytearray:
+        if self._pending:
+            raise binascii.Error("base64 com comprimento inválido")
+        del self.buffer[self.length:]
+        return self.buffer
+
+
+class StreamingJSONReader:
+    """
+    Lê um objeto JSON do stream em pedaços, decodificando o valor base64 de ``field``
+    diretamente para bytes, sem manter o texto base64 nem o corpo inteiro em memória.
+
+    Os demais campos são interpretados normalmente com ``json.loads``.
+    """
+
+    def __init__(self, stream, field: str, max_bytes: int = None, size_hint: int = 0):
+        self.field = field
+        self.size_hint = _capacity(size_hint, max_bytes)
+        self._chunks = iter_stream(stream, max_bytes=max_bytes)
+        self._buffer = b""
+        self._pos = 0
+
+    def _fill(self) -> None:
+        try:
+            self._buffer = next(self._chunks)
+        except StopIteration:
+            raise ValueError("JSON incompleto")
+        self._pos = 0
+
+    def _read_byte(self) -> bytes:
+        while self._pos >= len(self._buffer):
+            self._fill()
+        byte = self._buffer[self._pos:self._pos + 1]
+        self._pos += 1
+        return byte
+
+    def _next_token(self) -> bytes:
+        byte = self._read_byte()
+        while byte in WHITESPACE:
+            byte = self._read_byte()
+        return byte
+
+    def _read_string(self) -> bytes:
+        """
+        Lê uma string JSON (a aspa inicial já foi consumida) e retorna o texto bruto com as aspas
+        """
+        parts = [b'"']
+        while True:
+            while self._pos >= len(self._buffer):
+                self._fill()
+            quote = self._buffer.find(b'"', self._pos)
+            backslash = self._buffer.find(b"\\", self._pos)
+            if backslash != -1 and (quote == -1 or backslash < quote):
+                parts.append(self._buffer[self._pos:backslash + 1])
+                self._pos = backslash + 1
+                parts.append(self._read_byte())
+            elif quote != -1:
+                parts.append(self._buffer[self._pos:quote + 1])
+                self._pos = quote + 1
+                return b"".join(parts)
+            else:
+                parts.append(self._buffer[self._pos:])
+                self._pos = len(self._buffer)
+
+    def _read_value(self, first: bytes) -> bytes:
+        if first == b'"':
+            return self._read_string()
+        if first in (b"{", b"["):
+            parts = [first]
+            depth = 1
+            while depth:
+                byte = self._read_byte()
+                if byte == b'"':
+                    parts.append(self._read_string())
+                    continue
+                if byte in (b"{", b"["):
+                    depth += 1
+                elif byte in (b"}", b"]"):
+                    depth -= 1
+                parts.append(byte)
+            return b"".join(parts)
+
+        parts = [first]
+        while True:
+            while self._pos >= len(self._buffer):
+                self._fill()
+            byte = self._buffer[self._pos:self._pos + 1]
+            if byte in b",}]" or byte in WHITESPACE:
+                return b"".join(parts)
+            parts.append(byte)
+            self._pos += 1
+
+    def _decode_string(self) -> bytearray:
+        decoder = Base64Decoder(self.size_hint)
+        while True:
+            while self._pos >= len(self._buffer):
+                self._fill()
+            quote = self._buffer.find(b'"', self._pos)
+            backslash = self._buffer.find(b"\\", self._pos)
+            ends = [index for index in (quote, backslash) if index != -1]
+            end = min(ends) if ends else len(self._buffer)
+            decoder.feed(self._buffer[self._pos:end])
+            self._pos = end
+            if end == len(self._buffer):
+                continue
+            self._pos += 1
+            if end == quote:
+                return decoder.finish()
+            escaped = self._read_byte()
+            if escaped == b"/":
+                decoder.feed(b"/")
+            elif escaped not in b"nrt":
+                raise ValueError("Escape inválido no base64")
+
+    def read(self):
+        """
+        Retorna (bytes decodificados de ``field`` ou None, dict com os demais campos)
+        """
+        decoded = None
+        fields = {}
+        if self._next_token() != b"{":
+            raise ValueError("Esperado um objeto JSON")
+
+        token = self._next_token()
+        while token != b"}":
+            if token != b'"':
+                raise ValueError("Esperado o nome de um campo")
+            key = json.loads(self._read_string())
+            if self._next_token() != b":":
+                raise ValueError("Esperado ':'")
+            token = self._next_token()
+            if key == self.field and token == b'"':
+                decoded = self._decode_string()
+            else:
+                fields[key] = json.loads(self._read_value(token))
+            token = self._next_token()
+            if token == b",":
+                token = self._next_token()
+                if token == b"}":
+                    raise ValueError("Vírgula sobrando no objeto JSON")
+            elif token != b"}":
+                raise ValueError("Esperado ',' ou '}'")
+
+        for chunk in [self._buffer[self._pos:], *self._chunks]:
+            if chunk.strip(WHITESPACE):
+                raise ValueError("Conteúdo após o objeto JSON")
+        return decoded, fields
+
+
+def iter_base64_json(data: bytes, field: str, extra: dict):
+    """
+    Gera um objeto JSON com ``data`` codificado em base64 no campo ``field``, em pedaços,
+    seguido dos campos de ``extra``, no mesmo formato compacto do JSONRenderer
+    """
+    yield b"{" + json.dumps(field).encode() + b':"'
+    view = memoryview(data)
+    for start in range(0, len(view), ENCODE_CHUNK_SIZE):
+        yield binascii.b2a_base64(view[start:start + ENCODE_CHUNK_SIZE], newline=False)
+    tail = b'"'
+    for key, value in extra.items():
+        tail += b"," + json.dumps(key, ensure_ascii=False).encode() + b":" + json.dumps(value, ensure_ascii=False).encode()
+    yield tail + b"}"
+
+
+def iter_multipart(parts, boundary: str):
+    """
+    Gera um corpo ``multipart/mixed`` a partir de (nome, content_type, bytes), enviando
+    cada parte assim que ela é produzida
+    """
+    for name, content_type, data in parts:
+        yield format_part_header(boundary, name, content_type, len(data))
+        yield data
+        yield b"\r\n"
+    yield format_multipart_end(boundary)
+
+
+def format_part_header(boundary: str, name: str, content_type: str, size: int) -> bytes:
+    """
+    Delimitador e headers de uma parte ``multipart/mixed``, antes do conteúdo
+    """
+    headers = (
+        f"Content-Type: {content_type}\r\n"
+        f'Content-Disposition: attachment; filename="{name}"\r\n'
+        f"Content-Length: {size}\r\n"
+    )
+    return b"--" + boundary.encode() + b"\r\n" + headers.encode() + b"\r\n"
+
+
+def format_multipart_end(boundary: str) -> bytes:
+    return b"--" + boundary.encode() + b"--\r\n"
+
+
+def format_event(event: str, data: dict) -> bytes:
+    """
+    Formata um evento server-sent events com ``data`` em JSON
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
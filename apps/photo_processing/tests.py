@@ -0,0 +1,300 @@
+import base64
+import importlib.util
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+from PIL import Image
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from apps.photo_processing import views
+from apps.photo_processing.benchmarking import encode_jpeg, stub_models, synthetic_alpha, synthetic_portrait
+from apps.photo_processing.management.commands.process_photos import is_safe_name, iter_sources
+from apps.photo_processing.feathering import _smooth_patch, smooth_alpha
+from apps.photo_processing.jobs import DatabaseJobStore, InMemoryJobStore, JobStatus
+from apps.photo_processing.masks import HEADER, MaskStore, encode_mask, read_header
+from apps.photo_processing.preflight import ImageTooLarge, inspect_image
+from apps.photo_processing.result_cache import ResultCache
+from apps.photo_processing.streaming import PayloadTooLarge, StreamingJSONReader, read_stream
+
+
+class ProcessPhotosArchiveTests(TestCase):
+    """
+    Nomes de entradas de .zip/.tar não podem gravar fora do diretório de saída
+    """
+
+    UNSAFE_NAMES = ["../escape.jpg", "sub/../../escape.jpg", "/tmp/absolute_escape.jpg", "sub\\..\\escape.jpg"]
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.photo = encode_jpeg(synthetic_portrait(320, 240))
+
+    def _zip(self, names):
+        path = self.tmp / "photos.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            for name in names:
+                # ZipFile.write normaliza o nome; writestr grava como veio
+                archive.writestr(zipfile.ZipInfo(name), self.photo)
+        return path
+
+    def _tar(self, names):
+        path = self.tmp / "photos.tar"
+        with tarfile.open(path, "w") as archive:
+            for name in names:
+                info = tarfile.TarInfo(name)
+                info.size = len(self.photo)
+                archive.addfile(info, io.BytesIO(self.photo))
+        return path
+
+    def test_is_safe_name(self):
+        self.assertTrue(is_safe_name("photo.jpg"))
+        self.assertTrue(is_safe_name("sub/dir/photo.jpg"))
+        for name in self.UNSAFE_NAMES + ["", ".."]:
+            self.assertFalse(is_safe_name(name), name)
+
+    def test_unsafe_entries_are_skipped(self):
+        for archive in (self._zip(self.UNSAFE_NAMES + ["ok.jpg"]), self._tar(self.UNSAFE_NAMES + ["ok.jpg"])):
+            with self.subTest(archive=archive.name):
+                self.assertEqual([name for name, _ in iter_sources(archive)], ["ok.jpg"])
+
+    def test_archive_is_processed_inside_output(self):
+        output = self.tmp / "work" / "out"
+        archive = self._zip(["../escape.jpg", "sub/../../escape.jpg", "ok.jpg"])
+        call_command(
+            "process_photos", str(archive), str(output), "--stub-models", "--workers", "1",
+            "--backgrounds", "beach", "--format", "jpeg", stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        self.assertTrue((output / "ok_beach.jpg").exists())
+        self.assertEqual(list(self.tmp.rglob("escape*")), [])
+
+
+class CorruptedMaskTests(SimpleTestCase):
+    """
+    Máscaras truncadas ou corrompidas lidas por mmap são ignoradas, sem BufferError ao fechar o mapa
+    """
+
+    DIGEST = "ab" * 32
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.alpha = synthetic_alpha(300, 200)
+
+    def _damaged(self, codec):
+        data = encode_mask(self.alpha, codec=codec, metadata={"key": "k"})
+        corrupted = bytearray(data)
+        corrupted[-len(data) // 3:] = b"\xff" * (len(data) // 3)
+        bad_metadata = bytearray(data)
+        bad_metadata[HEADER.size:HEADER.size + 3] = b"\xff{["
+        return {
+            "truncada": data[:len(data) // 2],
+            "sem o fim": data[:-3],
+            "corrompida": bytes(corrupted),
+            "metadados corrompidos": bytes(bad_metadata),
+            "metadados truncados": data[:HEADER.size + 4],
+        }
+
+    def test_mask_store_load(self):
+        store = MaskStore(self.tmp)
+        for codec in ("rle", "png"):
+            store.save(self.DIGEST, "k", self.alpha, b"photo", codec=codec)
+            self.assertEqual(read_header(Path(store._path(self.DIGEST, "mask")).read_bytes())[0], codec)
+            np.testing.assert_array_equal(store.load(self.DIGEST, "k"), self.alpha)
+            for damage, data in self._damaged(codec).items():
+                with self.subTest(codec=codec, damage=damage):
+                    Path(store._path(self.DIGEST, "mask")).write_bytes(data)
+                    with self.assertLogs("apps.photo_processing.masks", "ERROR"):
+                        self.assertIsNone(store.load(self.DIGEST, "k"))
+
+    def test_result_cache_analysis(self):
+        for codec in ("rle", "png"):
+            for damage, data in self._damaged(codec).items():
+                with self.subTest(codec=codec, damage=damage):
+                    cache = ResultCache(0, self.tmp / codec / damage, 1 << 20)
+                    cache.disk.set("analysis:k", data)
+                    with self.assertLogs("apps.photo_processing.result_cache", "ERROR"):
+                        self.assertIsNone(cache.get_analysis("k"))
+
+
+@override_settings(PHOTO_UPLOAD_MAX_BYTES=1024 * 1024)
+class DeclaredContentLengthTests(SimpleTestCase):
+    """
+    O Content-Length declarado pelo cliente não decide quanta memória é pré-alocada
+    """
+
+    HUGE = 1_500_000_000
+
+    def test_buffers_are_capped_by_max_bytes(self):
+        self.assertEqual(read_stream(io.BytesIO(b"abc"), 1024, self.HUGE), b"abc")
+        reader = StreamingJSONReader(io.BytesIO(b'{"photo_base64":"YWJj"}'), "photo_base64", 1024, self.HUGE)
+        self.assertEqual(reader.read(), (b"abc", {}))
+
+    def test_base64_view_rejects_declared_length_above_limit(self):
+        for content_type in ("application/json", "image/jpeg"):
+            with self.subTest(content_type=content_type):
+                response = self.client.post(
+                    reverse("photo_processing:process_photo_base64"), data=b"abc",
+                    content_type=content_type, CONTENT_LENGTH=str(self.HUGE),
+                )
+                self.assertEqual(response.status_code, 413)
+
+    def test_async_body_reader_rejects_declared_length_above_limit(self):
+        from apps.photo_processing.async_views import read_base64_body
+
+        request = RequestFactory().post(
+            "/", data=b"abc", content_type="application/json", CONTENT_LENGTH=str(self.HUGE),
+        )
+        with self.assertRaises(PayloadTooLarge):
+            read_base64_body(request)
+
+
+@override_settings(RESULT_CACHE_ENABLED=False)
+class Base64FormTests(TestCase):
+    """
+    process-photo-base64 aceita formulários urlencoded e multipart além do JSON em streaming
+    """
+
+    def setUp(self):
+        stub_models(views.photo_processor)
+        for name in ("is_nsfw", "remove_background"):
+            self.addCleanup(vars(views.photo_processor).pop, name, None)
+        self.photo_base64 = base64.b64encode(encode_jpeg(synthetic_portrait(320, 240))).decode()
+
+    def _post(self, **kwargs):
+        response = self.client.post(reverse("photo_processing:process_photo_base64"), **kwargs)
+        self.assertEqual(response.status_code, 200, getattr(response, "content", b""))
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_json(self):
+        data = self._post(
+            data=json.dumps({"photo_base64": self.photo_base64, "background": "beach"}),
+            content_type="application/json",
+        )
+        self.assertEqual(data["background_used"], "beach")
+
+    def test_multipart(self):
+        data = self._post(data={"photo_base64": self.photo_base64, "background": "beach", "format": "webp"})
+        self.assertEqual((data["background_used"], data["content_type"]), ("beach", "image/webp"))
+
+    def test_urlencoded(self):
+        data = self._post(
+            data=urlencode({"photo_base64": self.photo_base64, "background": "beach"}),
+            content_type="application/x-www-form-urlencoded",
+        )
+        self.assertEqual(data["background_used"], "beach")
+
+    def test_async_body_reader_form(self):
+        from apps.photo_processing.async_views import read_base64_body
+
+        request = RequestFactory().post("/", data={"photo_base64": self.photo_base64, "background": "beach"})
+        photo_data, fields = read_base64_body(request)
+        self.assertEqual(photo_data, base64.b64decode(self.photo_base64))
+        self.assertEqual(fields["background"], "beach")
+
+
+@override_settings(PHOTO_MAX_INPUT_PIXELS=4_000_000, PHOTO_MAX_DECODE_PIXELS=1_000_000)
+class DecodeLimitTests(SimpleTestCase):
+    """
+    Só JPEGs podem passar de PHOTO_MAX_DECODE_PIXELS: os demais formatos não são decodificados reduzidos
+    """
+
+    def _encoded(self, format, size):
+        buffer = io.BytesIO()
+        Image.new("RGB", size).save(buffer, format=format)
+        return buffer.getvalue()
+
+    def test_jpeg_up_to_input_limit(self):
+        self.assertEqual(inspect_image(self._encoded("JPEG", (2000, 1500))).pixels, 3_000_000)
+        with self.assertRaises(ImageTooLarge):
+            inspect_image(self._encoded("JPEG", (2500, 2000)))
+
+    def test_other_formats_up_to_decode_limit(self):
+        for format in ("PNG", "WEBP"):
+            with self.subTest(format=format):
+                self.assertEqual(inspect_image(self._encoded(format, (1000, 1000))).format, format)
+                with self.assertRaises(ImageTooLarge):
+                    inspect_image(self._encoded(format, (2000, 1500)))
+
+
+def blob_alpha(width, height, seed, count=8):
+    """
+    Máscara com várias silhuetas elípticas de bordas suaves, em posições e tamanhos aleatórios
+    """
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    alpha = np.zeros((height, width), dtype=np.float32)
+    for _ in range(count):
+        cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+        rx, ry = rng.uniform(5, width / 5), rng.uniform(5, height / 5)
+        distance = ((xs - cx) / rx) ** 2 + ((ys - cy) / ry) ** 2
+        alpha = np.maximum(alpha, np.clip((1.08 - distance) / 0.16, 0, 1))
+    return (alpha * 255).astype(np.uint8)
+
+
+class SmoothAlphaTests(SimpleTestCase):
+    """
+    Tolerâncias documentadas em ``feathering.smooth_alpha_regions``
+    """
+
+    def setUp(self):
+        self.masks = [synthetic_alpha(640, 480)] + [blob_alpha(640, 480, seed) for seed in range(6)]
+
+    def test_tiles_match_full_frame(self):
+        for index, alpha in enumerate(self.masks):
+            for tile_size in (32, 64, 100):
+                with self.subTest(mask=index, tile_size=tile_size):
+                    np.testing.assert_array_equal(
+                        smooth_alpha(alpha, tile_size=tile_size), _smooth_patch(alpha, 2.5, 2)
+                    )
+
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "scipy não instalado")
+    def test_bound_against_previous_implementation(self):
+        from apps.photo_processing.management.commands.bench_alpha_edges import reference_smooth_alpha
+
+        for index, alpha in enumerate(self.masks):
+            with self.subTest(mask=index):
+                expected = reference_smooth_alpha(alpha)
+                result = smooth_alpha(alpha)
+                diff = np.abs(expected.astype(np.int16) - result.astype(np.int16))
+                band = ((expected > 0) & (expected < 255)) | ((result > 0) & (result < 255))
+                self.assertLessEqual(diff.max(), 128)
+                self.assertLess(diff.mean(), 0.05)
+                self.assertLess(np.mean(diff[band] > 4), 0.02)
+                np.testing.assert_array_equal(diff[~band], 0)
+
+
+class JobPurgeTests(TestCase):
+    """
+    Jobs na fila ou em processamento não expiram pelo TTL dos jobs concluídos
+    """
+
+    def _jobs(self, store):
+        jobs = {status: store.create("beach") for status in ("queued", "processing", "done", "failed")}
+        store.mark_processing(jobs["processing"])
+        store.mark_done(jobs["done"], b"result")
+        store.mark_failed(jobs["failed"], "erro")
+        return jobs
+
+    def test_purge(self):
+        for store in (InMemoryJobStore(), DatabaseJobStore()):
+            with self.subTest(store=type(store).__name__):
+                jobs = self._jobs(store)
+                # Tudo mais antigo que o TTL: só os concluídos saem
+                self.assertEqual(store.purge(timedelta(seconds=-1), timedelta(hours=24)), 2)
+                remaining = {name for name, job_id in jobs.items() if store.get(job_id) is not None}
+                self.assertEqual(remaining, {"queued", "processing"})
+                self.assertEqual(store.get(jobs["processing"])["status"], JobStatus.PROCESSING)
+                # Parados há mais que stale_after: também saem
+                self.assertEqual(store.purge(timedelta(seconds=-1), timedelta(seconds=-1)), 2)
+                self.assertIsNone(store.get(jobs["queued"]))
@@ -1,10 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.PHOTO_ASYNC_VIEWS:
+    from . import async_views as processing_views
+else:
+    processing_views = views
+
 app_name = 'photo_processing'
 
 urlpatterns = [
-    path('process-photo/', views.process_photo, name='process_photo'),
-    path('process-photo-base64/', views.process_photo_base64, name='process_photo_base64'),
+    path('process-photo/', processing_views.process_photo, name='process_photo'),
+    path('process-photo-all/', processing_views.process_photo_all_backgrounds, name='process_photo_all_backgrounds'),
+    path('process-photo-base64/', processing_views.process_photo_base64, name='process_photo_base64'),
     path('available-options/', views.get_available_options, name='get_available_options'),
-]
\ No newline at end of file
+    path('jobs/', views.submit_photo_job, name='submit_photo_job'),
+    path('jobs/<uuid:job_id>/', views.get_photo_job_status, name='photo_job_status'),
+    path('jobs/<uuid:job_id>/result/', views.get_photo_job_result, name='photo_job_result'),
+    path('jobs/<uuid:job_id>/preview/', views.get_photo_job_preview, name='photo_job_preview'),
+    path('jobs/<uuid:job_id>/events/', processing_views.get_photo_job_events, name='photo_job_events'),
+]
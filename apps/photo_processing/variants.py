@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .background_cache import resolve_asset_path
+
+logger = logging.getLogger(__name__)
+
+# formato -> (formato do Pillow, extensão)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "webp"),
+    "jpeg": ("JPEG", "jpg"),
+}
+
+MANIFEST_NAME = "manifest.json"
+
+_manifest_lock = threading.Lock()
+
+
+def variants_root() -> Path:
+    return Path(settings.MEDIA_ROOT) / settings.ASSET_VARIANTS_DIR
+
+
+def variant_url(relative_path: str) -> str:
+    return f"{settings.MEDIA_URL}{settings.ASSET_VARIANTS_DIR}/{relative_path}"
+
+
+def load_manifest() -> dict:
+    """
+    Manifesto das variantes geradas: "<tipo>/<chave>" -> origem, hash e arquivos de cada variante
+    """
+    try:
+        with open(variants_root() / MANIFEST_NAME) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Manifesto de variantes inválido: {e}")
+        return {}
+
+
+def update_manifest(entries: dict, removed=()) -> None:
+    """
+    Grava as entradas alteradas e remove as de ``removed``, substituindo o arquivo atomicamente
+    """
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest.update(entries)
+        for asset_id in removed:
+            manifest.pop(asset_id, None)
+        path = variants_root() / MANIFEST_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}")
+        with open(temporary, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temporary, path)
+
+
+def variant_widths(width: int) -> list:
+    """
+    Larguras de ASSET_VARIANT_WIDTHS que não ampliam a imagem, mais a largura original
+    quando ela fica abaixo da maior configurada
+    """
+    configured = sorted(settings.ASSET_VARIANT_WIDTHS)
+    widths = [candidate for candidate in configured if candidate <= width]
+    if width < configured[-1] and width not in widths:
+        widths.append(width)
+    return widths
+
+
+def source_digest(path: str) -> str:
+    """
+    Hash do arquivo de origem e dos parâmetros de geração, usado nos nomes das variantes
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(repr((
+        sorted(settings.ASSET_VARIANT_WIDTHS), sorted(settings.ASSET_VARIANT_FORMATS), settings.ASSET_VARIANT_QUALITY,
+    )).encode())
+    return digest.hexdigest()[:12]
+
+
+def _variants_present(entry: dict) -> bool:
+    root = variants_root()
+    return all((root / variant["path"]).exists() for variant in entry["variants"])
+
+
+def generate_variants(asset_id: str, source: str, entry: dict = None, force: bool = False):
+    """
+    Gera as variantes redimensionadas de uma imagem; retorna (entrada do manifesto, gerou?).
+
+    A origem não é relida se tamanho e mtime não mudaram desde a última geração, nem
+    reprocessada se o hash do conteúdo for o mesmo.
+    """
+    resolved = resolve_asset_path(source)
+    stat = os.stat(resolved)
+    if not force and entry and entry["source"] == source and _variants_present(entry):
+        if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return entry, False
+        digest = source_digest(resolved)
+        if entry["digest"] == digest:
+            return {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, False
+    else:
+        digest = source_digest(resolved)
+
+    root = variants_root()
+    with Image.open(resolved) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    original_width, original_height = image.size
+
+    variants = []
+    for width in variant_widths(original_width):
+        height = max(1, round(original_height * width / original_width))
+        resized = image if width == original_width else image.resize(
+            (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0
+        )
+        for name in settings.ASSET_VARIANT_FORMATS:
+            pil_format, extension = VARIANT_FORMATS[name]
+            relative_path = f"{asset_id}-{width}w.{digest}.{extension}"
+            path = root / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+            resized.save(temporary, format=pil_format, quality=settings.ASSET_VARIANT_QUALITY, optimize=True)
+            os.replace(temporary, path)
+            variants.append({"format": name, "width": width, "height": height, "path": relative_path})
+
+    new_entry = {
+        "source": source,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest,
+        "width": original_width,
+        "height": original_height,
+        "variants": variants,
+    }
+    if entry:
+        remove_variant_files(entry, keep={variant["path"] for variant in variants})
+    return new_entry, True
+
+
+def remove_variant_files(entry: dict, keep=frozenset()) -> None:
+    """
+    Apaga os arquivos das variantes de uma entrada do manifesto, exceto os de ``keep``
+    """
+    root = variants_root()
+    for variant in entry.get("variants", ()):
+        if variant["path"] not in keep:
+            try:
+                os.remove(root / variant["path"])
+            except FileNotFoundError:
+                pass
+
+
+def generate_asset(kind: str, key: str, source: str, force: bool = False) -> bool:
+    """
+    Gera (se necessário) as variantes de um fundo ou pose e atualiza o manifesto
+    """
+    asset_id = f"{kind}/{key}"
+    entry, generated = generate_variants(asset_id, source, load_manifest().get(asset_id), force)
+    update_manifest({asset_id: entry})
+    if generated:
+        logger.info(f"Variantes de {asset_id} geradas ({len(entry['variants'])} arquivos)")
+    return generated
+
+
+def remove_asset(kind: str, key: str) -> None:
+    asset_id = f"{kind}/{key}"
+    entry = load_manifest().get(asset_id)
+    if entry is not None:
+        remove_variant_files(entry)
+        update_manifest({}, removed=[asset_id])
+
+
+def image_sources(entry: dict) -> dict:
+    """
+    URLs das variantes de uma imagem: ``src`` (maior JPEG) e um ``srcset`` por formato
+    """
+    srcset = {}
+    for name in settings.ASSET_VARIANT_FORMATS:
+        variants = sorted(
+            (variant for variant in entry["variants"] if variant["format"] == name),
+            key=lambda variant: variant["width"],
+        )
+        if variants:
+            srcset[name] = ", ".join(f"{variant_url(variant['path'])} {variant['width']}w" for variant in variants)
+
+    fallback = [variant for variant in entry["variants"] if variant["format"] == "jpeg"] or entry["variants"]
+    largest = max(fallback, key=lambda variant: variant["width"])
+    return {
+        "src": variant_url(largest["path"]),
+        "width": entry["width"],
+        "height": entry["height"],
+        "srcset": srcset,
+    }
+
+
+def asset_images(manifest: dict, kind: str, keys) -> dict:
+    """
+    ``image_sources`` de cada chave de ``keys`` com variantes geradas
+    """
+    images = {}
+    for key in keys:
+        entry = manifest.get(f"{kind}/{key}")
+        if entry and entry["variants"]:
+            images[key] = image_sources(entry)
+    return images
@@ -1,11 +1,30 @@
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 import base64
+import binascii
+import functools
+import io
 import logging
+import time
+import uuid
+import zipfile
+from .catalogue import catalogue_view
+from .encoding import InvalidEncoding, encoding_from_request
+from .jobs import JobQueueFull, JobStatus, PhotoJobQueue, get_job_store
+from .metrics import metrics
+from .preflight import ImageTooLarge, InvalidImage, inspect_image
+from .renderers import IMAGE_RENDERERS, EventStreamRenderer, MultipartMixedRenderer, ZipRenderer
 from .services import PhotoBackgroundChanger
+from .streaming import (
+    PayloadTooLarge, StreamingJSONReader, content_length, format_event, iter_base64_json, iter_multipart,
+    read_stream,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,11 +32,68 @@ logger = logging.getLogger(__name__)
 photo_processor = PhotoBackgroundChanger()
 
 
+def check_preflight(source, size: int = None):
+    """
+    Valida tamanho, formato e dimensões da foto lendo só o cabeçalho;
+    retorna (status, mensagem de erro) ou None se a foto pode ser processada
+    """
+    if size is not None and size > settings.PHOTO_UPLOAD_MAX_BYTES:
+        return 413, f"Imagem maior que o limite de {settings.PHOTO_UPLOAD_MAX_BYTES} bytes"
+    try:
+        inspect_image(source)
+    except ImageTooLarge as e:
+        return 413, str(e)
+    except InvalidImage as e:
+        return 400, str(e)
+    return None
+
+
+def is_json(content_type: str) -> bool:
+    return content_type.split(';')[0].strip().lower() == 'application/json'
+
+
+def decode_base64_field(fields):
+    """
+    Bytes de ``photo_base64`` num formulário (urlencoded ou multipart), lido por inteiro
+    como antes do streaming, ou None se o campo estiver ausente
+    """
+    photo_base64 = fields.get('photo_base64')
+    return base64.b64decode(photo_base64) if photo_base64 else None
+
+
+def preflight_error(source, size: int = None):
+    """
+    Resposta de erro (400 ou 413) de ``check_preflight``, ou None se a foto pode ser processada
+    """
+    problem = check_preflight(source, size)
+    if problem is None:
+        return None
+    status, message = problem
+    return Response({"error": message}, status=status)
+
+# Os jobs não guardam o formato pedido: o resultado é sempre JPEG, independente de PHOTO_OUTPUT_FORMAT
+JOB_ENCODING = encoding_from_request({"format": "jpeg"})
+
+job_queue = PhotoJobQueue(
+    handler=functools.partial(photo_processor.process_photo, encoding=JOB_ENCODING),
+    store=get_job_store(),
+    workers=settings.PHOTO_JOB_WORKERS,
+    max_pending=settings.PHOTO_JOB_QUEUE_SIZE,
+    ttl=settings.PHOTO_JOB_TTL,
+    stale_ttl=settings.PHOTO_JOB_STALE_TTL,
+)
+metrics.gauge("photo_job_queue_pending", "Jobs aguardando na fila do worker", function=job_queue.pending)
+
+
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
+@renderer_classes([JSONRenderer, *IMAGE_RENDERERS])
 def process_photo(request):
     """
-    Processa a foto: remove o fundo e compõe com o fundo escolhido
+    Processa a foto: remove o fundo e compõe com o fundo escolhido.
+
+    O formato da resposta vem do campo ``format`` (jpeg, webp, avif) ou do Accept;
+    ``quality``, ``max_bytes`` e ``subsampling`` ajustam a codificação.
     """    
     if 'photo' not in request.FILES:
         logger.error("Erro: Foto não encontrada na requisição")
@@ -35,24 +111,33 @@ def process_photo(request):
             status=400
         )
     
+    error_response = preflight_error(photo, photo.size)
+    if error_response is not None:
+        return error_response
+    
     available_backgrounds = photo_processor.get_available_backgrounds()
     if background not in available_backgrounds:
         return Response({
             "error": f"Fundo inválido. Disponíveis: {list(available_backgrounds.keys())}"
         }, status=400)
     
+    try:
+        encoding = encoding_from_request(request.data, request.headers.get('Accept'))
+    except InvalidEncoding as e:
+        return Response({"error": str(e)}, status=400)
+    
     try:
         photo_data = photo.read()
         
         result_bytes = photo_processor.process_photo(
-            photo_data, background
+            photo_data, background, encoding=encoding
         )
         
         response = HttpResponse(
             content=result_bytes,
-            content_type="image/jpeg"
+            content_type=encoding.content_type
         )
-        response['Content-Disposition'] = 'attachment; filename=comicif_result.jpg'
+        response['Content-Disposition'] = f'attachment; filename=comicif_result.{encoding.extension}'
         return response
         
     except Exception as e:
@@ -61,6 +146,93 @@ def process_photo(request):
         }, status=500)
 
 
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+@renderer_classes([ZipRenderer, MultipartMixedRenderer])
+def process_photo_all_backgrounds(request):
+    """
+    Processa a foto com todos os fundos (ou os escolhidos em ``backgrounds``), segmentando uma única vez.
+
+    Retorna um zip com uma imagem por fundo; com Accept: multipart/mixed, cada fundo é enviado
+    como uma parte assim que sua composição termina. ``format``, ``quality``, ``max_bytes`` e
+    ``subsampling`` escolhem a codificação das imagens.
+    """
+    if 'photo' not in request.FILES:
+        logger.error("Erro: Foto não encontrada na requisição")
+        return Response(
+            {"error": "Foto é obrigatória"}, 
+            status=400
+        )
+    
+    photo = request.FILES['photo']
+    if not photo.content_type.startswith("image/"):
+        return Response(
+            {"error": "Arquivo deve ser uma imagem"}, 
+            status=400
+        )
+    
+    error_response = preflight_error(photo, photo.size)
+    if error_response is not None:
+        return error_response
+    
+    available_backgrounds = photo_processor.get_available_backgrounds()
+    requested = list(dict.fromkeys(
+        key.strip()
+        for value in request.data.getlist('backgrounds')
+        for key in value.split(',')
+        if key.strip()
+    ))
+    invalid = [key for key in requested if key not in available_backgrounds]
+    if invalid:
+        return Response({
+            "error": f"Fundo(s) inválido(s): {invalid}. Disponíveis: {list(available_backgrounds.keys())}"
+        }, status=400)
+    backgrounds = requested or list(available_backgrounds)
+    
+    try:
+        encoding = encoding_from_request(request.data)
+    except InvalidEncoding as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        results = photo_processor.process_photo_backgrounds(photo.read(), backgrounds, encoding)
+        if results is None:
+            return Response(
+                {"error": "Imagem imprópria detectada"},
+                status=422
+            )
+        
+        if request.accepted_renderer.format == MultipartMixedRenderer.format:
+            boundary = uuid.uuid4().hex
+            parts = (
+                (f"comicif_{background}.{encoding.extension}", encoding.content_type, result_bytes)
+                for background, result_bytes in results
+            )
+            return StreamingHttpResponse(
+                iter_multipart(parts, boundary),
+                content_type=f"multipart/mixed; boundary={boundary}"
+            )
+        
+        # As imagens já são comprimidas: o zip só armazena os arquivos
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+            for background, result_bytes in results:
+                zip_file.writestr(f"comicif_{background}.{encoding.extension}", result_bytes)
+        
+        response = HttpResponse(
+            content=archive.getvalue(),
+            content_type="application/zip"
+        )
+        response['Content-Disposition'] = 'attachment; filename=comicif_results.zip'
+        return response
+        
+    except Exception as e:
+        return Response({
+            "error": f"Erro ao processar imagem: {str(e)}"
+        }, status=500)
+
+
+@catalogue_view
 @api_view(['GET'])
 def get_available_options(request):
     """
@@ -72,7 +244,8 @@ def get_available_options(request):
         
         return Response({
             "backgrounds": backgrounds,
-            "poses": poses
+            "poses": poses,
+            "images": photo_processor.catalogue.images()
         })
         
     except Exception as e:
@@ -82,19 +255,56 @@ def get_available_options(request):
 
 
 @api_view(['POST'])
+@renderer_classes([JSONRenderer, *IMAGE_RENDERERS])
 def process_photo_base64(request):
     """
-    Versão alternativa que recebe e retorna imagens em base64
+    Versão alternativa que recebe e retorna imagens em base64.
+
+    O JSON é lido e decodificado em pedaços e a resposta é gerada em streaming; formulários
+    (urlencoded ou multipart) com ``photo_base64`` são lidos por inteiro, como antes.
+    Com Content-Type image/* ou application/octet-stream o corpo é a própria imagem
+    (fundo em ``?background=``); com Accept: image/jpeg (ou webp, avif) a resposta é a
+    própria imagem, sem base64. ``format``, ``quality``, ``max_bytes`` e ``subsampling``
+    (no JSON ou na query string) escolhem a codificação.
     """
-    photo_base64 = request.data.get('photo_base64')
-    background = request.data.get('background')
+    raw_upload = request.content_type.startswith('image/') or request.content_type == 'application/octet-stream'
+    photo_data = None
+    fields = request.query_params
+    
+    try:
+        size_hint = content_length(request.META, settings.PHOTO_UPLOAD_MAX_BYTES)
+        if request.stream is not None:
+            if raw_upload:
+                photo_data = read_stream(request.stream, settings.PHOTO_UPLOAD_MAX_BYTES, size_hint)
+            elif is_json(request.content_type):
+                photo_data, fields = StreamingJSONReader(
+                    request.stream, 'photo_base64', settings.PHOTO_UPLOAD_MAX_BYTES, size_hint
+                ).read()
+            else:
+                fields = request.data
+                photo_data = decode_base64_field(fields)
+    except PayloadTooLarge:
+        return Response(
+            {"error": f"Imagem maior que o limite de {settings.PHOTO_UPLOAD_MAX_BYTES} bytes"},
+            status=413
+        )
+    except (ValueError, binascii.Error):
+        return Response(
+            {"error": "JSON ou base64 inválido"},
+            status=400
+        )
     
-    if not photo_base64:
+    if not photo_data:
         return Response(
             {"error": "photo_base64 é obrigatório"}, 
             status=400
         )
     
+    error_response = preflight_error(photo_data)
+    if error_response is not None:
+        return error_response
+    
+    background = fields.get('background')
     available_backgrounds = photo_processor.get_available_backgrounds()
     if background not in available_backgrounds:
         return Response({
@@ -102,20 +312,231 @@ def process_photo_base64(request):
         }, status=400)
     
     try:
-        photo_data = base64.b64decode(photo_base64)
-        
+        encoding = encoding_from_request(fields, request.headers.get('Accept'))
+    except InvalidEncoding as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
         result_bytes = photo_processor.process_photo(
-            photo_data, background
+            photo_data, background, encoding=encoding
         )
-        
-        result_base64 = base64.b64encode(result_bytes).decode('utf-8')
-        
-        return Response({
-            "result_image": result_base64,
-            "background_used": background
-        })
-        
     except Exception as e:
         return Response({
             "error": f"Erro ao processar imagem: {str(e)}"
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+    
+    if request.accepted_renderer.format != JSONRenderer.format:
+        response = HttpResponse(
+            content=result_bytes,
+            content_type=encoding.content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename=comicif_result.{encoding.extension}'
+        return response
+    
+    return StreamingHttpResponse(
+        iter_base64_json(result_bytes, "result_image", {
+            "background_used": background,
+            "content_type": encoding.content_type,
+        }),
+        content_type="application/json"
+    )
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def submit_photo_job(request):
+    """
+    Enfileira a foto para processamento assíncrono e retorna o id do job.
+
+    Com ``preview=true``, uma prévia em baixa resolução fica disponível antes do resultado final;
+    ``events_url`` avisa (server-sent events) quando a prévia e o resultado ficam prontos.
+    """
+    if 'photo' not in request.FILES:
+        return Response(
+            {"error": "Foto é obrigatória"}, 
+            status=400
+        )
+    
+    photo = request.FILES['photo']
+    background = request.data.get('background')
+    
+    if not photo.content_type.startswith("image/"):
+        return Response(
+            {"error": "Arquivo deve ser uma imagem"}, 
+            status=400
+        )
+    
+    error_response = preflight_error(photo, photo.size)
+    if error_response is not None:
+        return error_response
+    
+    available_backgrounds = photo_processor.get_available_backgrounds()
+    if background not in available_backgrounds:
+        return Response({
+            "error": f"Fundo inválido. Disponíveis: {list(available_backgrounds.keys())}"
+        }, status=400)
+    
+    preview = str(request.data.get('preview', '')).lower() in ('1', 'true', 'on', 'yes')
+    
+    try:
+        job_id = job_queue.submit(photo.read(), background, preview=preview)
+    except JobQueueFull:
+        response = Response(
+            {"error": "Fila de processamento cheia, tente novamente em instantes"},
+            status=429
+        )
+        response['Retry-After'] = '5'
+        return response
+    
+    data = {
+        "job_id": job_id,
+        "status": JobStatus.QUEUED,
+        "status_url": reverse('photo_processing:photo_job_status', args=[job_id]),
+        "result_url": reverse('photo_processing:photo_job_result', args=[job_id]),
+        "events_url": reverse('photo_processing:photo_job_events', args=[job_id]),
+    }
+    if preview:
+        data["preview_url"] = reverse('photo_processing:photo_job_preview', args=[job_id])
+    return Response(data, status=202)
+
+
+@api_view(['GET'])
+def get_photo_job_status(request, job_id):
+    """
+    Retorna o status de um job de processamento
+    """
+    job = job_queue.store.get(str(job_id))
+    if job is None:
+        return Response({"error": "Job não encontrado"}, status=404)
+    
+    return Response({
+        "job_id": job["id"],
+        "status": job["status"],
+        "background": job["background"],
+        "error": job["error"] or None,
+        "preview_url": reverse('photo_processing:photo_job_preview', args=[job["id"]]) if job["preview_ready"] else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    })
+
+
+@api_view(['GET'])
+def get_photo_job_result(request, job_id):
+    """
+    Retorna a imagem processada de um job concluído
+    """
+    job = job_queue.store.get(str(job_id))
+    if job is None:
+        return Response({"error": "Job não encontrado"}, status=404)
+    
+    if job["status"] != JobStatus.DONE:
+        return Response({
+            "error": job["error"] or "Job ainda não foi concluído",
+            "status": job["status"],
+        }, status=409)
+    
+    result_bytes = job_queue.store.get_result(job["id"])
+    response = HttpResponse(
+        content=result_bytes,
+        content_type=JOB_ENCODING.content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename=comicif_result.{JOB_ENCODING.extension}'
+    return response
+
+
+@api_view(['GET'])
+def get_photo_job_preview(request, job_id):
+    """
+    Retorna a prévia em baixa resolução de um job enviado com ``preview=true``
+    """
+    job = job_queue.store.get(str(job_id))
+    if job is None:
+        return Response({"error": "Job não encontrado"}, status=404)
+    
+    if not job["preview_ready"]:
+        return Response({
+            "error": job["error"] or "Prévia ainda não disponível",
+            "status": job["status"],
+        }, status=409)
+    
+    preview_bytes = job_queue.store.get_preview(job["id"])
+    response = HttpResponse(
+        content=preview_bytes,
+        content_type="image/jpeg"
+    )
+    response['Content-Disposition'] = 'inline; filename=comicif_preview.jpg'
+    return response
+
+
+class JobEventTracker:
+    """
+    Converte sucessivas leituras do job no store nos eventos ``status``, ``preview``,
+    ``done``, ``failed`` e ``timeout``
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.deadline = time.monotonic() + settings.PHOTO_JOB_EVENTS_TIMEOUT
+        self.last_status = None
+        self.preview_sent = False
+        self.finished = False
+
+    def events(self, job) -> list:
+        if job is None:
+            self.finished = True
+            return [format_event("failed", {"error": "Job não encontrado"})]
+        
+        events = []
+        if job["status"] != self.last_status:
+            self.last_status = job["status"]
+            events.append(format_event("status", {"status": self.last_status}))
+        
+        if job["preview_ready"] and not self.preview_sent:
+            self.preview_sent = True
+            events.append(format_event("preview", {
+                "preview_url": reverse('photo_processing:photo_job_preview', args=[self.job_id]),
+            }))
+        
+        if job["status"] == JobStatus.DONE:
+            self.finished = True
+            events.append(format_event("done", {
+                "result_url": reverse('photo_processing:photo_job_result', args=[self.job_id]),
+            }))
+        elif job["status"] == JobStatus.FAILED:
+            self.finished = True
+            events.append(format_event("failed", {"error": job["error"]}))
+        elif time.monotonic() > self.deadline:
+            self.finished = True
+            events.append(format_event("timeout", {"status": job["status"]}))
+        return events
+
+
+def iter_job_events(job_id: str):
+    """
+    Acompanha o job no store até o resultado final, a falha ou o timeout
+    """
+    tracker = JobEventTracker(job_id)
+    while True:
+        yield from tracker.events(job_queue.store.get(job_id))
+        if tracker.finished:
+            return
+        time.sleep(settings.PHOTO_JOB_EVENTS_POLL_INTERVAL)
+
+
+@api_view(['GET'])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def get_photo_job_events(request, job_id):
+    """
+    Server-sent events com o andamento do job, até o resultado final ou a falha
+    """
+    job = job_queue.store.get(str(job_id))
+    if job is None:
+        return Response({"error": "Job não encontrado"}, status=404)
+    
+    response = StreamingHttpResponse(
+        iter_job_events(job["id"]),
+        content_type="text/event-stream"
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
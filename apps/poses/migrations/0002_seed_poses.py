@@ -0,0 +1,33 @@
+from django.db import migrations
+
+POSES = [
+    ("spiderman", "Homem-Aranha", "Pose agachado com mão no chão", "assets/poses/spiderman_pose.jpg"),
+    ("sitting_cross_legs", "Sentado de pernas cruzadas", "Posição de meditação", "assets/poses/sitting_cross_legs.jpg"),
+    ("flying", "Voando", "Braços estendidos como se estivesse voando", "assets/poses/flying_pose.jpg"),
+    ("superhero", "Super-herói", "Mãos na cintura, peito estufado", "assets/poses/superhero_pose.jpg"),
+]
+
+
+def seed_poses(apps, schema_editor):
+    Pose = apps.get_model('poses', 'Pose')
+    for key, name, description, reference_image in POSES:
+        Pose.objects.get_or_create(
+            key=key,
+            defaults={"name": name, "description": description, "reference_image": reference_image},
+        )
+
+
+def remove_poses(apps, schema_editor):
+    Pose = apps.get_model('poses', 'Pose')
+    Pose.objects.filter(key__in=[key for key, *_ in POSES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_poses, remove_poses),
+    ]
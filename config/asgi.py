@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+from apps.photo_processing.registry import load_models_on_startup  # noqa: E402
+
+load_models_on_startup()
@@ -2,6 +2,7 @@
 Django settings for comicif_backend project.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.photo_processing.middleware.RequestIDMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -158,6 +160,168 @@ CORS_ALLOWED_ORIGINS = [
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+PHOTO_UPLOAD_MAX_BYTES = 32 * 1024 * 1024  # 32MB, uploaded photo files and streamed bodies of /api/process-photo-base64/
+
+# Pre-flight checks read only the image header: formats outside PHOTO_ALLOWED_FORMATS answer 400 and images
+# above PHOTO_MAX_INPUT_PIXELS answer 413. JPEGs above PHOTO_MAX_DECODE_PIXELS are decoded already downscaled;
+# other formats cannot be, so PHOTO_MAX_DECODE_PIXELS is their limit (413 above it).
+PHOTO_ALLOWED_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+PHOTO_MAX_INPUT_PIXELS = 100_000_000
+PHOTO_MAX_DECODE_PIXELS = 16_000_000
 
 # Assets path for background images
-ASSETS_ROOT = BASE_DIR / 'assets'
\ No newline at end of file
+ASSETS_ROOT = BASE_DIR / 'assets'
+
+# rembg / onnxruntime session pool (one pool per worker process)
+REMBG_MODEL_NAME = 'u2net_human_seg'
+REMBG_SESSION_POOL_SIZE = 1
+REMBG_SESSION_TIMEOUT = 30  # seconds waiting for a free session
+ONNXRUNTIME_INTRA_OP_THREADS = 0  # 0 = onnxruntime default
+ONNXRUNTIME_INTER_OP_THREADS = 0  # 0 = onnxruntime default
+
+# Asynchronous photo jobs
+PHOTO_JOB_STORE = 'apps.photo_processing.jobs.DatabaseJobStore'
+PHOTO_JOB_WORKERS = 1
+PHOTO_JOB_QUEUE_SIZE = 8  # pending jobs per worker process before answering 429
+PHOTO_JOB_TTL = 60 * 60  # seconds a finished job is kept
+PHOTO_JOB_STALE_TTL = 24 * 60 * 60  # seconds a queued or processing job is kept before it counts as lost
+
+# Progressive mode: low-resolution preview rendered from the same mask before the full-resolution result
+PHOTO_PREVIEW_MAX_SIDE = 512
+PHOTO_PREVIEW_QUALITY = 70
+PHOTO_JOB_EVENTS_POLL_INTERVAL = 0.25  # seconds between job store checks in /api/jobs/<id>/events/
+PHOTO_JOB_EVENTS_TIMEOUT = 90  # seconds an event stream stays open, below the gunicorn worker timeout (120)
+
+# Micro-batching of NSFW classification and segmentation across concurrent requests
+PHOTO_BATCHING_ENABLED = False
+PHOTO_BATCH_MAX_SIZE = 4
+PHOTO_BATCH_MAX_WAIT_MS = 20
+
+# Segmentation runs on a proxy whose long side is at most SEGMENTATION_MAX_SIDE (None = full resolution);
+# only the alpha mask is upscaled, refined with a guided filter when SEGMENTATION_REFINE_EDGES is True
+SEGMENTATION_MAX_SIDE = 1024
+SEGMENTATION_REFINE_EDGES = True
+PHOTO_OUTPUT_MAX_SIDE = 4096  # long side of the result in pixels (None = keep upload resolution)
+
+# Threads per worker process that compose and JPEG-encode the backgrounds of /api/process-photo-all/
+PHOTO_RENDER_WORKERS = 4
+
+# Async versions of process-photo, process-photo-all, process-photo-base64 and the job event stream.
+# Requires an ASGI server (config.asgi:application under uvicorn/daphne, or gunicorn with a uvicorn worker).
+# Uploads and responses stay on the event loop; each CPU-bound stage runs in a bounded thread pool
+# with at most PHOTO_ASYNC_STAGE_LIMITS[stage] concurrent calls per worker process.
+PHOTO_ASYNC_VIEWS = False
+PHOTO_ASYNC_STAGE_LIMITS = {
+    'io': 4,  # reading and validating uploads, cache lookups, zip building
+    'inference': 1,  # decode + NSFW + segmentation
+    'render': 2,  # alpha smoothing, composition and JPEG encoding
+}
+
+# Backgrounds and poses come from the Background and Pose models, cached in each process.
+# Saves and deletes invalidate the cache of the process that made them; other workers reload
+# after CATALOGUE_CACHE_TTL seconds. Option endpoints send an ETag and this Cache-Control max-age.
+CATALOGUE_CACHE_TTL = 60
+CATALOGUE_HTTP_MAX_AGE = 60
+
+# Resized variants of background and pose images for the frontend pickers (srcset), written under
+# MEDIA_ROOT / ASSET_VARIANTS_DIR with content hashes in the file names, so they can be served with a
+# long max-age. Generated by `manage.py generate_asset_variants` and when a Background/Pose is saved.
+ASSET_VARIANTS_DIR = 'variants'
+ASSET_VARIANT_WIDTHS = (160, 320, 640, 1280)
+ASSET_VARIANT_FORMATS = ('webp', 'jpeg')
+ASSET_VARIANT_QUALITY = 80
+ASSET_VARIANT_WORKERS = 4
+ASSET_VARIANTS_ON_SAVE = True
+
+# Output encoding of results ('jpeg', 'webp' or 'avif' when Pillow supports it). Clients can pick
+# format/quality/max_bytes/subsampling per request (form or JSON field, or Accept: image/webp;quality=75);
+# PHOTO_OUTPUT_FORMAT_QUALITY is the default quality when a client asks for another format.
+# Measured with `manage.py bench_encode`.
+PHOTO_OUTPUT_FORMAT = 'jpeg'
+PHOTO_OUTPUT_QUALITY = 90
+PHOTO_OUTPUT_FORMAT_QUALITY = {'jpeg': 90, 'webp': 80, 'avif': 60}
+PHOTO_OUTPUT_MIN_QUALITY = 30  # lower bound when searching a quality that fits max_bytes
+PHOTO_OUTPUT_JPEG_SUBSAMPLING = '4:2:0'
+# Optimized Huffman tables save 1-2% and roughly double the encode time; progressive saves ~5% for 3-4x
+PHOTO_OUTPUT_JPEG_OPTIMIZE = False
+PHOTO_OUTPUT_JPEG_PROGRESSIVE = False
+PHOTO_OUTPUT_WEBP_METHOD = 0  # 0 (fastest) to 6 (smallest); method 4 is ~15% smaller and ~3x slower
+PHOTO_OUTPUT_AVIF_SPEED = 8  # 0 (slowest) to 10 (fastest)
+
+# Memory cap for the LRU of background images already resized to upload dimensions
+BACKGROUND_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+# Model loading: 'eager' loads before serving, 'background' loads in a thread after the worker boots,
+# 'lazy' waits for the first request. /api/health/ready/ reports when every model is loaded.
+# 'preload' is set by gunicorn.conf.py: fork-safe models load once in the gunicorn master and are shared
+# copy-on-write; onnxruntime sessions load in each worker after fork.
+MODEL_LOADING = os.environ.get('MODEL_LOADING', 'background')
+NSFW_MODEL_NAME = 'Falconsai/nsfw_image_detection'
+
+# NSFW classifier backend: 'torch' (transformers pipeline) or 'onnx' (model exported with
+# `manage.py export_nsfw_onnx`, served by onnxruntime without importing torch)
+NSFW_BACKEND = 'torch'
+NSFW_ONNX_MODEL_PATH = BASE_DIR / 'models' / 'nsfw_image_detection.onnx'
+
+# The NSFW classifier sees a 224x224 thumbnail made once after decoding. With NSFW_OVERLAP_SEGMENTATION
+# it runs in a pool of NSFW_SCREENING_WORKERS threads per process while the request thread segments the
+# photo; a flagged photo terminates the segmentation run (or discards its result when batching).
+NSFW_OVERLAP_SEGMENTATION = True
+NSFW_SCREENING_WORKERS = 2
+
+# Content-addressed cache of photo analyses (NSFW verdict + alpha mask) and final results
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MEMORY_BYTES = 128 * 1024 * 1024  # 128MB per worker process
+RESULT_CACHE_DISK_ENABLED = False
+RESULT_CACHE_DISK_ROOT = MEDIA_ROOT / 'result_cache'
+RESULT_CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024  # 1GB shared by all workers
+
+# Masks on disk (result cache disk tier and mask store) keep only the alpha plane, cropped to the
+# subject's bounding box when MASK_CROP is True and compressed as 'png' (smallest) or 'rle' (fastest to read)
+MASK_CODEC = 'png'
+MASK_CROP = True
+# Persistent, unbounded store of masks plus the uploaded photos, so `manage.py recomposite_masks` can
+# compose stored photos with new or updated backgrounds without running the segmentation model
+MASK_STORE_ENABLED = False
+MASK_STORE_ROOT = MEDIA_ROOT / 'masks'
+
+# Logging: every record carries the request id (X-Request-ID header, also propagated to jobs)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'apps.photo_processing.middleware.RequestIDFilter',
+        },
+    },
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['request_id'],
+            'formatter': 'default',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'INFO',
+    },
+    'loggers': {
+        # Replaces Django's own console handler, which would print django.request records twice
+        'django': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Per-stage metrics are exposed at /api/metrics/ (Prometheus text format, per worker process).
+# A fraction of process_photo calls can be profiled with 'cprofile' or 'pyinstrument' (installed separately).
+PHOTO_PROFILING_SAMPLE_RATE = 0.0
+PHOTO_PROFILING_BACKEND = 'cprofile'
+PHOTO_PROFILING_DIR = BASE_DIR / 'profiles'
@@ -5,7 +5,10 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+
+from apps.photo_processing.metrics import metrics
+from apps.photo_processing.registry import registry
 
 
 def api_root(request):
@@ -18,19 +21,36 @@ def api_root(request):
             "poses": "/api/poses/",
             "process_photo": "/api/process-photo/",
             "process_photo_base64": "/api/process-photo-base64/",
-            "health": "/api/health/"
+            "health": "/api/health/",
+            "ready": "/api/health/ready/",
+            "metrics": "/api/metrics/"
         }
     })
 
 
 def health_check(request):
-    """Health check endpoint"""
+    """Health check endpoint (liveness)"""
     return JsonResponse({
         "status": "healthy",
         "service": "comicif-backend"
     })
 
 
+def readiness_check(request):
+    """Readiness endpoint: 503 until every model is loaded in this worker"""
+    ready = registry.is_ready()
+    return JsonResponse({
+        "status": "ready" if ready else "loading",
+        "service": "comicif-backend",
+        "models": registry.status()
+    }, status=200 if ready else 503)
+
+
+def metrics_view(request):
+    """Per-stage latency, memory and concurrency metrics of this worker (Prometheus text format)"""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', api_root, name='api_root'),
@@ -38,6 +58,8 @@ urlpatterns = [
     path('api/', include('apps.poses.urls')),
     path('api/', include('apps.photo_processing.urls')),
     path('api/health/', health_check, name='health_check'),
+    path('api/health/ready/', readiness_check, name='readiness_check'),
+    path('api/metrics/', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration with the application preloaded in the master.
+
+The app and the fork-safe models (torch NSFW classifier, background cache) are loaded once
+before forking and shared copy-on-write by the workers; onnxruntime sessions, which do not
+survive a fork, are created by each worker. Usage:
+
+    gunicorn -c gunicorn.conf.py config.wsgi:application
+"""
+import gc
+import os
+
+os.environ.setdefault("MODEL_LOADING", "preload")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+# Threaded workers: a server-sent events stream (/api/jobs/<id>/events/) holds one thread, not the
+# whole worker, and the worker keeps answering the arbiter's heartbeat while it is open
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 120
+preload_app = True
+
+# Collections in the master while importing would only churn memory the workers are about to share;
+# re-enabled once the preloaded objects are frozen in pre_fork
+gc.disable()
+
+
+def pre_fork(server, worker):
+    # The background cache is loaded from the catalogue in the database; a connection opened
+    # in the master must not be shared by the workers
+    from django.db import connections
+
+    connections.close_all()
+
+    # Objects that exist before the fork are moved to a permanent generation, so the workers'
+    # collector never writes to their headers and the shared pages stay shared
+    gc.collect()
+    gc.freeze()
+    # The master keeps running (and respawning workers): collect again, frozen objects are skipped
+    gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+    from apps.photo_processing.registry import load_models_after_fork
+
+    load_models_after_fork()